@@ -0,0 +1,187 @@
+# api.py
+"""API JSON: feed, comentários de um usuário, listas de seguidos/seguidores e follows em lote.
+
+As respostas são ``StreamingHttpResponse``: as linhas saem do banco em lotes
+de ``API_CHUNK_SIZE`` via ``.iterator()`` e são escritas conforme chegam, então
+a memória fica constante mesmo em exportações grandes. Cada view tem um ETag
+calculado a partir do ``created_at``/``edited_at`` mais recente e do total de
+linhas (que pega remoções); com ``If-None-Match`` igual a resposta é 304 e
+nada além dessa agregação é consultado.
+
+As rotas de follows em lote (``core/graph.py``) leem e escrevem arestas em
+CSV ou JSONL, também em fluxo: a importação lê o corpo da requisição linha a
+linha e a exportação escreve conforme as linhas saem do banco.
+"""
+import functools
+import hashlib
+import json
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Max
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET, require_POST
+
+from . import archive, graph, timeline
+from .db import retry_if_locked
+from .models import Comment, Follow, Profile
+
+CHUNK_SIZE = getattr(settings, 'API_CHUNK_SIZE', 2000)
+# Nomes por requisição em /api/follows/; acima disso use a importação
+BULK_FOLLOW_LIMIT = getattr(settings, 'BULK_FOLLOW_LIMIT', 1000)
+
+_encoder = DjangoJSONEncoder(ensure_ascii=False)
+
+
+def api_login_required(view):
+    # Clientes da API esperam 401, não o redirecionamento para a página de login
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'detail': 'Autenticação necessária.'}, status=401)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def make_etag(*parts):
+    return hashlib.md5(_encoder.encode(parts).encode()).hexdigest()
+
+
+def stream_json(head, key, rows):
+    """Resposta no formato ``{**head, key: [...rows]}`` escrita linha a linha."""
+    def chunks():
+        yield f'{_encoder.encode(head)[:-1]}, {_encoder.encode(key)}: ['
+        separator = ''
+        for row in rows:
+            yield separator + _encoder.encode(row)
+            separator = ', '
+        yield ']}'
+
+    return StreamingHttpResponse(chunks(), content_type='application/json')
+
+
+def _comments_etag(request, username):
+    state = Comment.objects.filter(user__username=username).aggregate(
+        latest=Max('created_at'), edited=Max('edited_at'), total=Count('pk'),
+    )
+    return make_etag('comments', username, state)
+
+
+def _follows_etag(field):
+    def etag(request, username):
+        state = Follow.objects.filter(**{f'{field}__username': username}).aggregate(latest=Max('created_at'), total=Count('pk'))
+        return make_etag(field, username, state)
+    return etag
+
+
+def _feed_etag(request):
+    return make_etag('feed', request.user.id, timeline.timeline_state(request.user))
+
+
+# Feed da página inicial do usuário logado
+@require_GET
+@api_login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_feed_etag)
+def feed_api(request):
+    rows = timeline.iter_timeline(request.user, CHUNK_SIZE)
+    return stream_json({'user': request.user.username}, 'comments', rows)
+
+
+# Comentários de um usuário
+@require_GET
+@api_login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_comments_etag)
+def comments_api(request, username):
+    profile = get_object_or_404(Profile.objects.select_related('user'), user__username=username)
+    user = profile.user
+    return stream_json({'user': user.username}, 'comments', archive.iter_comments(user, profile, CHUNK_SIZE))
+
+
+def _follow_list(user, field, other):
+    follows = Follow.objects.filter(**{field: user}).order_by('-created_at', '-id').values_list(f'{other}__username', 'created_at')
+    for username, created_at in follows.iterator(chunk_size=CHUNK_SIZE):
+        yield {'username': username, 'since': created_at}
+
+
+# Quem o usuário segue
+@require_GET
+@api_login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_follows_etag('follower'))
+def following_api(request, username):
+    user = get_object_or_404(User, username=username)
+    return stream_json({'user': user.username}, 'following', _follow_list(user, 'follower', 'followed'))
+
+
+# Quem segue o usuário
+@require_GET
+@api_login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_follows_etag('followed'))
+def followers_api(request, username):
+    user = get_object_or_404(User, username=username)
+    return stream_json({'user': user.username}, 'followers', _follow_list(user, 'followed', 'follower'))
+
+
+def _edge_format(request, default):
+    format = request.GET.get('format', default)
+    return format if format in graph.FORMATS else None
+
+
+# Segue e deixa de seguir vários usuários: {"follow": [...], "unfollow": [...]}
+@require_POST
+@api_login_required
+@retry_if_locked
+def follows_api(request):
+    try:
+        data = json.loads(request.body)
+        follow = [str(name) for name in data.get('follow', [])]
+        unfollow = [str(name) for name in data.get('unfollow', [])]
+    except (ValueError, AttributeError, TypeError):
+        return JsonResponse({'detail': 'Envie {"follow": [...], "unfollow": [...]} em JSON.'}, status=400)
+    if len(follow) + len(unfollow) > BULK_FOLLOW_LIMIT:
+        return JsonResponse({'detail': f'No máximo {BULK_FOLLOW_LIMIT} nomes por requisição.'}, status=400)
+    stats = graph.follow_many(request.user, follow) if follow else {}
+    removed = graph.unfollow_many(request.user, unfollow) if unfollow else 0
+    return JsonResponse({
+        'created': stats.get('created', 0),
+        'existing': stats.get('existing', 0),
+        'unknown': stats.get('unknown', 0),
+        'removed': removed,
+    })
+
+
+# Importa arestas seguidor -> seguido do corpo da requisição (só equipe)
+@require_POST
+@api_login_required
+def import_follows_api(request):
+    if not request.user.is_staff:
+        return JsonResponse({'detail': 'Só a equipe pode importar follows.'}, status=403)
+    format = _edge_format(request, 'csv' if request.content_type == 'text/csv' else 'jsonl')
+    if format is None:
+        return JsonResponse({'detail': 'Formato deve ser csv ou jsonl.'}, status=400)
+    invalid = Counter()
+    # Iterar a requisição lê o corpo linha a linha, sem carregar tudo em memória
+    lines = (line.decode('utf-8') for line in request)
+    stats = graph.import_edges(graph.read_edges(lines, format, invalid))
+    stats.update(invalid)
+    return JsonResponse(dict(stats))
+
+
+# Exporta as arestas de um usuário no formato aceito pela importação
+@require_GET
+@api_login_required
+def graph_api(request, username):
+    user = get_object_or_404(User, username=username)
+    format = _edge_format(request, 'jsonl')
+    if format is None:
+        return JsonResponse({'detail': 'Formato deve ser csv ou jsonl.'}, status=400)
+    response = StreamingHttpResponse(graph.write_edges(graph.iter_edges(user), format), content_type=graph.FORMATS[format])
+    response['Content-Disposition'] = f'attachment; filename="{user.username}-follows.{format}"'
+    return response
@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from .db import configure_connection
+        from .perf import install_query_wrapper, instrument_templates
+        connection_created.connect(configure_connection, dispatch_uid='core.db.configure_connection')
+        connection_created.connect(install_query_wrapper, dispatch_uid='core.perf.install_query_wrapper')
+        instrument_templates()
@@ -0,0 +1,132 @@
+# archive.py
+"""Arquivo dos comentários antigos: tabela quente pequena, histórico em outro banco.
+
+O comando ``archive_comments`` move em lotes os comentários mais velhos que
+``COMMENT_ARCHIVE_AGE_DAYS`` para ``ArchivedComment``, no banco ``archive``
+(ver ``core/routers.py``). Com isso a tabela ``core_comment`` e os índices
+dela guardam só a janela recente. O ``Profile.archived_until`` de cada
+autor marca até onde o histórico dele foi arquivado.
+
+As listas de comentários de um perfil continuam paginadas por cursor. O
+banco de arquivo só é lido quando a página passa do fim da janela quente
+ou quando o cursor já está antes de ``archived_until``. Como tudo o que é
+arquivado é mais velho que tudo o que ficou, a página da fronteira é só a
+junção das duas consultas.
+
+Comentários arquivados são somente leitura. Eles saem da linha do tempo,
+das páginas de hashtag e da busca, porque essas linhas caem em cascata
+junto com o comentário.
+"""
+import heapq
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from . import caching
+from .models import ArchivedComment, Comment, Profile
+from .pagination import alist, build_page, get_cursor, get_page_size, page_queryset
+from .routers import ARCHIVE_ALIAS
+
+AGE = timedelta(days=getattr(settings, 'COMMENT_ARCHIVE_AGE_DAYS', 365))
+BATCH_SIZE = 1000
+
+
+def archived_comments(user_id):
+    return ArchivedComment.objects.filter(user_id=user_id).only('username', 'content', 'created_at', 'edited_at', 'media_id')
+
+
+def _needs_archive(profile, cursor, found, size):
+    if profile.archived_until is None:
+        return False
+    # Acabou a janela quente, ou o cursor já está no trecho arquivado
+    return found <= size or (cursor is not None and cursor.created_at <= profile.archived_until)
+
+
+def _merge(hot, cold, cursor, size):
+    # Um lote interrompido entre as duas escritas deixa o comentário nos dois bancos
+    descending = cursor is None or not cursor.is_previous
+    seen = set()
+    rows = []
+    for comment in heapq.merge(hot, cold, key=lambda c: (c.created_at, c.id), reverse=descending):
+        if comment.id not in seen:
+            seen.add(comment.id)
+            rows.append(comment)
+    return rows[:size + 1]
+
+
+def paginate_comments(comments, profile, request):
+    """Como ``paginate(comments, request)``, continuando no arquivo de ``profile`` quando preciso."""
+    cursor, size = get_cursor(request), get_page_size(request)
+    rows = list(page_queryset(comments, cursor, size))
+    if _needs_archive(profile, cursor, len(rows), size):
+        rows = _merge(rows, page_queryset(archived_comments(profile.user_id), cursor, size), cursor, size)
+    return build_page(rows, cursor, size)
+
+
+async def apaginate_comments(comments, profile, request):
+    """Versão assíncrona de ``paginate_comments``."""
+    cursor, size = get_cursor(request), get_page_size(request)
+    rows = await alist(page_queryset(comments, cursor, size))
+    if _needs_archive(profile, cursor, len(rows), size):
+        cold = await alist(page_queryset(archived_comments(profile.user_id), cursor, size))
+        rows = _merge(rows, cold, cursor, size)
+    return build_page(rows, cursor, size)
+
+
+def iter_comments(user, profile, chunk_size):
+    """Todos os comentários de ``user``, do mais novo para o mais antigo, como dicionários."""
+    fields = ('id', 'content', 'created_at', 'edited_at')
+    yield from Comment.objects.filter(user=user).order_by('-created_at', '-id').values(*fields).iterator(chunk_size=chunk_size)
+    if profile.archived_until is not None:
+        cold = ArchivedComment.objects.filter(user_id=user.id).order_by('-created_at', '-id').values(*fields)
+        yield from cold.iterator(chunk_size=chunk_size)
+
+
+def archive_batch(cutoff, batch_size=BATCH_SIZE):
+    """Move até ``batch_size`` comentários anteriores a ``cutoff`` para o arquivo. Retorna quantos moveu.
+
+    Primeiro grava no arquivo e só depois apaga do banco principal. Se o
+    processo cair entre as duas escritas, o lote é refeito na próxima vez
+    (as cópias já gravadas são ignoradas).
+    """
+    batch = list(
+        Comment.objects.filter(created_at__lt=cutoff).order_by('id').select_related('user')
+        .only('id', 'user_id', 'user__username', 'content', 'created_at', 'edited_at', 'media')[:batch_size]
+    )
+    if not batch:
+        return 0
+    with transaction.atomic(using=ARCHIVE_ALIAS):
+        ArchivedComment.objects.bulk_create(
+            [
+                ArchivedComment(
+                    id=comment.id, user_id=comment.user_id, username=comment.user.username,
+                    content=comment.content, created_at=comment.created_at, edited_at=comment.edited_at,
+                    media_id=comment.media_id,
+                )
+                for comment in batch
+            ],
+            ignore_conflicts=True,
+        )
+    user_ids = {comment.user_id for comment in batch}
+    with transaction.atomic():
+        # archived_until recebe o cutoff: nada anterior a ele continua na tabela quente
+        Profile.objects.filter(user_id__in=user_ids).update(
+            archived_until=Greatest(Coalesce('archived_until', Value(cutoff)), Value(cutoff)),
+        )
+        Comment.objects.filter(id__in=[comment.id for comment in batch]).delete()
+        transaction.on_commit(lambda: caching.comments_changed(*user_ids))
+    return len(batch)
+
+
+def archive(age=AGE, batch_size=BATCH_SIZE, log=print):
+    """Arquiva todos os comentários mais velhos que ``age``. Retorna quantos moveu."""
+    cutoff = timezone.now() - age
+    total = 0
+    while moved := archive_batch(cutoff, batch_size):
+        total += moved
+        log(f'{total} comentários arquivados')
+    return total
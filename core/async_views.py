@@ -0,0 +1,95 @@
+# async_views.py
+"""Versões assíncronas das views de leitura, usadas quando o projeto roda sob ASGI.
+
+Usam a ORM assíncrona do Django, então esperar o banco não prende o event
+loop. As consultas continuam rodando uma de cada vez, na mesma thread do
+ORM (``sync_to_async(thread_sensitive=True)``), por isso são feitas em
+sequência. A renderização continua síncrona: todos os dados usados nos
+templates são carregados antes de ``render()``.
+"""
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import aget_object_or_404, render
+from django.template.loader import render_to_string
+
+from . import archive, caching, notifications, suggestions, timeline
+from .models import Follow, Profile
+from .pagination import apaginate, get_cursor, get_page_size
+from .replicas import read_from_replica
+from .views import user_comments
+
+
+async def _resolve_user(request):
+    # Evita que o template resolva request.user (e o selo de notificações) de forma síncrona
+    request.user = await request.auser()
+    if request.user.is_authenticated:
+        request.unread_notifications = await notifications.aunread_count(request.user)
+    return request.user
+
+
+async def acomments_fragment(request, name, profile):
+    user = profile.user
+    stamp, = caching.versions(('comments', user.id))
+    key = caching.fragment_key(name, user.id, stamp, request.GET.get('cursor', ''), get_page_size(request))
+
+    async def render_comments():
+        page = await archive.apaginate_comments(user_comments(user), profile, request)
+        return render_to_string(f'{name}_comments.html', {'comments': page, 'page': page}, request)
+
+    return await caching.aget_or_render(name, key, render_comments)
+
+
+# Página principal
+@read_from_replica
+async def index(request):
+    user = await _resolve_user(request)
+    comments_html = ''
+    people = []
+    if user.is_authenticated:
+        cursor, size = get_cursor(request), get_page_size(request)
+        celebrity_ids = await timeline.acelebrity_ids(user)
+        stamps = caching.versions(('feed', user.id), *(('comments', user_id) for user_id in celebrity_ids))
+        key = caching.fragment_key('index', user.id, request.GET.get('cursor', ''), size, *stamps)
+
+        async def render_comments():
+            page = await timeline.aget_timeline(user, cursor, size, celebrity_ids)
+            return render_to_string('index_comments.html', {'comments': page, 'page': page}, request)
+
+        comments_html = await caching.aget_or_render('index', key, render_comments)
+        people = await suggestions.aget_suggestions(user)
+
+    return render(request, 'index.html', {'comments_html': comments_html, 'suggestions': people})
+
+
+# Página para o perfil dos outros usuários
+@login_required
+@read_from_replica
+async def other_profile_view(request, username):
+    user = await _resolve_user(request)
+    profile = await aget_object_or_404(Profile.objects.select_related('user'), user__username=username)
+
+    comments_html = await acomments_fragment(request, 'other_profile', profile)
+    is_following = await Follow.objects.filter(follower=user, followed=profile.user).aexists()
+
+    return render(request, 'other_profile.html', {'profile': profile, 'comments_html': comments_html, 'is_following': is_following})
+
+
+# Página para a lista de seguidores
+@login_required
+@read_from_replica
+async def following_list_view(request):
+    user = await _resolve_user(request)
+    following = Follow.objects.filter(follower=user).select_related('followed').only('created_at', 'followed__username')
+    page = await apaginate(following, request)
+    followed_users = [follow.followed for follow in page]
+    return render(request, 'followingList.html', {'followed_users': followed_users, 'page': page})
+
+
+# Página para a lista de quem segue você
+@login_required
+@read_from_replica
+async def followed_list_view(request):
+    user = await _resolve_user(request)
+    followers = Follow.objects.filter(followed=user).select_related('follower').only('created_at', 'follower__username')
+    page = await apaginate(followers, request)
+    follower_users = [follow.follower for follow in page]
+    return render(request, 'followedList.html', {'follower_users': follower_users, 'page': page})
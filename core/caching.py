@@ -0,0 +1,127 @@
+# caching.py
+"""Cache dos fragmentos renderizados (listas de comentários) das páginas.
+
+Cada fragmento é guardado sob uma chave que inclui o "carimbo de versão" dos
+dados de que ele depende. Escritas não apagam fragmentos: apenas trocam o
+carimbo, e a chave antiga deixa de ser usada até expirar ou ser despejada
+pelo LRU do backend.
+
+Carimbos:
+
+* ``comments:<user_id>`` muda quando o usuário cria, edita ou apaga um comentário;
+* ``feed:<user_id>`` muda quando o usuário segue/deixa de seguir alguém ou quando
+  um seguido (sem fan-out na leitura) altera seus comentários.
+"""
+import hashlib
+import threading
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.middleware.csrf import get_token
+from django.utils.safestring import mark_safe
+
+from . import replicas, timeline
+from .models import Follow, Profile
+
+TIMEOUT = getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 300)
+
+_lock = threading.Lock()
+_hits = Counter()
+_misses = Counter()
+
+
+def _version_key(scope, user_id):
+    return f'core:v:{scope}:{user_id}'
+
+
+def bump(scope, user_ids):
+    """Troca o carimbo de ``scope`` dos usuários em ``user_ids``."""
+    token = uuid.uuid4().hex[:12]
+    cache.set_many({_version_key(scope, user_id): token for user_id in user_ids}, None)
+
+
+def versions(*pairs):
+    """Carimbos atuais para os pares ``(scope, user_id)``, numa única ida ao cache."""
+    keys = [_version_key(scope, user_id) for scope, user_id in pairs]
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        # Carimbo despejado ou nunca criado: um valor novo impede reaproveitar fragmentos antigos
+        token = uuid.uuid4().hex[:12]
+        for key in missing:
+            if cache.add(key, token, None):
+                found[key] = token
+            else:
+                found[key] = cache.get(key, token)
+    return [found[key] for key in keys]
+
+
+def comments_changed(*author_ids):
+    """Invalida a lista de comentários dos autores e, se houver fan-out, o feed dos seguidores."""
+    bump('comments', author_ids)
+    celebrities = set(
+        Profile.objects.filter(user_id__in=author_ids, followers_count__gt=timeline.FANOUT_LIMIT).values_list('user_id', flat=True)
+    )
+    fanned_out = set(author_ids) - celebrities
+    if fanned_out:
+        follower_ids = Follow.objects.filter(followed_id__in=fanned_out).values_list('follower_id', flat=True).distinct()
+        bump('feed', list(follower_ids))
+
+
+def follows_changed(*follower_ids):
+    bump('feed', follower_ids)
+
+
+def fragment_key(name, *parts):
+    digest = hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+    return f'core:frag:{name}:{digest}'
+
+
+def csrf_part(request):
+    # Fragmentos com formulários dependem do segredo CSRF do navegador
+    get_token(request)
+    return request.META.get('CSRF_COOKIE', '')
+
+
+def _lookup(name, key):
+    html = cache.get(key)
+    with _lock:
+        (_misses if html is None else _hits)[name] += 1
+    return html
+
+
+def _timeout():
+    # Lido de uma réplica o fragmento pode estar atrasado; fica só até ela alcançar o principal
+    return min(TIMEOUT, replicas.STICKY_SECONDS) if replicas.current() else TIMEOUT
+
+
+def get_or_render(name, key, render):
+    """Devolve o fragmento ``key`` do cache ou chama ``render()`` e guarda o resultado."""
+    html = _lookup(name, key)
+    if html is None:
+        html = render()
+        cache.set(key, str(html), _timeout())
+    return mark_safe(html)
+
+
+async def aget_or_render(name, key, render):
+    """Como ``get_or_render``, mas ``render()`` é uma corrotina.
+
+    O acesso ao cache em si continua síncrono: os backends locais não tocam no banco.
+    """
+    html = _lookup(name, key)
+    if html is None:
+        html = await render()
+        cache.set(key, str(html), _timeout())
+    return mark_safe(html)
+
+
+def stats():
+    with _lock:
+        names = sorted(set(_hits) | set(_misses))
+        return {
+            name: {'hits': _hits[name], 'misses': _misses[name]}
+            for name in names
+        }
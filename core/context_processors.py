@@ -0,0 +1,14 @@
+# context_processors.py
+from .notifications import unread_count
+
+
+# Número de notificações não lidas para o selo do base.html
+def notifications(request):
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {}
+    # As views assíncronas já buscaram o número (ver async_views._resolve_user):
+    # durante a renderização não dá para consultar o banco de dentro do event loop
+    if hasattr(request, 'unread_notifications'):
+        return {'unread_notifications': request.unread_notifications}
+    return {'unread_notifications': unread_count(user)}
@@ -0,0 +1,56 @@
+# counters.py
+"""Contadores desnormalizados do Profile.
+
+As atualizações usam expressões F() para que o incremento aconteça no banco,
+sem corrida entre workers; ``apply`` recebe as variações já somadas de um
+lote da fila (core/jobs.py). ``rebuild`` recalcula tudo a partir de
+Follow, Comment e ArchivedComment para corrigir divergências.
+"""
+from django.db.models import Count, F
+
+from .models import ArchivedComment, Comment, Follow, Profile
+
+
+def apply(deltas):
+    """Aplica de uma vez ``{user_id: {campo: delta}}``, com um único ``bulk_update`` de expressões F()."""
+    fields = sorted({field for changes in deltas.values() for field, delta in changes.items() if delta})
+    if not fields:
+        return
+    profiles = list(Profile.objects.filter(user_id__in=list(deltas)).only('id', 'user_id'))
+    for profile in profiles:
+        for field in fields:
+            setattr(profile, field, F(field) + deltas[profile.user_id].get(field, 0))
+    Profile.objects.bulk_update(profiles, fields)
+
+
+def _counts(queryset, field, user_ids):
+    rows = queryset.filter(**{f'{field}__in': user_ids}).values(field).annotate(n=Count('id')).order_by()
+    return {row[field]: row['n'] for row in rows}
+
+
+def rebuild(user_ids):
+    """Recalcula os contadores dos perfis de ``user_ids``. Retorna quantos mudaram."""
+    user_ids = list(user_ids)
+    profiles = list(Profile.objects.filter(user_id__in=user_ids).only(
+        'user_id', 'followers_count', 'following_count', 'comments_count', 'archived_until'
+    ))
+    followers = _counts(Follow.objects, 'followed', user_ids)
+    following = _counts(Follow.objects, 'follower', user_ids)
+    comments = _counts(Comment.objects, 'user', user_ids)
+    # comments_count inclui os comentários arquivados; o arquivo só é lido para quem tem algum
+    archived_ids = [profile.user_id for profile in profiles if profile.archived_until is not None]
+    if archived_ids:
+        for user_id, archived in _counts(ArchivedComment.objects, 'user_id', archived_ids).items():
+            comments[user_id] = comments.get(user_id, 0) + archived
+    changed = []
+    for profile in profiles:
+        expected = (
+            followers.get(profile.user_id, 0),
+            following.get(profile.user_id, 0),
+            comments.get(profile.user_id, 0),
+        )
+        if expected != (profile.followers_count, profile.following_count, profile.comments_count):
+            profile.followers_count, profile.following_count, profile.comments_count = expected
+            changed.append(profile)
+    Profile.objects.bulk_update(changed, ['followers_count', 'following_count', 'comments_count'])
+    return len(changed)
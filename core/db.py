@@ -0,0 +1,48 @@
+# db.py
+"""Ajustes do SQLite para produção e nova tentativa de escritas bloqueadas.
+
+Com ``DJANGO_DB_PROFILE=production`` o settings define ``SQLITE_PRAGMAS`` e
+``configure_connection`` aplica esses PRAGMAs em cada conexão nova (WAL,
+``synchronous=NORMAL``, mmap e cache de páginas maior). ``retry_if_locked``
+repete a view quando a escrita esbarra em "database is locked".
+"""
+import functools
+import random
+import time
+
+from django.conf import settings
+from django.db import OperationalError
+
+RETRIES = getattr(settings, 'SQLITE_WRITE_RETRIES', 5)
+BACKOFF = getattr(settings, 'SQLITE_WRITE_BACKOFF', 0.05)
+
+
+def configure_connection(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def is_locked_error(error):
+    return 'locked' in str(error) or 'busy' in str(error)
+
+
+def retry_if_locked(view):
+    """Repete a view com espera exponencial (e um pouco de aleatoriedade) se o banco estiver ocupado.
+
+    Só é seguro em views cujas escritas estão dentro de ``transaction.atomic``:
+    a tentativa que falhou já foi desfeita quando a exceção chega aqui.
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        for attempt in range(RETRIES):
+            try:
+                return view(request, *args, **kwargs)
+            except OperationalError as error:
+                if not is_locked_error(error) or attempt == RETRIES - 1:
+                    raise
+                time.sleep(BACKOFF * 2 ** attempt * (1 + random.random()))
+    return wrapper
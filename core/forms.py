@@ -3,6 +3,7 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib.auth.models import User
 from .models import Profile, Comment
+from . import media
 
 # Formulário para criação de login de usuário
 class CustomUserCreationForm(UserCreationForm):
@@ -23,9 +24,23 @@ class ProfileForm(forms.ModelForm):
 
 # Formulário para comentários
 class CommentForm(forms.ModelForm):
+    # FileField e não ImageField: o tipo e as dimensões vêm do cabeçalho, sem o Pillow (ver core/media.py)
+    image = forms.FileField(label='Imagem', required=False, widget=forms.ClearableFileInput(attrs={'accept': 'image/*'}))
+
     class Meta:
         model = Comment
         fields = ['content']
         widgets = {
             'content': forms.Textarea(attrs={'class': 'form-control', 'rows': 3, 'placeholder': 'Deixe um comentário'}),
         }
+
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if not image:
+            return None
+        if image.size > media.MAX_UPLOAD_SIZE:
+            raise forms.ValidationError(f'A imagem pode ter no máximo {media.MAX_UPLOAD_SIZE // (1024 * 1024)} MB.')
+        image.info = media.image_info(image)
+        if image.info is None:
+            raise forms.ValidationError('Envie uma imagem PNG, JPEG, GIF ou WebP.')
+        return image
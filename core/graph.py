@@ -0,0 +1,170 @@
+# graph.py
+"""Follows em lote: importação de arestas, follow/unfollow de vários usuários e exportação.
+
+Uma aresta é o par ``(seguidor, seguido)`` em nomes de usuário. A entrada
+pode ser CSV (``follower,followed``, cabeçalho opcional) ou JSONL (uma linha
+``{"follower": ..., "followed": ...}`` por aresta), lida como fluxo: só um
+lote de ``FOLLOW_IMPORT_BATCH_SIZE`` arestas fica em memória.
+
+Cada lote faz uma consulta ``in_bulk`` para os nomes, uma para os follows
+que já existem, um ``bulk_create(ignore_conflicts=True)`` e uma para saber
+quais pares o insert de fato criou, tudo numa transação que também grava
+uma única ``Job`` ``follows_added`` com esses pares. Contadores, sugestões
+e carimbos do cache ficam com a fila, como nos follows um a um. Na
+importação as notificações ficam desligadas: replicar uma comunidade não
+deve avisar cada usuário de cada seguidor.
+
+A exportação gera as mesmas linhas (CSV ou JSONL), então o arquivo de um
+usuário pode ser importado de volta.
+"""
+import csv
+import io
+import json
+from collections import Counter
+from itertools import chain, islice
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Max
+
+from . import caching, jobs
+from .models import Follow
+
+BATCH_SIZE = getattr(settings, 'FOLLOW_IMPORT_BATCH_SIZE', 1000)
+CHUNK_SIZE = getattr(settings, 'API_CHUNK_SIZE', 2000)
+FIELDS = ('follower', 'followed')
+FORMATS = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+
+
+def read_edges(lines, format, stats):
+    """Arestas de ``lines`` (texto, uma por linha). Linhas inválidas são contadas em ``stats['invalid']``."""
+    if format == 'csv':
+        for row in csv.reader(lines):
+            row = [value.strip() for value in row]
+            if not any(row) or row[0].startswith('#') or tuple(row[:2]) == FIELDS:
+                continue
+            if len(row) < 2 or not all(row[:2]):
+                stats['invalid'] += 1
+                continue
+            yield row[0], row[1]
+    elif format == 'jsonl':
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+                yield str(data['follower']), str(data['followed'])
+            except (ValueError, KeyError, TypeError):
+                stats['invalid'] += 1
+    else:
+        raise ValueError(f'Formato desconhecido: {format}')
+
+
+def import_edges(edges, batch_size=BATCH_SIZE, notify=False, log=None):
+    """Cria os follows de ``edges`` em lotes. Retorna um ``Counter`` com o resultado.
+
+    Chaves: ``created``, ``existing`` (já seguia ou repetida), ``unknown``
+    (usuário inexistente), ``self`` (seguir a si mesmo) e ``invalid``
+    (preenchida por ``read_edges``).
+    """
+    stats = Counter()
+    edges = iter(edges)
+    while batch := list(islice(edges, batch_size)):
+        with transaction.atomic():
+            _import_batch(batch, stats, notify)
+        if log:
+            log(f"{stats['created']} follows criados")
+    return stats
+
+
+def _import_batch(batch, stats, notify):
+    names = {name for edge in batch for name in edge}
+    users = User.objects.only('id', 'username').in_bulk(names, field_name='username')
+    # dict em vez de set para manter a ordem do arquivo
+    pairs = {}
+    for follower, followed in batch:
+        if follower not in users or followed not in users:
+            stats['unknown'] += 1
+        elif follower == followed:
+            stats['self'] += 1
+        elif (users[follower].id, users[followed].id) in pairs:
+            stats['existing'] += 1
+        else:
+            pairs[(users[follower].id, users[followed].id)] = None
+    if not pairs:
+        return
+    followers = {follower for follower, _ in pairs}
+    followed = {followed for _, followed in pairs}
+    last_id = Follow.objects.aggregate(last=Max('id'))['last'] or 0
+    existing = set(Follow.objects.filter(
+        follower_id__in=followers, followed_id__in=followed,
+    ).values_list('follower_id', 'followed_id'))
+    new = [pair for pair in pairs if pair not in existing]
+    if new:
+        # ignore_conflicts cobre um follow criado por outra requisição entre a leitura e o insert
+        Follow.objects.bulk_create(
+            [Follow(follower_id=follower, followed_id=followed) for follower, followed in new],
+            batch_size=BATCH_SIZE, ignore_conflicts=True,
+        )
+        # O insert não diz quais linhas entraram. Na transação só as deste lote têm id acima de
+        # last_id, então a tarefa leva só essas e um follow concorrente não é contado duas vezes
+        new = list(Follow.objects.filter(
+            id__gt=last_id, follower_id__in=followers, followed_id__in=followed,
+        ).order_by('id').values_list('follower_id', 'followed_id'))
+    stats['existing'] += len(pairs) - len(new)
+    stats['created'] += len(new)
+    if not new:
+        return
+    jobs.enqueue('follows_added', edges=new, notify=notify)
+    changed = {follower for follower, _ in new}
+    transaction.on_commit(lambda: caching.follows_changed(*changed))
+
+
+def follow_many(user, usernames):
+    """``user`` passa a seguir todos os ``usernames`` (com notificação, como no botão de seguir)."""
+    return import_edges(((user.username, name) for name in usernames), notify=True)
+
+
+def unfollow_many(user, usernames):
+    """``user`` deixa de seguir todos os ``usernames``. Retorna quantos follows foram removidos."""
+    removed = 0
+    usernames = iter(usernames)
+    while batch := list(islice(usernames, BATCH_SIZE)):
+        with transaction.atomic():
+            follows = Follow.objects.filter(follower=user, followed__username__in=batch)
+            followed_ids = list(follows.values_list('followed_id', flat=True))
+            if not followed_ids:
+                continue
+            Follow.objects.filter(follower=user, followed_id__in=followed_ids).delete()
+            jobs.enqueue('follows_removed', edges=[(user.id, followed_id) for followed_id in followed_ids])
+            transaction.on_commit(lambda: caching.follows_changed(user.id))
+        removed += len(followed_ids)
+    return removed
+
+
+def iter_edges(user):
+    """Todas as arestas de ``user``: primeiro quem ele segue, depois quem o segue."""
+    following = Follow.objects.filter(follower=user).order_by('id').values_list('followed__username', flat=True)
+    for username in following.iterator(chunk_size=CHUNK_SIZE):
+        yield user.username, username
+    followers = Follow.objects.filter(followed=user).order_by('id').values_list('follower__username', flat=True)
+    for username in followers.iterator(chunk_size=CHUNK_SIZE):
+        yield username, user.username
+
+
+def write_edges(edges, format):
+    """Linhas de texto de ``edges`` no ``format`` dado, prontas para ``read_edges``."""
+    if format == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        for row in chain([FIELDS], edges):
+            writer.writerow(row)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    elif format == 'jsonl':
+        for follower, followed in edges:
+            yield json.dumps({'follower': follower, 'followed': followed}, ensure_ascii=False) + '\n'
+    else:
+        raise ValueError(f'Formato desconhecido: {format}')
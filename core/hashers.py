@@ -0,0 +1,24 @@
+# hashers.py
+"""Hashers de senha com custo ajustável pelo settings.
+
+O custo do hash é o que domina o tempo de um login. Os parâmetros ficam em
+``PASSWORD_ARGON2`` e ``PASSWORD_PBKDF2_ITERATIONS``; quem muda o custo não
+precisa migrar nada, porque o Django refaz o hash de cada senha (com os
+parâmetros novos) no próximo login bem-sucedido do usuário.
+
+O Argon2 precisa do pacote ``argon2-cffi``; sem ele o settings usa o PBKDF2.
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, PBKDF2PasswordHasher
+
+ARGON2 = getattr(settings, 'PASSWORD_ARGON2', {})
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    time_cost = ARGON2.get('time_cost', Argon2PasswordHasher.time_cost)
+    memory_cost = ARGON2.get('memory_cost', Argon2PasswordHasher.memory_cost)
+    parallelism = ARGON2.get('parallelism', Argon2PasswordHasher.parallelism)
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    iterations = getattr(settings, 'PASSWORD_PBKDF2_ITERATIONS', PBKDF2PasswordHasher.iterations)
@@ -0,0 +1,252 @@
+# jobs.py
+"""Fila de tarefas em segundo plano guardada no banco (``Job``).
+
+As views gravam só a linha principal (comentário, follow) e, na mesma
+transação, uma ``Job`` descrevendo os efeitos colaterais: contadores, linha
+do tempo, sugestões, carimbos do cache e miniaturas de imagens. Como a
+tarefa é gravada junto com a linha, nada se perde se o processo cair antes
+de executá-la.
+
+Quem executa pega um lote de tarefas e soma os efeitos de todas antes de
+aplicar: um ``bulk_create`` para a linha do tempo e as notificações, um
+``bulk_update`` para os contadores (e para os das hashtags em alta), um
+carimbo por usuário. ``JOBS_MODE`` define quem executa:
+
+* ``thread``: uma thread do próprio processo web, acordada a cada commit (padrão);
+* ``worker``: só o comando ``runjobs``, em outro processo;
+* ``sync``: logo depois do commit, ainda dentro da requisição (útil em testes).
+"""
+import logging
+import os
+import socket
+import threading
+import traceback
+import uuid
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, transaction
+from django.db.models import Q, Subquery
+from django.utils import timezone
+
+from . import caching, counters, media, notifications, suggestions, tags, timeline, trending
+from .db import is_locked_error
+from .models import Comment, Job
+
+logger = logging.getLogger(__name__)
+
+MODE = getattr(settings, 'JOBS_MODE', 'thread')
+BATCH_SIZE = getattr(settings, 'JOBS_BATCH_SIZE', 200)
+MAX_ATTEMPTS = getattr(settings, 'JOBS_MAX_ATTEMPTS', 5)
+RETRY_DELAY = getattr(settings, 'JOBS_RETRY_DELAY', 5)
+LOCK_TIMEOUT = getattr(settings, 'JOBS_LOCK_TIMEOUT', 300)
+POLL_INTERVAL = getattr(settings, 'JOBS_POLL_INTERVAL', 1)
+
+
+def enqueue(kind, **payload):
+    """Grava a tarefa na transação atual; quem executa é avisado depois do commit."""
+    Job.objects.create(kind=kind, payload=payload)
+    transaction.on_commit(_notify)
+
+
+def _notify():
+    if MODE == 'sync':
+        drain()
+    elif MODE == 'thread':
+        background.wake()
+
+
+class Effects:
+    """Efeitos colaterais de um lote de tarefas, somados para serem aplicados de uma vez."""
+
+    def __init__(self):
+        self.counters = defaultdict(Counter)
+        self.new_comments = set()
+        self.unfollowed = set()
+        self.stale = set()
+        self.comments_changed = set()
+        self.follows_changed = set()
+        self.followed_by = defaultdict(list)
+        self.posted = Counter()
+        self.media = set()
+
+    def add(self, job):
+        getattr(self, f'on_{job.kind}')(**job.payload)
+
+    def on_comment_created(self, comment_id, author_id):
+        self.counters[author_id]['comments_count'] += 1
+        self.new_comments.add(comment_id)
+        self.comments_changed.add(author_id)
+        self.posted[author_id] += 1
+
+    def on_comment_edited(self, author_id):
+        self.comments_changed.add(author_id)
+
+    def on_comment_deleted(self, author_id):
+        # As entradas da linha do tempo já saíram em cascata com o comentário
+        self.counters[author_id]['comments_count'] -= 1
+        self.comments_changed.add(author_id)
+
+    def on_follow_added(self, follower_id, followed_id, notify=True):
+        self.counters[follower_id]['following_count'] += 1
+        self.counters[followed_id]['followers_count'] += 1
+        self.stale.add(follower_id)
+        self.follows_changed.add(follower_id)
+        if notify:
+            self.followed_by[followed_id].append(follower_id)
+
+    def on_follow_removed(self, follower_id, followed_id):
+        self.counters[follower_id]['following_count'] -= 1
+        self.counters[followed_id]['followers_count'] -= 1
+        self.stale.add(follower_id)
+        self.unfollowed.add((follower_id, followed_id))
+        self.follows_changed.add(follower_id)
+
+    def on_media_stored(self, sha256):
+        self.media.add(sha256)
+
+    def on_follows_added(self, edges, notify=True):
+        # Follows em lote (core/graph.py): uma tarefa para o lote inteiro
+        for follower_id, followed_id in edges:
+            self.on_follow_added(follower_id, followed_id, notify)
+
+    def on_follows_removed(self, edges):
+        for follower_id, followed_id in edges:
+            self.on_follow_removed(follower_id, followed_id)
+
+    def apply(self):
+        if self.unfollowed:
+            timeline.remove_authors(self.unfollowed)
+        counters.apply(self.counters)
+        if self.new_comments:
+            # Comentários apagados antes da tarefa rodar simplesmente não aparecem aqui
+            timeline.fan_out_comments(list(
+                Comment.objects.filter(id__in=self.new_comments).only('id', 'user_id', 'created_at')
+            ))
+            trending.record(tags.tag_counts(self.new_comments))
+        if self.stale:
+            suggestions.mark_stale(*self.stale)
+        notifications.notify_follows(self.followed_by)
+        notifications.notify_comments(self.posted)
+
+    def after_commit(self):
+        """Carimbos e miniaturas, depois do commit do lote.
+
+        Os carimbos vêm depois para ninguém renderizar o estado antigo sob o
+        carimbo novo; as miniaturas levam segundos e ficam fora da transação
+        para não segurar o banco. Uma falha aqui só vai para o log: o lote já
+        foi gravado e repeti-lo contaria tudo de novo.
+        """
+        try:
+            if self.comments_changed:
+                caching.comments_changed(*self.comments_changed)
+            if self.follows_changed:
+                caching.follows_changed(*self.follows_changed)
+        except Exception:
+            logger.exception('Falha ao renovar os carimbos do cache depois do lote')
+        if self.media:
+            try:
+                media.make_thumbnails(self.media)
+            except Exception:
+                logger.exception('Falha ao gerar as miniaturas de %s', sorted(self.media))
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+def claim(limit=BATCH_SIZE, worker=None):
+    """Reserva até ``limit`` tarefas prontas e as devolve."""
+    now = timezone.now()
+    token = f'{worker or worker_name()}:{uuid.uuid4().hex[:8]}'
+    ready = Job.objects.filter(
+        Q(locked_by='') | Q(locked_at__lt=now - timedelta(seconds=LOCK_TIMEOUT)),
+        run_after__lte=now,
+        attempts__lt=MAX_ATTEMPTS,
+    )
+    # O filtro se repete fora da subconsulta para dois workers não levarem a mesma tarefa
+    ready.filter(id__in=Subquery(ready.order_by('id').values('id')[:limit])).update(locked_by=token, locked_at=now)
+    return list(Job.objects.filter(locked_by=token).order_by('id'))
+
+
+def run(jobs):
+    """Aplica as tarefas juntas; se o lote falhar, tenta uma a uma para isolar a culpada."""
+    try:
+        effects = _run_together(jobs)
+    except Exception as error:
+        if len(jobs) == 1:
+            _fail(jobs[0], error)
+            return 0
+        return sum(run([job]) for job in jobs)
+    # Fora do try: o lote já está gravado e não pode voltar para a fila
+    effects.after_commit()
+    return len(jobs)
+
+
+def _run_together(jobs):
+    effects = Effects()
+    for job in jobs:
+        effects.add(job)
+    with transaction.atomic():
+        effects.apply()
+        Job.objects.filter(id__in=[job.id for job in jobs]).delete()
+    return effects
+
+
+def _fail(job, error):
+    now = timezone.now()
+    if isinstance(error, OperationalError) and is_locked_error(error):
+        # Banco ocupado não conta como tentativa
+        Job.objects.filter(id=job.id).update(locked_by='', locked_at=None, run_after=now)
+        return
+    logger.exception('Tarefa %s falhou (tentativa %d)', job, job.attempts + 1, exc_info=error)
+    Job.objects.filter(id=job.id).update(
+        attempts=job.attempts + 1,
+        last_error=''.join(traceback.format_exception(error)),
+        locked_by='',
+        locked_at=None,
+        run_after=now + timedelta(seconds=RETRY_DELAY * 2 ** job.attempts),
+    )
+
+
+def drain(limit=BATCH_SIZE, worker=None):
+    """Executa tarefas prontas até a fila esvaziar. Retorna quantas deram certo."""
+    done = 0
+    while jobs := claim(limit, worker):
+        done += run(jobs)
+        if len(jobs) < limit:
+            break
+    return done
+
+
+class Background:
+    """Thread do processo web que esvazia a fila quando acordada (ou a cada ``POLL_INTERVAL``)."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def wake(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.loop, name='core-jobs', daemon=True)
+                self.thread.start()
+        self.event.set()
+
+    def loop(self):
+        while True:
+            self.event.wait(POLL_INTERVAL)
+            self.event.clear()
+            close_old_connections()
+            try:
+                drain()
+            except OperationalError as error:
+                if not is_locked_error(error):
+                    logger.exception('Falha ao executar a fila de tarefas')
+            except Exception:
+                logger.exception('Falha ao executar a fila de tarefas')
+
+
+background = Background()
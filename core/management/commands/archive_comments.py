@@ -0,0 +1,25 @@
+# archive_comments.py
+"""Move os comentários antigos para o banco de arquivo (ver core/archive.py).
+
+O banco ``archive`` precisa das tabelas antes da primeira execução::
+
+    python manage.py migrate --database archive
+    python manage.py archive_comments --days 365
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from core import archive
+
+
+class Command(BaseCommand):
+    help = 'Move em lotes os comentários mais velhos que --days para o banco de arquivo.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=archive.AGE.days)
+        parser.add_argument('--batch-size', type=int, default=archive.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        total = archive.archive(timedelta(days=options['days']), options['batch_size'], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(f'{total} comentários arquivados.'))
@@ -0,0 +1,132 @@
+# benchauth.py
+"""Mede o custo do login e da leitura da sessão em um banco de teste.
+
+Três partes: o tempo de um hash de senha para cada hasher disponível (e para
+o PBKDF2 em outras contagens de iterações), a vazão do login pela view
+(com quantos hashes cada login calcula) e o custo de carregar a sessão de
+uma requisição autenticada com os backends ``db`` e ``cached_db``::
+
+    python manage.py benchauth --logins 20 --pbkdf2-iterations 260000 600000 1000000
+"""
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher, get_hashers
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment,
+)
+from django.urls import reverse
+
+from core.hashers import TunedPBKDF2PasswordHasher
+from core.models import Profile
+from core.seeding import PASSWORD
+
+SESSION_ENGINES = ('django.contrib.sessions.backends.db', 'django.contrib.sessions.backends.cached_db')
+
+
+def timed(function, repeat):
+    """Mediana, em ms, de ``repeat`` chamadas de ``function``."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+class Command(BaseCommand):
+    help = 'Mede o hash de senha, a vazão do login e o custo de carregar a sessão.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=10)
+        parser.add_argument('--sessions', type=int, default=500, help='Leituras de sessão por backend.')
+        parser.add_argument('--repeat', type=int, default=3, help='Hashes por hasher.')
+        parser.add_argument('--pbkdf2-iterations', type=int, nargs='*', default=[])
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.hashers(options['repeat'], options['pbkdf2_iterations'])
+            self.logins(options['logins'])
+            self.sessions(options['sessions'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def hashers(self, repeat, iterations):
+        self.stdout.write(f'Hasher padrão: {get_hasher().algorithm} (DJANGO_PASSWORD_HASHER={settings.PASSWORD_HASHER})')
+        hashers = []
+        for hasher in get_hashers():
+            if hasher.library:
+                try:
+                    hasher._load_library()
+                except ValueError:
+                    continue  # Biblioteca opcional não instalada
+            hashers.append((type(hasher).__name__, hasher))
+        for count in iterations:
+            hasher = TunedPBKDF2PasswordHasher()
+            hasher.iterations = count
+            hashers.append((f'PBKDF2 {count} iterações', hasher))
+        for name, hasher in hashers:
+            encoded = hasher.encode(PASSWORD, hasher.salt())
+            ms = timed(lambda: hasher.verify(PASSWORD, encoded), repeat)
+            self.stdout.write(f'  {name:<36} {ms:>9.2f} ms por verificação')
+
+    def logins(self, total):
+        user = User.objects.create_user('login-bench', password=PASSWORD)
+        Profile.objects.create(user=user)
+        hasher = get_hasher()
+        calls = 0
+        verify = hasher.verify
+
+        def counting_verify(*args):
+            nonlocal calls
+            calls += 1
+            return verify(*args)
+
+        # get_hashers guarda as instâncias, então o login usa esta mesma
+        hasher.verify = counting_verify
+        url = reverse('login')
+        try:
+            start = time.perf_counter()
+            # Todos os logins vêm do mesmo IP; o limite de tentativas por IP barraria a medição
+            with override_settings(RATELIMIT_ENABLED=False):
+                for _ in range(total):
+                    response = Client().post(url, {'username': user.username, 'password': PASSWORD})
+                    if response.status_code != 302:
+                        raise CommandError(f'Login falhou (status {response.status_code}).')
+            elapsed = time.perf_counter() - start
+        finally:
+            del hasher.verify
+        self.stdout.write(
+            f'Login: {total / elapsed:.1f} logins/s, {elapsed / total * 1000:.1f} ms por login, '
+            f'{calls / total:.1f} hash(es) por login'
+        )
+
+    def sessions(self, total):
+        user = User.objects.get(username='login-bench')
+        url = reverse('profile_edit')
+        self.stdout.write('Sessão por requisição autenticada:')
+        for engine in SESSION_ENGINES:
+            caches[settings.SESSION_CACHE_ALIAS].clear()
+            with override_settings(SESSION_ENGINE=engine):
+                client = Client()
+                client.force_login(user)
+                client.get(url)
+                with CaptureQueriesContext(connection) as queries:
+                    client.get(url)
+                session_queries = sum('django_session' in query['sql'] for query in queries)
+                store = client.session.__class__
+                key = client.session.session_key
+                ms = timed(lambda: store(key).load(), total)
+            self.stdout.write(
+                f'  {engine.rsplit(".", 1)[1]:<10} {ms * 1000:>8.1f} µs por leitura, '
+                f'{session_queries} consulta(s) em django_session por requisição'
+            )
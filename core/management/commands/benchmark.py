@@ -0,0 +1,130 @@
+# benchmark.py
+"""Benchmark reprodutível de todas as URLs de ``core/urls.py``.
+
+Para cada tamanho de base cria um banco de teste, popula com ``seed_dataset``
+e mede cada URL como o usuário que mais segue gente: percentis de latência,
+número de consultas SQL e pico de memória. O resultado vai para um JSON
+que pode ser comparado entre execuções::
+
+    python manage.py benchmark --sizes 1000 10000 --requests 50 --output bench.json
+"""
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+
+import django
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment
+
+from core.models import Profile
+from core.seeding import PASSWORD, sample_urls, seed_dataset
+
+
+def fetch(client, url):
+    response = client.get(url)
+    # Respostas em streaming só consultam o banco quando o corpo é lido
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = 'Mede latência, consultas e memória de cada URL do app em bases de tamanhos fixos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000], help='Usuários por base.')
+        parser.add_argument('--comments-per-user', type=int, default=10)
+        parser.add_argument('--avg-follows', type=int, default=30)
+        parser.add_argument('--requests', type=int, default=30, help='Requisições por URL.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--cold-cache', action='store_true', help='Limpa o cache antes de cada requisição.')
+        parser.add_argument('--output', default='benchmark.json')
+
+    def handle(self, *args, **options):
+        report = {
+            'meta': {
+                'seed': options['seed'],
+                'requests': options['requests'],
+                'cold_cache': options['cold_cache'],
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            },
+            'results': {},
+        }
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            for size in options['sizes']:
+                report['results'][str(size)] = self.run_size(size, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        with open(options['output'], 'w') as output:
+            json.dump(report, output, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Resultados em {options['output']}"))
+
+    def run_size(self, size, options):
+        # Cada tamanho começa de uma base (e de um cache) vazios
+        call_command('flush', interactive=False, verbosity=0)
+        cache.clear()
+        seed_dataset(
+            size, size * options['comments_per_user'], options['avg_follows'], options['seed'],
+            log=lambda message: self.stdout.write(f'[{size}] {message}'),
+        )
+        client = Client()
+        owner = Profile.objects.select_related('user').order_by('-following_count').first().user
+        client.login(username=owner.username, password=PASSWORD)
+        results = {}
+        with override_settings(DEBUG=False, RATELIMIT_ENABLED=False):
+            for name, url in sample_urls(owner).items():
+                results[name] = row = self.measure(client, url, options['requests'], options['cold_cache'])
+                self.stdout.write(
+                    f"[{size}] {name:<16} p50 {row['p50_ms']:>8} ms  p99 {row['p99_ms']:>8} ms  "
+                    f"{row['queries']:>3} consultas  pico {row['peak_kb']:>7} KiB"
+                )
+        return results
+
+    def measure(self, client, url, requests, cold_cache):
+        # O log de consultas é limitado; cheio, o CaptureQueriesContext não veria nada
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            response = fetch(client, url)
+        # captured_queries lê o log na hora, e as próximas requisições o esvaziam
+        query_count = len(queries)
+        latencies = []
+        for _ in range(requests):
+            if cold_cache:
+                cache.clear()
+            start = time.perf_counter()
+            fetch(client, url)
+            latencies.append(time.perf_counter() - start)
+        # Memória medida numa requisição à parte: o tracemalloc distorce a latência
+        if cold_cache:
+            cache.clear()
+        tracemalloc.start()
+        fetch(client, url)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return {
+            'url': url,
+            'status': response.status_code,
+            'queries': query_count,
+            'mean_ms': round(statistics.mean(latencies) * 1000, 3),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+            'p90_ms': round(percentile(latencies, 0.90) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+            'peak_kb': round(peak / 1024, 1),
+        }
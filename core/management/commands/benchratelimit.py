@@ -0,0 +1,71 @@
+# benchratelimit.py
+"""Mede o custo por requisição do ``RateLimitMiddleware`` (ver core/ratelimit.py).
+
+Chama o ``process_view`` do middleware com requisições prontas, usando o
+cache configurado em ``RATELIMIT_CACHE``, em quatro situações: rota sem
+regra, regra por IP, regra por usuário e por IP, e requisição bloqueada.
+Falha se a média de alguma passar de ``--budget-us``::
+
+    python manage.py benchratelimit --iterations 20000 --budget-us 100
+"""
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from django.urls import ResolverMatch
+
+from core import ratelimit
+
+
+def _view(request):
+    return None
+
+
+class Command(BaseCommand):
+    help = 'Mede em microssegundos o custo do limite de requisições e falha acima do orçamento.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20000)
+        parser.add_argument('--budget-us', type=float, default=100.0)
+
+    def handle(self, *args, **options):
+        middleware = ratelimit.RateLimitMiddleware(_view)
+        # Regras próprias, com taxas altas o bastante para as requisições permitidas não acabarem as fichas
+        rules = {
+            'bench_ip': {'ip': '1000000000/s', 'methods': ['POST']},
+            'bench_user': {'user': '1000000000/s', 'ip': '1000000000/s', 'methods': ['POST']},
+            'bench_blocked': {'ip': '1/d'},
+        }
+        cases = [('sem regra', 'index'), ('por IP', 'bench_ip'), ('usuário e IP', 'bench_user'), ('bloqueado', 'bench_blocked')]
+        added = {name: ratelimit.Rule(name, config) for name, config in rules.items()}
+        ratelimit.RULES.update(added)
+        failures = []
+        try:
+            for label, name in cases:
+                request = RequestFactory().post('/', REMOTE_ADDR='203.0.113.7')
+                request.user = User(pk=1, username='bench')
+                request.resolver_match = ResolverMatch(_view, (), {}, url_name=name)
+                timings = self.measure(middleware, request, options['iterations'])
+                mean = statistics.fmean(timings)
+                p99 = timings[int(len(timings) * 0.99)]
+                self.stdout.write(f'{label:<14} média {mean:6.2f} µs  p50 {statistics.median(timings):6.2f} µs  p99 {p99:6.2f} µs')
+                if name != 'index' and mean > options['budget_us']:
+                    failures.append(f'{label}: {mean:.2f} µs (orçamento {options["budget_us"]} µs)')
+        finally:
+            for name in added:
+                del ratelimit.RULES[name]
+        if failures:
+            raise CommandError('\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS(f'Todas as situações abaixo de {options["budget_us"]} µs por requisição.'))
+
+    def measure(self, middleware, request, iterations):
+        timings = []
+        clock = time.perf_counter_ns
+        for _ in range(iterations):
+            start = clock()
+            middleware.process_view(request, _view, (), {})
+            timings.append((clock() - start) / 1000)
+        timings.sort()
+        return timings
@@ -0,0 +1,69 @@
+# benchsearch.py
+"""Compara a busca FTS5 com a varredura ``icontains`` em um banco de teste.
+
+Popula um banco descartável com comentários sintéticos e mede as duas
+estratégias para os mesmos termos::
+
+    python manage.py benchsearch --comments 1000000
+"""
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from core import search
+from core.models import Comment
+
+WORDS = (
+    'café programação django python banco dados busca perfil amigo seguir rede social '
+    'foto viagem praia livro música filme jogo futebol trabalho escola cidade noite dia '
+    'chuva sol festa comida receita bolo treino corrida cachorro gato família projeto'
+).split()
+
+
+class Command(BaseCommand):
+    help = 'Mede a busca FTS5 contra icontains em comentários sintéticos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--comments', type=int, default=1_000_000)
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('terms', nargs='*', default=['café', 'receita bolo', 'xilofone'])
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.populate(options['comments'], options['batch_size'], random.Random(options['seed']))
+            for term in options['terms']:
+                fts = self.measure(lambda: search.search_comments(term), options['repeat'])
+                scan = self.measure(
+                    lambda: list(Comment.objects.filter(content__icontains=term).order_by('-created_at')[:search.PAGE_SIZE + 1]),
+                    options['repeat'],
+                )
+                self.stdout.write(f'{term!r:<16} fts5: {fts:>9.2f} ms   icontains: {scan:>9.2f} ms')
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def populate(self, total, batch_size, rng):
+        users = User.objects.bulk_create(User(username=f'busca{i}') for i in range(100))
+        start = time.perf_counter()
+        for offset in range(0, total, batch_size):
+            Comment.objects.bulk_create(
+                Comment(user=rng.choice(users), content=' '.join(rng.choices(WORDS, k=rng.randint(5, 30))))
+                for _ in range(min(batch_size, total - offset))
+            )
+        self.stdout.write(f'{total} comentários inseridos em {time.perf_counter() - start:.1f} s')
+
+    def measure(self, query, repeat):
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            query()
+            best = min(best, time.perf_counter() - start)
+        return best * 1000
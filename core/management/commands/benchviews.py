@@ -0,0 +1,127 @@
+# benchviews.py
+"""Compara as views de leitura sob WSGI (views síncronas) e ASGI (views assíncronas).
+
+Cada modo roda num subprocesso com ``DJANGO_ASYNC_VIEWS`` ajustado, como
+aconteceria num servidor de verdade, e dispara requisições concorrentes
+pelos handlers WSGI e ASGI do próprio Django contra o banco configurado::
+
+    python manage.py benchviews --username maria --requests 2000 --concurrency 32
+"""
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings, setup_test_environment
+from django.urls import reverse
+
+
+def summarize(latencies, elapsed):
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(latencies[len(latencies) // 2] * 1000, 2),
+        'p99_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 2),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Compara requisições/s e latência p99 das views de leitura sob WSGI e ASGI.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', required=True, help='Usuário autenticado nas requisições.')
+        parser.add_argument('--target', help='Perfil visitado em other_profile (padrão: o próprio usuário).')
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--server', choices=['wsgi', 'asgi'], help='Uso interno: roda só um dos modos.')
+
+    def handle(self, *args, **options):
+        if options['server']:
+            result = self.run_server(options)
+            self.stdout.write(json.dumps(result))
+            return
+
+        results = {}
+        for server in ('wsgi', 'asgi'):
+            env = dict(os.environ, DJANGO_ASYNC_VIEWS='1' if server == 'asgi' else '0')
+            argv = [
+                sys.executable, sys.argv[0], 'benchviews', '--server', server,
+                '--username', options['username'], '--requests', str(options['requests']),
+                '--concurrency', str(options['concurrency']),
+            ]
+            if options['target']:
+                argv += ['--target', options['target']]
+            child = subprocess.run(argv, env=env, capture_output=True, text=True)
+            if child.returncode:
+                raise CommandError(child.stderr)
+            results[server] = json.loads(child.stdout.strip().splitlines()[-1])
+
+        for name in results['wsgi']:
+            for server in ('wsgi', 'asgi'):
+                row = results[server][name]
+                self.stdout.write(
+                    f"{name:<16} {server}: {row['rps']:>8} req/s  p50 {row['p50_ms']:>7} ms  p99 {row['p99_ms']:>7} ms"
+                )
+
+    def run_server(self, options):
+        setup_test_environment()
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"Usuário {options['username']} não existe.")
+        login = Client()
+        login.force_login(user)
+        urls = {
+            'index': reverse('index'),
+            'other_profile': reverse('other_profile', args=[options['target'] or user.username]),
+            'following_list': reverse('following_list'),
+            'followed_list': reverse('followed_list'),
+        }
+        run = self.run_asgi if options['server'] == 'asgi' else self.run_wsgi
+        with override_settings(DEBUG=False):
+            return {
+                name: run(url, login.cookies, options['requests'], options['concurrency'])
+                for name, url in urls.items()
+            }
+
+    def run_wsgi(self, url, cookies, total, concurrency):
+        def fetch(_):
+            client = Client()
+            client.cookies = cookies
+            start = time.perf_counter()
+            client.get(url)
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            latencies = list(pool.map(fetch, range(total)))
+        return summarize(latencies, time.perf_counter() - start)
+
+    def run_asgi(self, url, cookies, total, concurrency):
+        async def worker(queue, latencies):
+            client = AsyncClient()
+            client.cookies = cookies
+            while not queue.empty():
+                queue.get_nowait()
+                start = time.perf_counter()
+                await client.get(url)
+                latencies.append(time.perf_counter() - start)
+
+        async def main():
+            queue = asyncio.Queue()
+            for i in range(total):
+                queue.put_nowait(i)
+            latencies = []
+            await asyncio.gather(*(worker(queue, latencies) for _ in range(concurrency)))
+            return latencies
+
+        start = time.perf_counter()
+        latencies = asyncio.run(main())
+        return summarize(latencies, time.perf_counter() - start)
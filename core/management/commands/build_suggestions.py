@@ -0,0 +1,69 @@
+# build_suggestions.py
+"""Calcula as sugestões de quem seguir a partir do grafo de Follow.
+
+Sem opções recalcula todos os usuários; com ``--stale`` só os marcados como
+desatualizados (ou que ainda não têm sugestões). Rode periodicamente::
+
+    python manage.py build_suggestions --stale
+"""
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import FollowSuggestions
+from core.suggestions import TOP_K, FollowGraph
+
+
+class Command(BaseCommand):
+    help = 'Pré-calcula o top-K de sugestões de quem seguir de cada usuário.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stale', action='store_true', help='Só usuários com sugestões desatualizadas.')
+        parser.add_argument('--top-k', type=int, default=TOP_K)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        # Marcações feitas depois deste instante podem não estar no grafo lido e ficam para a próxima vez
+        loaded_at = timezone.now()
+        graph = FollowGraph.load()
+        self.stdout.write(f'Grafo: {len(graph.ids)} usuários com seguidos, {len(graph.targets)} arestas '
+                          f'({time.perf_counter() - start:.1f} s)')
+
+        users = User.objects.order_by('id')
+        if options['stale']:
+            users = users.exclude(follow_suggestions__stale=False)
+        user_ids = list(users.values_list('id', flat=True))
+
+        batch_size = options['batch_size']
+        for offset in range(0, len(user_ids), batch_size):
+            self.write_batch(graph, user_ids[offset:offset + batch_size], options['top_k'], loaded_at)
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(user_ids)} usuários atualizados em {time.perf_counter() - start:.1f} s.'
+        ))
+
+    def write_batch(self, graph, user_ids, k, loaded_at):
+        ranked = {user_id: graph.suggestions(user_id, k) for user_id in user_ids}
+        suggested_ids = {candidate for pairs in ranked.values() for candidate, _ in pairs}
+        usernames = dict(User.objects.filter(id__in=suggested_ids).values_list('id', 'username'))
+        now = timezone.now()
+        FollowSuggestions.objects.bulk_create(
+            [
+                FollowSuggestions(
+                    user_id=user_id,
+                    items=[[candidate, usernames[candidate], mutual] for candidate, mutual in pairs if candidate in usernames],
+                    computed_at=now,
+                )
+                for user_id, pairs in ranked.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=['items', 'computed_at'],
+        )
+        # Condicional: um mark_stale que chegou durante o cálculo mantém a marcação
+        FollowSuggestions.objects.filter(user_id__in=user_ids, stale=True).filter(
+            Q(stale_at__isnull=True) | Q(stale_at__lt=loaded_at)
+        ).update(stale=False)
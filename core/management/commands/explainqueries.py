@@ -0,0 +1,123 @@
+# explainqueries.py
+"""Roda ``EXPLAIN QUERY PLAN`` em todas as consultas que as views do ``core`` fazem.
+
+Cria um banco de teste, popula com ``seed_dataset``, visita cada rota de
+``core/urls.py`` (e as escritas por POST, com a fila de tarefas executando
+na hora) guardando cada consulta com seus parâmetros. Falha se algum plano
+varrer uma tabela inteira ou ordenar com uma B-tree temporária, para pegar
+regressões de plano antes do deploy::
+
+    python manage.py explainqueries
+"""
+import json
+import re
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from core import jobs, notifications
+from core.models import Comment, Follow, Profile
+from core.seeding import PASSWORD, sample_urls, seed_dataset
+
+STATEMENT = re.compile(r'^\s*(SELECT|UPDATE|DELETE)\b', re.I)
+PROBLEM = re.compile(r'\bSCAN (?!.*VIRTUAL TABLE)|USE TEMP B-TREE')
+
+# Planos aceitos: (trecho do SQL, passo do plano, motivo)
+ALLOWED = [
+    (r'FROM "core_job" U0', r'SCAN U0',
+     'a fila é lida na ordem do id e a leitura para no LIMIT do lote; as tarefas prontas são as mais antigas'),
+    (r'\bMATCH\b', r'USE TEMP B-TREE FOR ORDER BY',
+     'a relevância (bm25) só existe depois da busca no FTS5, que já limita as linhas'),
+    (r'"core_comment"\."user_id" IN', r'USE TEMP B-TREE FOR ORDER BY',
+     'comentários de várias celebridades: o índice (user, created_at) ordena só dentro de cada autor'),
+]
+
+
+def allowed(sql, step):
+    return any(re.search(pattern, sql) and re.search(kind, step) for pattern, kind, reason in ALLOWED)
+
+
+class Command(BaseCommand):
+    help = 'Falha se alguma consulta das views varrer uma tabela inteira ou ordenar em B-tree temporária.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=300)
+        parser.add_argument('--verbose-plans', action='store_true', help='Mostra o plano de todas as consultas.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('EXPLAIN QUERY PLAN só existe no SQLite.')
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        old_mode = jobs.MODE
+        # A fila roda dentro da requisição para as consultas dela também serem vistas
+        jobs.MODE = 'sync'
+        try:
+            seed_dataset(options['users'], options['users'] * 10, log=lambda message: None)
+            queries = self.capture()
+            problems = self.explain(queries, options['verbose_plans'])
+        finally:
+            jobs.MODE = old_mode
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if problems:
+            raise CommandError(f'{problems} consulta(s) com varredura completa ou ordenação temporária.')
+        self.stdout.write(self.style.SUCCESS(f'{len(queries)} consultas distintas, todas usando índices.'))
+
+    def capture(self):
+        """``{sql: (params, rota)}`` de todas as consultas feitas ao visitar as rotas."""
+        owner = Profile.objects.select_related('user').order_by('-following_count').first().user
+        client = Client()
+        client.login(username=owner.username, password=PASSWORD)
+        queries = {}
+
+        def record(execute, sql, params, many, context):
+            if STATEMENT.match(sql) and sql not in queries:
+                queries[sql] = (params, route)
+            return execute(sql, params, many, context)
+
+        followed = Follow.objects.filter(follower=owner).select_related('followed').first().followed
+        # O seed não cria notificações; uma basta para as rotas delas entrarem
+        notifications.notify_follows({owner.id: [followed.id]})
+        requests = [('GET', name, url) for name, url in sample_urls(owner).items()]
+        requests.append(('GET', 'search', reverse('search') + '?q=Comentário'))
+        comment = Comment.objects.filter(user=owner).first()
+        requests += [
+            ('POST', 'unfollow_user', reverse('unfollow_user', args=[followed.username]), {}),
+            ('POST', 'follow_user', reverse('follow_user', args=[followed.username]), {}),
+            ('POST', 'profile', reverse('profile'), {'content': f'novo comentário #novo @{followed.username}'}),
+            ('GET', 'tag', reverse('tag', args=['novo'])),
+            ('POST', 'edit_comment', reverse('edit_comment', args=[comment.id]), {'content': 'editado #editado'}),
+            ('POST', 'delete_comment', reverse('delete_comment', args=[comment.id]), {}),
+            ('POST', 'mark_notifications_read', reverse('mark_notifications_read'), {}),
+            ('POST', 'api_follows', reverse('api_follows'),
+             json.dumps({'unfollow': [followed.username], 'follow': [followed.username]}), 'application/json'),
+        ]
+        with connection.execute_wrapper(record):
+            for method, route, url, *data in requests:
+                cache.clear()
+                response = client.post(url, *data) if method == 'POST' else client.get(url)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+        return queries
+
+    def explain(self, queries, verbose):
+        problems = 0
+        with connection.cursor() as cursor:
+            for sql, (params, route) in queries.items():
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                plan = [row[3] for row in cursor.fetchall()]
+                issues = [step for step in plan if PROBLEM.search(step) and not allowed(sql, step)]
+                if issues:
+                    problems += 1
+                if issues or verbose:
+                    style = self.style.ERROR if issues else str
+                    self.stdout.write(style(f'[{route}] {sql[:300]}'))
+                    for step in plan:
+                        self.stdout.write(f'    {step}')
+        return problems
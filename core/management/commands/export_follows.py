@@ -0,0 +1,25 @@
+# export_follows.py
+"""Escreve as arestas de um usuário na saída padrão, no formato do import_follows::
+
+    python manage.py export_follows maria --format csv > maria.csv
+"""
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from core import graph
+
+
+class Command(BaseCommand):
+    help = 'Exporta quem o usuário segue e quem o segue, em CSV ou JSONL.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--format', choices=sorted(graph.FORMATS), default='jsonl')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"Usuário {options['username']} não existe.")
+        for line in graph.write_edges(graph.iter_edges(user), options['format']):
+            self.stdout.write(line, ending='')
@@ -0,0 +1,47 @@
+# import_follows.py
+"""Importa follows de um arquivo CSV ou JSONL (ver core/graph.py).
+
+Cada linha é uma aresta seguidor -> seguido::
+
+    python manage.py import_follows follows.csv
+    python manage.py import_follows follows.jsonl
+    zcat follows.jsonl.gz | python manage.py import_follows - --format jsonl
+
+Follows que já existem e usuários inexistentes são contados e ignorados.
+Os contadores e sugestões são atualizados pela fila de tarefas.
+"""
+import sys
+from collections import Counter
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import graph
+
+
+class Command(BaseCommand):
+    help = 'Importa em lotes arestas seguidor -> seguido de um arquivo CSV ou JSONL (- para a entrada padrão).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=sorted(graph.FORMATS), help='Padrão: pela extensão do arquivo.')
+        parser.add_argument('--batch-size', type=int, default=graph.BATCH_SIZE)
+        parser.add_argument('--notify', action='store_true', help='Avisa cada usuário dos novos seguidores.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format = options['format'] or Path(path).suffix.lstrip('.')
+        if format not in graph.FORMATS:
+            raise CommandError('Informe --format csv ou --format jsonl.')
+        invalid = Counter()
+        stream = sys.stdin if path == '-' else open(path, encoding='utf-8', newline='')
+        with stream:
+            stats = graph.import_edges(
+                graph.read_edges(stream, format, invalid),
+                options['batch_size'], options['notify'], log=self.stdout.write,
+            )
+        stats.update(invalid)
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['created']} follows criados, {stats['existing']} já existiam, "
+            f"{stats['unknown']} com usuário desconhecido, {stats['self'] + stats['invalid']} inválidos."
+        ))
@@ -0,0 +1,111 @@
+# loadtest.py
+"""Teste de carga: postagens de comentários e leituras do feed ao mesmo tempo.
+
+Roda num banco de teste descartável, num arquivo temporário (não em memória,
+para os PRAGMAs do perfil de produção, como o WAL, valerem); os dados de
+verdade não são tocados. Compare com e sem o perfil de produção::
+
+    python manage.py loadtest --writers 8 --readers 8 --duration 10
+    DJANGO_DB_PROFILE=production python manage.py loadtest --writers 8 --readers 8 --duration 10
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from core import counters
+from core.models import Follow, Profile
+
+USERNAME = 'loadtest{}'
+
+
+class Command(BaseCommand):
+    help = 'Mede vazão e erros com postagens e leituras do feed concorrentes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--duration', type=float, default=10.0, help='Segundos de teste.')
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp(prefix='loadtest-')
+        connection.settings_dict['TEST']['NAME'] = os.path.join(directory, 'loadtest.sqlite3')
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.run(options)
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def run(self, options):
+        writers, readers = options['writers'], options['readers']
+        users = self.prepare_users(writers + readers)
+        self.stdout.write(f"journal_mode={self.journal_mode()} CONN_MAX_AGE={connection.settings_dict['CONN_MAX_AGE']}")
+
+        stats = Counter()
+        lock = threading.Lock()
+        deadline = time.monotonic() + options['duration']
+
+        def worker(user, method, url):
+            client = Client(raise_request_exception=False)
+            client.force_login(user)
+            ok = errors = 0
+            while time.monotonic() < deadline:
+                if method == 'post':
+                    response = client.post(url, {'content': f'carga {time.time()}'})
+                else:
+                    response = client.get(url)
+                if response.status_code < 400:
+                    ok += 1
+                else:
+                    errors += 1
+            connections.close_all()
+            with lock:
+                stats[f'{method}_ok'] += ok
+                stats[f'{method}_errors'] += errors
+
+        threads = [threading.Thread(target=worker, args=(user, 'post', reverse('profile'))) for user in users[:writers]]
+        threads += [threading.Thread(target=worker, args=(user, 'get', reverse('index'))) for user in users[writers:]]
+        with override_settings(DEBUG=False, RATELIMIT_ENABLED=False):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        duration = options['duration']
+        self.stdout.write(
+            f"postagens: {stats['post_ok'] / duration:.1f}/s ({stats['post_errors']} erros)  "
+            f"leituras do feed: {stats['get_ok'] / duration:.1f}/s ({stats['get_errors']} erros)"
+        )
+
+    def journal_mode(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            return cursor.fetchone()[0]
+
+    def prepare_users(self, count):
+        """Cria usuários que seguem uns aos outros."""
+        users = []
+        for i in range(count):
+            user, created = User.objects.get_or_create(username=USERNAME.format(i))
+            if created:
+                Profile.objects.create(user=user)
+            users.append(user)
+        Follow.objects.bulk_create(
+            [Follow(follower=a, followed=b) for a in users for b in users if a != b],
+            ignore_conflicts=True,
+        )
+        counters.rebuild(user.id for user in users)
+        return users
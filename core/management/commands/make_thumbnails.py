@@ -0,0 +1,30 @@
+# make_thumbnails.py
+"""Gera as miniaturas que faltam (ver core/media.py).
+
+Útil depois de instalar o Pillow ou se a geração falhou na fila::
+
+    python manage.py make_thumbnails
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from core import media, thumbnails
+from core.models import Media
+
+
+class Command(BaseCommand):
+    help = 'Gera em lotes, no pool de processos, as miniaturas das imagens que ainda não têm.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        if thumbnails.Image is None:
+            raise CommandError('Instale o Pillow para gerar miniaturas.')
+        pending = Media.objects.filter(has_thumbnail=False).order_by('sha256').values_list('sha256', flat=True)
+        last = ''
+        total = 0
+        while batch := list(pending.filter(sha256__gt=last)[:options['batch_size']]):
+            total += media.make_thumbnails(batch)
+            last = batch[-1]
+            self.stdout.write(f'{total} miniaturas geradas')
+        self.stdout.write(self.style.SUCCESS(f'{total} miniaturas geradas.'))
@@ -0,0 +1,50 @@
+# perfreport.py
+"""Relatório das views mais quentes a partir dos arquivos gravados pelo ``PerformanceMiddleware``.
+
+Junta os ``perf-<pid>.json`` de todos os processos em ``PERF_DIR``::
+
+    python manage.py perfreport --sort p99_ms --slow 5
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import perf
+
+COLUMNS = ('requests', 'p50_ms', 'p90_ms', 'p99_ms', 'max_ms', 'total_ms', 'queries', 'db_ms', 'template_ms', 'bytes')
+
+
+class Command(BaseCommand):
+    help = 'Mostra latência, consultas e tamanho de resposta por view, somando todos os processos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=perf.DIR, help='Diretório com os perf-<pid>.json.')
+        parser.add_argument('--sort', default='total_ms', choices=COLUMNS)
+        parser.add_argument('--max-age', type=int, default=2 * perf.WINDOW, help='Ignora arquivos mais velhos (segundos).')
+        parser.add_argument('--slow', type=int, default=10, help='Consultas lentas a mostrar.')
+        parser.add_argument('--json', action='store_true', help='Saída em JSON.')
+
+    def handle(self, *args, **options):
+        if not options['dir']:
+            raise CommandError('Defina PERF_DIR (ou DJANGO_PERF_DIR) ou passe --dir.')
+        views, slow_queries, pids = perf.read_dumps(options['dir'], options['max_age'])
+        report = perf.snapshot(views, slow_queries)
+        rows = sorted(report['views'].items(), key=lambda item: item[1][options['sort']], reverse=True)
+
+        if options['json']:
+            report['views'] = dict(rows)
+            report['slow_queries'] = report['slow_queries'][:options['slow']]
+            report['pids'] = pids
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        if not rows:
+            self.stdout.write(f"Nenhum dado recente em {options['dir']}.")
+            return
+        self.stdout.write(f"{len(pids)} processo(s), ordenado por {options['sort']}")
+        self.stdout.write(f"{'view':<20}" + ''.join(f'{column:>12}' for column in COLUMNS))
+        for view, row in rows:
+            self.stdout.write(f'{view:<20}' + ''.join(f'{row[column]:>12}' for column in COLUMNS))
+
+        for query in report['slow_queries'][:options['slow']]:
+            self.stdout.write(f"\n{query['ms']} ms em {query['view'] or '-'}:\n{query['sql']}")
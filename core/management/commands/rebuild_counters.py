@@ -0,0 +1,29 @@
+# rebuild_counters.py
+"""Recalcula os contadores de seguidores, seguidos e comentários dos perfis."""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core import counters
+from core.models import Profile
+
+
+class Command(BaseCommand):
+    help = 'Recalcula em lotes os contadores desnormalizados do Profile.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        user_ids = Profile.objects.order_by('user_id').values_list('user_id', flat=True)
+        last_id = 0
+        total = changed = 0
+        while True:
+            batch = list(user_ids.filter(user_id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            with transaction.atomic():
+                changed += counters.rebuild(batch)
+            total += len(batch)
+            last_id = batch[-1]
+        self.stdout.write(self.style.SUCCESS(f'{total} perfis verificados, {changed} corrigidos.'))
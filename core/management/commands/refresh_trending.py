@@ -0,0 +1,21 @@
+# refresh_trending.py
+"""Decai os contadores das hashtags em alta e regrava as listas no cache.
+
+Rode periodicamente (a cada poucos minutos)::
+
+    python manage.py refresh_trending
+"""
+from django.core.management.base import BaseCommand
+
+from core import trending
+
+
+class Command(BaseCommand):
+    help = 'Atualiza os contadores com decaimento das hashtags em alta.'
+
+    def handle(self, *args, **options):
+        updated, deleted = trending.refresh()
+        self.stdout.write(self.style.SUCCESS(f'{updated} contadores atualizados, {deleted} removidos.'))
+        for window in trending.WINDOWS:
+            tags = ', '.join(f'#{name} ({score})' for name, score in trending.top(window))
+            self.stdout.write(f'{window}: {tags or "nenhuma"}')
@@ -0,0 +1,73 @@
+# runjobs.py
+"""Worker da fila de tarefas (``core/jobs.py``).
+
+Cada thread do pool pega lotes de tarefas e aplica seus efeitos agrupados.
+No SQLite, mais de uma thread só rende com ``DJANGO_DB_PROFILE=production``
+(transações IMMEDIATE); sem isso elas disputam o lock de escrita.
+Em produção rode o worker à parte e use ``DJANGO_JOBS_MODE=worker`` nos
+processos web::
+
+    python manage.py runjobs --threads 4
+    python manage.py runjobs --once   # esvazia a fila e sai
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections, connections
+
+from core import jobs
+from core.db import is_locked_error
+from core.models import Job
+
+
+class Command(BaseCommand):
+    help = 'Executa as tarefas em segundo plano gravadas na tabela Job.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--batch-size', type=int, default=jobs.BATCH_SIZE)
+        parser.add_argument('--poll', type=float, default=jobs.POLL_INTERVAL, help='Espera (s) com a fila vazia.')
+        parser.add_argument('--once', action='store_true', help='Sai quando a fila esvaziar.')
+
+    def handle(self, *args, **options):
+        self.stop = threading.Event()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads'], thread_name_prefix='runjobs') as pool:
+            futures = [
+                pool.submit(self.work, options['batch_size'], options['poll'], options['once'])
+                for _ in range(options['threads'])
+            ]
+            try:
+                done = sum(future.result() for future in futures)
+            except KeyboardInterrupt:
+                self.stop.set()
+                done = sum(future.result() for future in futures)
+
+        pending = Job.objects.filter(attempts__lt=jobs.MAX_ATTEMPTS).count()
+        failed = Job.objects.filter(attempts__gte=jobs.MAX_ATTEMPTS).count()
+        self.stdout.write(self.style.SUCCESS(
+            f'{done} tarefas executadas em {time.perf_counter() - start:.1f} s; '
+            f'{pending} pendentes, {failed} desistidas.'
+        ))
+
+    def work(self, batch_size, poll, once):
+        done = 0
+        try:
+            while not self.stop.is_set():
+                close_old_connections()
+                try:
+                    processed = jobs.drain(batch_size)
+                except OperationalError as error:
+                    if not is_locked_error(error):
+                        raise
+                    processed = 0
+                done += processed
+                if not processed:
+                    if once:
+                        break
+                    self.stop.wait(poll)
+        finally:
+            connections.close_all()
+        return done
@@ -0,0 +1,48 @@
+# sync_replicas.py
+"""Copia o banco ``default`` para as réplicas SQLite (ver core/replicas.py).
+
+Faz as vezes da replicação para testar localmente: usa a API de backup do
+SQLite, que copia um instantâneo consistente mesmo com o banco em uso. Com
+``--interval`` repete a cópia, e o atraso das réplicas fica parecido com o
+de uma replicação de verdade::
+
+    DJANGO_REPLICAS=/tmp/replica1.sqlite3 python manage.py sync_replicas --interval 5
+"""
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core import replicas
+
+
+class Command(BaseCommand):
+    help = 'Copia o banco default para cada réplica de DATABASE_REPLICAS.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help='Repete a cópia a cada tantos segundos.')
+
+    def handle(self, *args, **options):
+        if not replicas.REPLICAS:
+            raise CommandError('Nenhuma réplica configurada (defina DJANGO_REPLICAS).')
+        if connections[replicas.PRIMARY].vendor != 'sqlite':
+            raise CommandError('A cópia por backup só funciona com SQLite.')
+        while True:
+            start = time.perf_counter()
+            self.sync()
+            self.stdout.write(f'{len(replicas.REPLICAS)} réplica(s) copiadas em {time.perf_counter() - start:.2f} s')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def sync(self):
+        source = connections[replicas.PRIMARY]
+        source.ensure_connection()
+        for alias in replicas.REPLICAS:
+            target = sqlite3.connect(settings.DATABASES[alias]['NAME'])
+            try:
+                source.connection.backup(target)
+            finally:
+                target.close()
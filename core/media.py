@@ -0,0 +1,256 @@
+# media.py
+"""Imagens anexadas a comentários, guardadas pelo hash do conteúdo.
+
+* Upload: ``HashingUploadHandler`` (em ``FILE_UPLOAD_HANDLERS``) grava o
+  arquivo num temporário em disco em pedaços, calculando o SHA-256 no
+  caminho, então nem arquivos grandes ficam em memória.
+* Armazenamento: ``store`` move o temporário para
+  ``MEDIA_ROOT/blobs/ab/cd/<sha256>``. Um arquivo repetido cai no mesmo
+  caminho e no mesmo ``Media``, então é guardado uma vez só.
+* Miniaturas: a tarefa ``media_stored`` (``core/jobs.py``) chama
+  ``make_thumbnails`` depois do commit, fora da requisição, que gera os
+  JPEGs num pool de processos (``core/thumbnails.py``, precisa do Pillow).
+  O comando ``make_thumbnails`` refaz as que faltarem.
+* Entrega: ``serve`` atende ``Range`` (o navegador pode retomar ou ler aos
+  pedaços uma imagem grande) e, como o conteúdo de um hash nunca muda,
+  responde com ``Cache-Control: immutable`` de um ano.
+
+O tipo e as dimensões vêm do cabeçalho do arquivo (PNG, JPEG, GIF e WebP),
+sem depender do Pillow.
+"""
+import hashlib
+import logging
+import multiprocessing
+import os
+import re
+import struct
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.move import file_move_safe
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+
+from . import thumbnails
+from .models import Media
+
+logger = logging.getLogger(__name__)
+
+ROOT = str(getattr(settings, 'MEDIA_ROOT', '') or os.path.join(settings.BASE_DIR, 'media'))
+MAX_UPLOAD_SIZE = getattr(settings, 'MEDIA_MAX_UPLOAD_SIZE', 10 * 1024 * 1024)
+THUMBNAIL_SIZE = getattr(settings, 'MEDIA_THUMBNAIL_SIZE', 480)
+THUMBNAIL_WORKERS = getattr(settings, 'MEDIA_THUMBNAIL_WORKERS', 2)
+MAX_AGE = getattr(settings, 'STATIC_MAX_AGE', 60 * 60 * 24 * 365)
+# Enquanto a miniatura não existe a rota dela serve o original, que não pode ficar no cache por um ano
+PENDING_MAX_AGE = 60
+CHUNK_SIZE = 64 * 1024
+
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class HashingUploadHandler(TemporaryFileUploadHandler):
+    """Grava o upload em disco em pedaços, calculando o SHA-256 no caminho."""
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hash = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hash.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.sha256 = self.hash.hexdigest()
+        return file
+
+
+def blob_path(sha256):
+    return os.path.join(ROOT, 'blobs', sha256[:2], sha256[2:4], sha256)
+
+
+def thumbnail_path(sha256):
+    return os.path.join(ROOT, 'thumbs', sha256[:2], sha256[2:4], f'{sha256}.jpg')
+
+
+def _jpeg_size(file):
+    file.seek(2)
+    while True:
+        marker = file.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        if marker[1] in (0xD8, 0x01) or 0xD0 <= marker[1] <= 0xD7:
+            continue
+        length = file.read(2)
+        if len(length) < 2:
+            return None
+        # SOF0..SOF15, menos DHT (C4), JPG (C8) e DAC (CC)
+        if 0xC0 <= marker[1] <= 0xCF and marker[1] not in (0xC4, 0xC8, 0xCC):
+            data = file.read(5)
+            if len(data) < 5:
+                return None
+            height, width = struct.unpack('>HH', data[1:])
+            return width, height
+        file.seek(struct.unpack('>H', length)[0] - 2, os.SEEK_CUR)
+
+
+def _webp_size(head):
+    chunk = head[12:16]
+    if chunk == b'VP8 ' and len(head) >= 30:
+        width, height = struct.unpack('<HH', head[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b'VP8L' and len(head) >= 25:
+        bits = int.from_bytes(head[21:25], 'little')
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b'VP8X' and len(head) >= 30:
+        return int.from_bytes(head[24:27], 'little') + 1, int.from_bytes(head[27:30], 'little') + 1
+    return None
+
+
+def image_info(file):
+    """``(content_type, largura, altura)`` lidos do cabeçalho, ou ``None`` se não for uma imagem aceita."""
+    file.seek(0)
+    head = file.read(32)
+    size = None
+    if head.startswith(b'\x89PNG\r\n\x1a\n') and head[12:16] == b'IHDR':
+        content_type, size = 'image/png', struct.unpack('>II', head[16:24])
+    elif head[:6] in (b'GIF87a', b'GIF89a'):
+        content_type, size = 'image/gif', struct.unpack('<HH', head[6:10])
+    elif head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        content_type, size = 'image/webp', _webp_size(head)
+    elif head.startswith(b'\xff\xd8'):
+        content_type, size = 'image/jpeg', _jpeg_size(file)
+    file.seek(0)
+    if not size or not all(size):
+        return None
+    return content_type, *size
+
+
+def _hash(file):
+    digest = hashlib.sha256()
+    for chunk in file.chunks(CHUNK_SIZE):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def store(file, info):
+    """Guarda ``file`` (já validado, ``info`` de ``image_info``) e devolve ``(media, criado)``."""
+    sha256 = getattr(file, 'sha256', None) or _hash(file)
+    existing = Media.objects.filter(sha256=sha256).first()
+    if existing is not None:
+        return existing, False
+    path = blob_path(sha256)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if hasattr(file, 'temporary_file_path'):
+        file_move_safe(file.temporary_file_path(), path, allow_overwrite=True)
+    else:
+        partial = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(partial, 'wb') as dest:
+            for chunk in file.chunks(CHUNK_SIZE):
+                dest.write(chunk)
+        os.replace(partial, path)
+    content_type, width, height = info
+    # Outro upload igual pode ter criado a linha nesse meio tempo; o arquivo é o mesmo
+    return Media.objects.get_or_create(
+        sha256=sha256,
+        defaults={'content_type': content_type, 'size': file.size, 'width': width, 'height': height},
+    )
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _thumbnail_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: um fork de um processo com threads e conexões abertas não é seguro
+            _pool = ProcessPoolExecutor(THUMBNAIL_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+    return _pool
+
+
+def make_thumbnails(sha256s):
+    """Gera no pool de processos as miniaturas que faltam entre ``sha256s``. Retorna quantas gerou."""
+    if thumbnails.Image is None:
+        return 0
+    pending = Media.objects.filter(sha256__in=list(sha256s), has_thumbnail=False).values_list('sha256', flat=True)
+    pool = _thumbnail_pool()
+    futures = {
+        sha256: pool.submit(thumbnails.make_thumbnail, blob_path(sha256), thumbnail_path(sha256), THUMBNAIL_SIZE)
+        for sha256 in pending
+    }
+    done = []
+    for sha256, future in futures.items():
+        try:
+            future.result()
+        except Exception:
+            logger.exception('Falha ao gerar a miniatura de %s', sha256)
+        else:
+            done.append(sha256)
+    Media.objects.filter(sha256__in=done).update(has_thumbnail=True)
+    return len(done)
+
+
+def _byte_range(header, size):
+    """``(início, fim)`` inclusivos do cabeçalho ``Range``; ``None`` para o arquivo todo; ``False`` se inválido."""
+    match = _RANGE.match(header.strip())
+    # Vários intervalos ou unidade desconhecida: o arquivo todo é uma resposta válida
+    if match is None or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if start == '':
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start, end = int(start), min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def serve(request, media, thumbnail=False):
+    """Resposta com o arquivo (ou a miniatura) de ``media``, com ``Range``, ``ETag`` e cache longo."""
+    path, content_type, max_age, tag = blob_path(media.sha256), media.content_type, MAX_AGE, media.sha256
+    if thumbnail:
+        if media.has_thumbnail:
+            path, content_type, tag = thumbnail_path(media.sha256), 'image/jpeg', f'{media.sha256}-thumb'
+        else:
+            max_age = PENDING_MAX_AGE
+    etag = f'"{tag}"'
+    cache_control = f'private, max-age={max_age}' + (', immutable' if max_age == MAX_AGE else '')
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponseNotModified()
+    else:
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            raise Http404('Arquivo não encontrado.')
+        byte_range = None
+        if 'Range' in request.headers and request.headers.get('If-Range', etag) == etag:
+            byte_range = _byte_range(request.headers['Range'], size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+        elif byte_range is None:
+            response = FileResponse(open(path, 'rb'), content_type=content_type)
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(_read_range(path, start, end - start + 1), status=206, content_type=content_type)
+            response['Content-Length'] = end - start + 1
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    return response
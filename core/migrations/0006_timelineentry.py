@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_timeline(apps, schema_editor):
+    Follow = apps.get_model('core', 'Follow')
+    Comment = apps.get_model('core', 'Comment')
+    TimelineEntry = apps.get_model('core', 'TimelineEntry')
+    for follow in Follow.objects.iterator():
+        comments = Comment.objects.filter(user_id=follow.followed_id, created_at__gte=follow.created_at)
+        TimelineEntry.objects.bulk_create(
+            (TimelineEntry(owner_id=follow.follower_id, comment_id=comment.id, author_id=comment.user_id,
+                           created_at=comment.created_at)
+             for comment in comments.iterator()),
+            batch_size=500,
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_follow_created_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('comment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='core.comment')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['owner', 'created_at'], name='core_timeline_owner_created')],
+                'unique_together': {('owner', 'comment')},
+            },
+        ),
+        migrations.RunPython(backfill_timeline, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:04
+
+from django.db import migrations, models
+
+
+def fill_counters(apps, schema_editor):
+    Profile = apps.get_model('core', 'Profile')
+    Follow = apps.get_model('core', 'Follow')
+    Comment = apps.get_model('core', 'Comment')
+    for profile in Profile.objects.iterator():
+        profile.followers_count = Follow.objects.filter(followed_id=profile.user_id).count()
+        profile.following_count = Follow.objects.filter(follower_id=profile.user_id).count()
+        profile.comments_count = Comment.objects.filter(user_id=profile.user_id).count()
+        profile.save(update_fields=['followers_count', 'following_count', 'comments_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
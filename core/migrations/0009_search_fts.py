@@ -0,0 +1,95 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:10
+
+from django.db import migrations
+
+# Tabelas FTS5 da busca (core/search.py), mantidas em sincronia por triggers
+FORWARD = [
+    """
+    CREATE VIRTUAL TABLE core_comment_fts USING fts5(
+        content, content='core_comment', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER core_comment_fts_insert AFTER INSERT ON core_comment BEGIN
+        INSERT INTO core_comment_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER core_comment_fts_delete AFTER DELETE ON core_comment BEGIN
+        INSERT INTO core_comment_fts(core_comment_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER core_comment_fts_update AFTER UPDATE OF content ON core_comment BEGIN
+        INSERT INTO core_comment_fts(core_comment_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO core_comment_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    "INSERT INTO core_comment_fts(core_comment_fts) VALUES ('rebuild')",
+    """
+    CREATE VIRTUAL TABLE core_profile_fts USING fts5(
+        username, full_name, location, bio, tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER core_profile_fts_insert AFTER INSERT ON core_profile BEGIN
+        INSERT INTO core_profile_fts(rowid, username, full_name, location, bio)
+        SELECT new.id, username, new.full_name, new.location, new.bio FROM auth_user WHERE id = new.user_id;
+    END
+    """,
+    """
+    CREATE TRIGGER core_profile_fts_delete AFTER DELETE ON core_profile BEGIN
+        DELETE FROM core_profile_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER core_profile_fts_update AFTER UPDATE OF full_name, location, bio ON core_profile BEGIN
+        UPDATE core_profile_fts SET full_name = new.full_name, location = new.location, bio = new.bio
+        WHERE rowid = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER core_profile_fts_username AFTER UPDATE OF username ON auth_user BEGIN
+        UPDATE core_profile_fts SET username = new.username
+        WHERE rowid = (SELECT id FROM core_profile WHERE user_id = new.id);
+    END
+    """,
+    """
+    INSERT INTO core_profile_fts(rowid, username, full_name, location, bio)
+    SELECT p.id, u.username, p.full_name, p.location, p.bio
+    FROM core_profile p JOIN auth_user u ON u.id = p.user_id
+    """,
+]
+
+BACKWARD = [
+    'DROP TRIGGER IF EXISTS core_profile_fts_username',
+    'DROP TRIGGER IF EXISTS core_profile_fts_update',
+    'DROP TRIGGER IF EXISTS core_profile_fts_delete',
+    'DROP TRIGGER IF EXISTS core_profile_fts_insert',
+    'DROP TABLE IF EXISTS core_profile_fts',
+    'DROP TRIGGER IF EXISTS core_comment_fts_update',
+    'DROP TRIGGER IF EXISTS core_comment_fts_delete',
+    'DROP TRIGGER IF EXISTS core_comment_fts_insert',
+    'DROP TABLE IF EXISTS core_comment_fts',
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        # Só o SQLite tem FTS5; nos outros bancos a busca usa icontains
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_profile_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(FORWARD), run(BACKWARD)),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_notification'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['follower', 'created_at', 'id', 'followed'], name='core_follow_follower_cover'),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['followed', 'created_at', 'id', 'follower'], name='core_follow_followed_cover'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['locked_by', 'id'], name='core_job_claimed'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('read_at__isnull', True)), fields=['recipient'], name='core_notif_unread'),
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['owner', 'author'], name='core_timeline_owner_author'),
+        ),
+        migrations.RemoveIndex(
+            model_name='follow',
+            name='core_follow_follower_created',
+        ),
+        migrations.RemoveIndex(
+            model_name='follow',
+            name='core_follow_followed_created',
+        ),
+        migrations.RemoveIndex(
+            model_name='job',
+            name='core_job_ready',
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_hashtags_mentions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='archived_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ArchivedComment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('user_id', models.BigIntegerField()),
+                ('username', models.CharField(max_length=150)),
+                ('content', models.TextField()),
+                ('created_at', models.DateTimeField()),
+                ('edited_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user_id', 'created_at', 'id'], name='core_archived_user_created')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_comment_media'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='followsuggestions',
+            name='stale_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
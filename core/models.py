@@ -1,6 +1,7 @@
 # models.py
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 # Formulário para criação de perfil de usuário
 class Profile(models.Model):
@@ -12,16 +13,43 @@ class Profile(models.Model):
     email = models.EmailField(blank=True)
     phone_number = models.CharField(max_length=15, blank=True, null=True)
     education = models.CharField(max_length=255, blank=True, null=True)
+    # Contadores desnormalizados, somados em lote com F() pela fila de tarefas (core/jobs.py, core/counters.py)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+    comments_count = models.PositiveIntegerField(default=0)
+    # Comentários até esta data foram para o arquivo (core/archive.py); nulo se nenhum foi
+    archived_until = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return self.user.username
 
+# Imagem anexada a comentários, guardada pelo hash do conteúdo (ver core/media.py)
+class Media(models.Model):
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    content_type = models.CharField(max_length=50)
+    size = models.PositiveBigIntegerField()
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    # A miniatura é gerada fora da requisição; até lá a rota dela serve o original
+    has_thumbnail = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.sha256
+
 # Formulário para criação de comentário
 class Comment(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     edited_at = models.DateTimeField(null=True, blank=True)
+    # Os templates usam só o media_id (o hash) para montar as URLs, sem junção
+    media = models.ForeignKey(Media, null=True, blank=True, related_name='comments', on_delete=models.PROTECT)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='core_comment_user_created'),
+        ]
 
     def __str__(self):
         return self.content[:20]
@@ -34,6 +62,180 @@ class Follow(models.Model):
 
     class Meta:
         unique_together = ('follower', 'followed')
+        indexes = [
+            # Cobrem as listas paginadas (ordem created_at, id) e o fan-out sem voltar à tabela
+            models.Index(fields=['follower', 'created_at', 'id', 'followed'], name='core_follow_follower_cover'),
+            models.Index(fields=['followed', 'created_at', 'id', 'follower'], name='core_follow_followed_cover'),
+        ]
+
+    def __str__(self):
+        return f"{self.follower} follows {self.followed}"
+
+# Linha do tempo pré-calculada (fan-out na escrita) da página inicial
+class TimelineEntry(models.Model):
+    owner = models.ForeignKey(User, related_name='timeline', on_delete=models.CASCADE)
+    comment = models.ForeignKey(Comment, related_name='timeline_entries', on_delete=models.CASCADE)
+    author = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
+    # Cópia de comment.created_at para que a leitura seja uma varredura ordenada pelo índice
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('owner', 'comment')
+        indexes = [
+            models.Index(fields=['owner', 'created_at', 'comment'], name='core_timeline_owner_created'),
+            # Deixar de seguir apaga as entradas de um autor
+            models.Index(fields=['owner', 'author'], name='core_timeline_owner_author'),
+        ]
+
+    def __str__(self):
+        return f"{self.comment} -> {self.owner}"
+
+# Sugestões de quem seguir ("pessoas que você talvez conheça"), pré-calculadas em lote
+class FollowSuggestions(models.Model):
+    user = models.OneToOneField(User, primary_key=True, related_name='follow_suggestions', on_delete=models.CASCADE)
+    # Lista de [user_id, username, seguidos_em_comum], da melhor para a pior
+    items = models.JSONField(default=list)
+    # Marcado quando o grafo ao redor do usuário muda; recalculado por build_suggestions --stale
+    stale = models.BooleanField(default=True, db_index=True)
+    # Quando foi marcado; build_suggestions só desmarca o que foi marcado antes de ler o grafo
+    stale_at = models.DateTimeField(null=True, blank=True)
+    computed_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
-        return f"{self.follower} follows {self.followed}"
\ No newline at end of file
+        return f"Sugestões para {self.user}"
+
+# Fila de tarefas em segundo plano (efeitos colaterais de comentários e follows, ver core/jobs.py)
+class Job(models.Model):
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Só é executada a partir daqui; adiada a cada falha
+    run_after = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # Worker que pegou a tarefa; vazio quando está livre
+    locked_by = models.CharField(max_length=64, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            # Tarefas reservadas por um worker, já na ordem em que são aplicadas
+            models.Index(fields=['locked_by', 'id'], name='core_job_claimed'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk}"
+
+# Notificações; eventos parecidos ainda não lidos se juntam numa só ("X e mais 40 pessoas seguiram você")
+class Notification(models.Model):
+    FOLLOW = 'follow'
+    COMMENT = 'comment'
+    KIND_CHOICES = [(FOLLOW, 'Novo seguidor'), (COMMENT, 'Novo comentário')]
+
+    recipient = models.ForeignKey(User, related_name='notifications', on_delete=models.CASCADE)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    # Eventos com o mesmo grupo se juntam: todos os follows, ou os comentários de um mesmo autor
+    group_key = models.CharField(max_length=50, blank=True)
+    # Autor do evento mais recente do grupo e quantos eventos foram juntados
+    actor = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
+    count = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(default=timezone.now)
+    read_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['recipient', 'updated_at'], name='core_notif_recipient_updated'),
+            models.Index(
+                fields=['kind', 'group_key', 'recipient'], condition=models.Q(read_at__isnull=True),
+                name='core_notif_unread_group',
+            ),
+            # Contagem de não lidas e "marcar todas como lidas"
+            models.Index(fields=['recipient'], condition=models.Q(read_at__isnull=True), name='core_notif_unread'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} -> {self.recipient}"
+
+# Hashtags usadas nos comentários (#exemplo), guardadas em minúsculas
+class Hashtag(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+
+    def __str__(self):
+        return f"#{self.name}"
+
+# Hashtags de cada comentário, extraídas quando ele é salvo (ver core/tags.py)
+class CommentTag(models.Model):
+    comment = models.ForeignKey(Comment, related_name='comment_tags', on_delete=models.CASCADE)
+    hashtag = models.ForeignKey(Hashtag, related_name='comment_tags', on_delete=models.CASCADE)
+    # Cópia de comment.created_at para que a página da hashtag seja uma varredura ordenada pelo índice
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('comment', 'hashtag')
+        indexes = [
+            models.Index(fields=['hashtag', 'created_at', 'id'], name='core_commenttag_feed'),
+        ]
+
+    def __str__(self):
+        return f"{self.hashtag} em {self.comment}"
+
+# Menções (@usuario) de cada comentário
+class Mention(models.Model):
+    comment = models.ForeignKey(Comment, related_name='mentions', on_delete=models.CASCADE)
+    user = models.ForeignKey(User, related_name='mentions', on_delete=models.CASCADE)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('comment', 'user')
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='core_mention_feed'),
+        ]
+
+    def __str__(self):
+        return f"@{self.user} em {self.comment}"
+
+# Popularidade de uma hashtag numa janela: contador com decaimento exponencial (ver core/trending.py)
+class TagTrend(models.Model):
+    hashtag = models.ForeignKey(Hashtag, related_name='trends', on_delete=models.CASCADE)
+    window = models.CharField(max_length=10)
+    # Valor do contador em updated_at; o atual é score * 0.5 ** (tempo desde updated_at / meia-vida)
+    score = models.FloatField(default=0)
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('window', 'hashtag')
+        indexes = [
+            models.Index(fields=['window', '-score'], name='core_tagtrend_top'),
+        ]
+
+    def __str__(self):
+        return f"{self.hashtag} ({self.window}): {self.score:.2f}"
+
+# Comentários antigos, movidos para o banco "archive" pelo comando archive_comments (ver core/archive.py)
+class ArchivedComment(models.Model):
+    # Mesmo id do Comment original
+    id = models.BigIntegerField(primary_key=True)
+    # Sem chave estrangeira: o usuário fica em outro banco
+    user_id = models.BigIntegerField()
+    username = models.CharField(max_length=150)
+    content = models.TextField()
+    created_at = models.DateTimeField()
+    edited_at = models.DateTimeField(null=True, blank=True)
+    # Hash da imagem anexada (o Media fica no banco principal)
+    media_id = models.CharField(max_length=64, null=True, blank=True)
+
+    # Os templates escondem editar/excluir para comentários arquivados
+    archived = True
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user_id', 'created_at', 'id'], name='core_archived_user_created'),
+        ]
+
+    @property
+    def user(self):
+        return User(id=self.user_id, username=self.username)
+
+    def __str__(self):
+        return self.content[:20]
@@ -0,0 +1,141 @@
+# notifications.py
+"""Notificações de novos seguidores e de comentários de quem você segue.
+
+São criadas pela fila de tarefas (``core/jobs.py``), um lote por vez: para
+cada grupo (todos os follows de um usuário, ou os comentários de um mesmo
+autor) a notificação ainda não lida é atualizada num único UPDATE e quem
+ainda não tem uma recebe a sua por ``bulk_create``.
+
+O número de não lidas fica no cache por ``NOTIFICATIONS_UNREAD_TIMEOUT``
+segundos e é ajustado junto com as escritas; o ``COUNT`` só roda quando o
+valor não está no cache. Sem prazo só com um cache compartilhado: na
+memória local os ajustes feitos pela fila (no worker) ou por outro processo
+não chegam aqui, e o prazo curto limita quanto tempo o número fica errado.
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Notification
+from .replicas import PRIMARY
+
+BATCH_SIZE = 1000
+UNREAD_TIMEOUT = getattr(settings, 'NOTIFICATIONS_UNREAD_TIMEOUT', 30)
+
+
+def _unread_key(user_id):
+    return f'core:unread:{user_id}'
+
+
+def _unread(user_id):
+    return Notification.objects.filter(recipient_id=user_id, read_at__isnull=True)
+
+
+def _unread_total(user_id):
+    # Sempre no default: o valor fica no cache, e o COUNT de uma réplica atrasada ficaria junto
+    return _unread(user_id).using(PRIMARY)
+
+
+def unread_count(user):
+    count = cache.get(_unread_key(user.id))
+    if count is None:
+        count = _unread_total(user.id).count()
+        # add: não sobrescreve um valor que outra escrita acabou de ajustar
+        cache.add(_unread_key(user.id), count, UNREAD_TIMEOUT)
+    return count
+
+
+async def aunread_count(user):
+    count = cache.get(_unread_key(user.id))
+    if count is None:
+        count = await _unread_total(user.id).acount()
+        cache.add(_unread_key(user.id), count, UNREAD_TIMEOUT)
+    return count
+
+
+def _adjust(user_ids, delta):
+    for user_id in user_ids:
+        try:
+            cache.incr(_unread_key(user_id), delta)
+        except ValueError:
+            pass  # Fora do cache: o próximo unread_count conta de novo
+
+
+def notify(recipients, kind, group_key, actor_id, count=1):
+    """Junta ``count`` eventos de ``actor_id`` na notificação não lida de cada usuário em ``recipients``.
+
+    ``recipients`` é uma consulta de ``User``, usada como subconsulta: os ids
+    só são lidos (em lotes) para quem ainda não tem notificação do grupo.
+    """
+    now = timezone.now()
+    pending = Notification.objects.filter(kind=kind, group_key=group_key, read_at__isnull=True)
+    pending.filter(recipient__in=recipients).update(actor_id=actor_id, count=F('count') + count, updated_at=now)
+    new = recipients.exclude(pk__in=pending.values('recipient_id')).values_list('pk', flat=True)
+
+    batch = []
+    for recipient_id in new.iterator(chunk_size=BATCH_SIZE):
+        batch.append(Notification(
+            recipient_id=recipient_id, kind=kind, group_key=group_key, actor_id=actor_id, count=count, updated_at=now,
+        ))
+        if len(batch) == BATCH_SIZE:
+            _create(batch)
+            batch = []
+    _create(batch)
+
+
+def _create(batch):
+    if batch:
+        Notification.objects.bulk_create(batch)
+        recipient_ids = [notification.recipient_id for notification in batch]
+        transaction.on_commit(lambda: _adjust(recipient_ids, 1))
+
+
+def notify_follows(followers_by_user):
+    """``{user_id: [seguidor, ...]}`` em ordem: o último seguidor vira o "X" da mensagem.
+
+    Todos os usuários do lote de uma vez: um ``bulk_update`` para quem já tem
+    notificação de follow não lida e um ``bulk_create`` para o resto.
+    """
+    if not followers_by_user:
+        return
+    now = timezone.now()
+    pending = {
+        notification.recipient_id: notification
+        for notification in Notification.objects.filter(
+            kind=Notification.FOLLOW, group_key='', read_at__isnull=True, recipient_id__in=list(followers_by_user),
+        ).only('id', 'recipient_id')
+    }
+    for user_id, notification in pending.items():
+        notification.actor_id = followers_by_user[user_id][-1]
+        notification.count = F('count') + len(followers_by_user[user_id])
+        notification.updated_at = now
+    Notification.objects.bulk_update(pending.values(), ['actor', 'count', 'updated_at'])
+    _create([
+        Notification(recipient_id=user_id, kind=Notification.FOLLOW, actor_id=follower_ids[-1],
+                     count=len(follower_ids), updated_at=now)
+        for user_id, follower_ids in followers_by_user.items()
+        if user_id not in pending
+    ])
+
+
+def notify_comments(comments_by_author):
+    """``{autor: número de comentários novos}``: avisa todos os seguidores de cada autor."""
+    for author_id, count in comments_by_author.items():
+        followers = User.objects.filter(following__followed_id=author_id)
+        notify(followers, Notification.COMMENT, str(author_id), author_id, count)
+
+
+def mark_read(user, notification_id=None):
+    """Marca como lida uma notificação de ``user`` (ou todas, sem ``notification_id``)."""
+    unread = _unread(user.id)
+    if notification_id is not None:
+        unread = unread.filter(id=notification_id)
+    changed = unread.update(read_at=timezone.now())
+    if notification_id is None:
+        cache.set(_unread_key(user.id), 0, UNREAD_TIMEOUT)
+    elif changed:
+        _adjust([user.id], -changed)
+    return changed
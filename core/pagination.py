@@ -0,0 +1,146 @@
+# pagination.py
+"""Paginação por cursor (keyset) ordenada por ``(created_at, id)``.
+
+Em vez de OFFSET, cada página continua a partir da chave do último (ou do
+primeiro) item mostrado, o que vira uma única busca limitada no índice.
+Os cursores são opacos: base64 de ``direção|created_at|id``.
+"""
+import base64
+from datetime import datetime
+
+from django.conf import settings
+from django.core.exceptions import BadRequest
+from django.db.models import Q
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+PAGE_SIZE = getattr(settings, 'PAGINATION_PAGE_SIZE', 20)
+MAX_PAGE_SIZE = getattr(settings, 'PAGINATION_MAX_PAGE_SIZE', 100)
+
+DEFAULT_KEY = ('created_at', 'id')
+
+
+class Cursor:
+    def __init__(self, direction, created_at, pk):
+        self.direction = direction
+        self.created_at = created_at
+        self.pk = pk
+
+    @property
+    def is_previous(self):
+        return self.direction == PREVIOUS
+
+
+class Page:
+    def __init__(self, items, next_cursor=None, previous_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def encode_cursor(direction, created_at, pk):
+    raw = f'{direction}|{created_at.isoformat()}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        direction, created_at, pk = raw.split('|')
+        if direction not in (NEXT, PREVIOUS):
+            raise ValueError(direction)
+        return Cursor(direction, datetime.fromisoformat(created_at), int(pk))
+    except ValueError:
+        raise BadRequest('Cursor de paginação inválido.')
+
+
+def get_cursor(request):
+    token = request.GET.get('cursor')
+    return decode_cursor(token) if token else None
+
+
+def get_page_size(request):
+    try:
+        size = int(request.GET.get('size', PAGE_SIZE))
+    except ValueError:
+        return PAGE_SIZE
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def page_queryset(queryset, cursor, size, key=DEFAULT_KEY):
+    """Filtra e ordena ``queryset`` a partir do cursor, trazendo ``size + 1`` linhas.
+
+    A linha extra só serve para saber se existe mais uma página.
+    """
+    date_field, pk_field = key
+    if cursor is None:
+        return queryset.order_by(f'-{date_field}', f'-{pk_field}')[:size + 1]
+    if cursor.is_previous:
+        queryset = queryset.filter(
+            Q(**{f'{date_field}__gte': cursor.created_at})
+            & ~Q(**{date_field: cursor.created_at, f'{pk_field}__lte': cursor.pk})
+        ).order_by(date_field, pk_field)
+    else:
+        queryset = queryset.filter(
+            Q(**{f'{date_field}__lte': cursor.created_at})
+            & ~Q(**{date_field: cursor.created_at, f'{pk_field}__gte': cursor.pk})
+        ).order_by(f'-{date_field}', f'-{pk_field}')
+    return queryset[:size + 1]
+
+
+def build_page(rows, cursor, size, key=DEFAULT_KEY):
+    """Monta a página a partir das linhas de ``page_queryset``, na ordem em que vieram."""
+    date_field, pk_field = key
+    rows = list(rows)
+    has_more = len(rows) > size
+    rows = rows[:size]
+    if cursor is not None and cursor.is_previous:
+        rows.reverse()
+        has_next, has_previous = True, has_more
+    else:
+        has_next, has_previous = has_more, cursor is not None
+    if not rows:
+        return Page(rows)
+
+    def row_key(row):
+        return getattr(row, date_field), getattr(row, pk_field)
+
+    return Page(
+        rows,
+        next_cursor=encode_cursor(NEXT, *row_key(rows[-1])) if has_next else None,
+        previous_cursor=encode_cursor(PREVIOUS, *row_key(rows[0])) if has_previous else None,
+    )
+
+
+def paginate(queryset, request, key=DEFAULT_KEY):
+    """Página de ``queryset`` (do mais novo para o mais antigo) conforme ``?cursor=`` e ``?size=``."""
+    cursor = get_cursor(request)
+    size = get_page_size(request)
+    return build_page(page_queryset(queryset, cursor, size, key), cursor, size, key)
+
+
+async def alist(rows):
+    """Materializa um queryset (ou iterador assíncrono) sem bloquear o event loop."""
+    return [row async for row in rows]
+
+
+async def apaginate(queryset, request, key=DEFAULT_KEY):
+    """Versão assíncrona de ``paginate``."""
+    cursor = get_cursor(request)
+    size = get_page_size(request)
+    return build_page(await alist(page_queryset(queryset, cursor, size, key)), cursor, size, key)
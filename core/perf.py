@@ -0,0 +1,400 @@
+# perf.py
+"""Instrumentação de desempenho por requisição, sem APM externo.
+
+``PerformanceMiddleware`` mede cada requisição e acumula por nome de view:
+tempo total, consultas SQL (quantidade e tempo), tempo de renderização de
+templates e tamanho da resposta. As latências vão para histogramas no estilo
+HDR (buckets log-lineares, erro relativo de ~1,6%) em duas janelas que se
+revezam a cada ``PERF_WINDOW`` segundos, então os números cobrem só o
+passado recente.
+
+Consultas acima de ``PERF_SLOW_QUERY_MS`` são registradas no logger
+``core.perf`` com o SQL completo e a pilha de chamadas; dos parâmetros só
+a quantidade, porque eles trazem dados dos usuários. Cada processo grava a
+cada ``PERF_FLUSH_INTERVAL`` segundos, numa thread própria e fora das
+requisições, um ``perf-<pid>.json`` em ``PERF_DIR``, que o comando
+``perfreport`` junta; ``perf_stats_view`` mostra o processo atual. Processos
+que não atenderam nenhuma requisição (``check``, ``migrate``, ``test``) não
+gravam nada, e arquivos parados há mais de ``2 * PERF_WINDOW`` segundos
+(processos que já morreram) são apagados na gravação seguinte.
+"""
+import atexit
+import contextvars
+import functools
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import traceback
+from collections import deque
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+logger = logging.getLogger(__name__)
+
+ENABLED = getattr(settings, 'PERF_ENABLED', True)
+WINDOW = getattr(settings, 'PERF_WINDOW', 300)
+SLOW_QUERY_MS = getattr(settings, 'PERF_SLOW_QUERY_MS', 100)
+DIR = getattr(settings, 'PERF_DIR', None)
+FLUSH_INTERVAL = getattr(settings, 'PERF_FLUSH_INTERVAL', 10)
+
+# Sub-buckets por potência de dois: 2 ** SUB_BITS valores exatos antes de começar a arredondar
+SUB_BITS = 6
+SUB_MASK = (1 << SUB_BITS) - 1
+PERCENTILES = (0.5, 0.9, 0.99)
+
+_current = contextvars.ContextVar('core_perf_request', default=None)
+
+
+class Histogram:
+    """Histograma esparso de inteiros (microssegundos) com buckets log-lineares."""
+
+    def __init__(self, counts=None):
+        self.counts = counts or {}
+        self.total = sum(self.counts.values())
+
+    @staticmethod
+    def bucket(value):
+        shift = max(0, value.bit_length() - SUB_BITS)
+        return (shift << SUB_BITS) | (value >> shift)
+
+    @staticmethod
+    def highest(bucket):
+        # Maior valor que cai no bucket, como o HDR reporta
+        shift = bucket >> SUB_BITS
+        return ((bucket & SUB_MASK) << shift) + (1 << shift) - 1
+
+    def record(self, value):
+        key = self.bucket(max(0, int(value)))
+        self.counts[key] = self.counts.get(key, 0) + 1
+        self.total += 1
+
+    def merge(self, other):
+        for key, count in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
+        self.total += other.total
+
+    def percentile(self, fraction):
+        if not self.total:
+            return 0
+        rank = max(1, round(self.total * fraction))
+        seen = 0
+        for key in sorted(self.counts):
+            seen += self.counts[key]
+            if seen >= rank:
+                return self.highest(key)
+        return self.highest(max(self.counts))
+
+
+class ViewStats:
+    """Totais de uma view dentro de uma janela."""
+
+    FIELDS = ('requests', 'total_us', 'queries', 'db_us', 'template_us', 'bytes', 'max_us')
+
+    def __init__(self, data=None):
+        data = data or {}
+        for field in self.FIELDS:
+            setattr(self, field, data.get(field, 0))
+        self.latency = Histogram({int(key): count for key, count in data.get('latency', {}).items()})
+
+    def record(self, elapsed_us, request_stats, size):
+        self.requests += 1
+        self.total_us += elapsed_us
+        self.queries += request_stats.queries
+        self.db_us += request_stats.db_us
+        self.template_us += request_stats.template_us
+        self.bytes += size
+        self.max_us = max(self.max_us, elapsed_us)
+        self.latency.record(elapsed_us)
+
+    def merge(self, other):
+        for field in self.FIELDS:
+            if field == 'max_us':
+                self.max_us = max(self.max_us, other.max_us)
+            else:
+                setattr(self, field, getattr(self, field) + getattr(other, field))
+        self.latency.merge(other.latency)
+        return self
+
+    def to_dict(self):
+        data = {field: getattr(self, field) for field in self.FIELDS}
+        data['latency'] = self.latency.counts
+        return data
+
+    def summary(self):
+        requests = self.requests or 1
+        row = {'requests': self.requests}
+        for fraction in PERCENTILES:
+            row[f'p{round(fraction * 100)}_ms'] = round(min(self.latency.percentile(fraction), self.max_us) / 1000, 2)
+        row.update({
+            'max_ms': round(self.max_us / 1000, 2),
+            'total_ms': round(self.total_us / 1000, 1),
+            'queries': round(self.queries / requests, 1),
+            'db_ms': round(self.db_us / requests / 1000, 2),
+            'template_ms': round(self.template_us / requests / 1000, 2),
+            'bytes': round(self.bytes / requests),
+        })
+        return row
+
+
+class RequestStats:
+    __slots__ = ('queries', 'db_us', 'template_us', 'view')
+
+    def __init__(self):
+        self.queries = self.db_us = self.template_us = 0
+        self.view = None
+
+
+class Registry:
+    """Estatísticas do processo: duas janelas que se revezam e as consultas lentas recentes."""
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.lock = threading.Lock()
+        self.flusher = None
+        self.recorded = False
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started = time.time()
+            self.current = {}
+            self.previous = {}
+            self.slow_queries = deque(maxlen=50)
+
+    def _rotate(self, now):
+        if now - self.started >= self.window:
+            # Sem requisições por mais de uma janela, a anterior também já venceu
+            self.previous = self.current if now - self.started < 2 * self.window else {}
+            self.current = {}
+            self.started = now
+
+    def record(self, view, elapsed_us, request_stats, size):
+        now = time.time()
+        with self.lock:
+            self._rotate(now)
+            self.current.setdefault(view, ViewStats()).record(elapsed_us, request_stats, size)
+            self.recorded = True
+
+    def slow_query(self, entry):
+        with self.lock:
+            self.slow_queries.append(entry)
+
+    def views(self):
+        with self.lock:
+            self._rotate(time.time())
+            merged = {}
+            for window in (self.previous, self.current):
+                for view, stats in window.items():
+                    merged.setdefault(view, ViewStats()).merge(stats)
+            return merged
+
+    def dump(self):
+        """Estado bruto (mesclável entre processos)."""
+        views = self.views()
+        with self.lock:
+            slow = list(self.slow_queries)
+        return {
+            'pid': os.getpid(),
+            'time': time.time(),
+            'window': self.window,
+            'views': {view: stats.to_dict() for view, stats in views.items()},
+            'slow_queries': slow,
+        }
+
+    def flush(self):
+        # Sem nenhuma requisição medida não há o que somar no perfreport
+        if DIR and self.recorded:
+            write_dump(self.dump())
+
+    def _flush_forever(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except OSError:
+                logger.exception('Falha ao gravar as estatísticas de desempenho em %s', DIR)
+
+    def start_flushing(self):
+        """Grava o estado em ``PERF_DIR`` periodicamente, numa thread daemon (uma por processo)."""
+        with self.lock:
+            if not DIR or self.flusher is not None:
+                return
+            self.flusher = threading.Thread(target=self._flush_forever, name='core-perf-flush', daemon=True)
+            self.flusher.start()
+
+
+registry = Registry()
+# O que o processo mediu desde a última gravação não se perde ao encerrar
+atexit.register(registry.flush)
+
+
+def snapshot(views=None, slow_queries=()):
+    """Resumo legível (percentis em ms, médias por requisição) das views, mais quente primeiro."""
+    if views is None:
+        state = registry.dump()
+        views = {view: ViewStats(data) for view, data in state['views'].items()}
+        slow_queries = state['slow_queries']
+    rows = {view: stats.summary() for view, stats in views.items()}
+    ordered = sorted(rows.items(), key=lambda item: item[1]['total_ms'], reverse=True)
+    return {
+        'views': dict(ordered),
+        'slow_queries': sorted(slow_queries, key=lambda query: query['ms'], reverse=True),
+    }
+
+
+def write_dump(state):
+    os.makedirs(DIR, exist_ok=True)
+    path = os.path.join(DIR, f"perf-{state['pid']}.json")
+    # Escreve ao lado e troca, para o perfreport nunca ler um arquivo pela metade
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w') as output:
+        json.dump(state, output)
+    os.replace(temporary, path)
+    prune_dumps(DIR, 2 * WINDOW)
+
+
+def prune_dumps(directory, max_age):
+    """Apaga os arquivos que ninguém regrava há ``max_age`` segundos: o processo já morreu."""
+    now = time.time()
+    for path in glob.glob(os.path.join(directory, 'perf-*.json*')):
+        try:
+            if now - os.path.getmtime(path) > max_age:
+                os.remove(path)
+        except OSError:
+            # Outro processo apagou ou trocou o arquivo no meio do caminho
+            continue
+
+
+def read_dumps(directory, max_age=None):
+    """Junta os ``perf-<pid>.json`` de ``directory`` e devolve ``(views, slow_queries, pids)``."""
+    views, slow_queries, pids = {}, [], []
+    now = time.time()
+    for path in sorted(glob.glob(os.path.join(directory, 'perf-*.json'))):
+        try:
+            with open(path) as source:
+                state = json.load(source)
+        except (OSError, ValueError):
+            continue
+        if max_age is not None and now - state['time'] > max_age:
+            continue
+        pids.append(state['pid'])
+        for view, data in state['views'].items():
+            views.setdefault(view, ViewStats()).merge(ViewStats(data))
+        slow_queries.extend(state['slow_queries'])
+    return views, slow_queries, pids
+
+
+def record_query(execute, sql, params, many, context):
+    """``execute_wrapper`` instalado em toda conexão (ver ``CoreConfig.ready``)."""
+    request_stats = _current.get()
+    # Fora de requisições (comandos, migrações) não há o que medir
+    if request_stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed_us = int((time.perf_counter() - start) * 1_000_000)
+        request_stats.queries += 1
+        request_stats.db_us += elapsed_us
+        if elapsed_us >= SLOW_QUERY_MS * 1000:
+            _log_slow_query(request_stats.view, elapsed_us, sql, params)
+
+
+def _log_slow_query(view, elapsed_us, sql, params):
+    # Descarta os quadros deste módulo; o resto mostra de onde a consulta partiu
+    frames = traceback.extract_stack()[:-2]
+    stack = ''.join(traceback.format_list(frames))
+    logger.warning(
+        'Consulta lenta (%.1f ms) em %s: %s\n%d parâmetro(s)\n%s',
+        elapsed_us / 1000, view or '-', sql, len(params or ()), stack,
+    )
+    registry.slow_query({'ms': round(elapsed_us / 1000, 2), 'view': view, 'sql': sql, 'stack': stack})
+
+
+def install_query_wrapper(sender, connection, **kwargs):
+    if ENABLED and record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def instrument_templates():
+    """Soma em cada requisição o tempo de ``render()`` dos templates do Django."""
+    from django.template.backends.django import Template
+
+    if not ENABLED or getattr(Template.render, 'perf_instrumented', False):
+        return
+    original = Template.render
+
+    @functools.wraps(original)
+    def render(self, *args, **kwargs):
+        request_stats = _current.get()
+        if request_stats is None:
+            return original(self, *args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return original(self, *args, **kwargs)
+        finally:
+            request_stats.template_us += int((time.perf_counter() - start) * 1_000_000)
+
+    render.perf_instrumented = True
+    Template.render = render
+
+
+def _response_size(response):
+    if response.streaming:
+        return int(response.get('Content-Length') or 0)
+    return len(response.content)
+
+
+class PerformanceMiddleware:
+    """Mede cada requisição; funciona tanto sob WSGI quanto sob ASGI."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        registry.start_flushing()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request_stats = RequestStats()
+        token = _current.set(request_stats)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, request_stats, start, response)
+        return response
+
+    async def __acall__(self, request):
+        request_stats = RequestStats()
+        token = _current.set(request_stats)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, request_stats, start, response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request_stats = _current.get()
+        if request_stats is not None and request.resolver_match:
+            request_stats.view = request.resolver_match.view_name
+
+    def finish(self, request, request_stats, start, response):
+        elapsed_us = int((time.perf_counter() - start) * 1_000_000)
+        view = request_stats.view or ('<404>' if response.status_code == 404 else '<sem view>')
+        registry.record(view, elapsed_us, request_stats, _response_size(response))
@@ -0,0 +1,125 @@
+# ratelimit.py
+"""Limite de requisições por usuário e por IP, com baldes de fichas no cache.
+
+``RATE_LIMITS`` associa nomes de rota de ``core/urls.py`` às taxas de cada
+escopo, no formato ``"quantidade/período"`` (``s``, ``m``, ``h`` ou ``d``)::
+
+    RATE_LIMITS = {
+        'login': {'ip': '20/m', 'methods': ['POST']},
+        'follow_user': {'user': '60/m'},
+    }
+
+Cada (rota, escopo, usuário ou IP) tem um balde com ``quantidade`` fichas
+que volta a encher à taxa ``quantidade / período``: rajadas curtas passam e
+o ritmo sustentado fica limitado. O balde é só ``(fichas, instante)`` no
+cache ``RATELIMIT_CACHE``, então com um cache compartilhado (arquivos,
+Redis) o limite vale para todos os processos. A leitura e a escrita não
+são atômicas; duas requisições simultâneas podem levar a mesma ficha, o
+que para conter abuso não faz diferença.
+
+Passando do limite, ``RateLimitMiddleware`` responde 429 com
+``Retry-After`` sem chegar à view. Rotas sem regra custam só uma busca num
+dicionário (``benchratelimit`` mede o custo). Desligue com
+``RATELIMIT_ENABLED = False`` (os comandos de benchmark e de carga fazem isso).
+"""
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, JsonResponse
+from django.utils.deprecation import MiddlewareMixin
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+SCOPES = ('user', 'ip')
+CACHE_ALIAS = getattr(settings, 'RATELIMIT_CACHE', 'default')
+# Cabeçalho do META com o IP do cliente atrás de um proxy (ex.: 'HTTP_X_FORWARDED_FOR'); o último endereço vale
+IP_HEADER = getattr(settings, 'RATELIMIT_IP_HEADER', None)
+
+
+def parse_rate(rate):
+    """``'10/m'`` -> ``(10, 60)``: quantidade e período em segundos."""
+    count, _, period = rate.partition('/')
+    return int(count), PERIODS[period[-1]] * int(period[:-1] or 1)
+
+
+class Rule:
+    """Taxas de uma rota já convertidas: ``limits`` é ``[(escopo, capacidade, fichas por segundo), ...]``."""
+
+    __slots__ = ('name', 'methods', 'limits')
+
+    def __init__(self, name, config):
+        self.name = name
+        self.methods = frozenset(method.upper() for method in config.get('methods', ())) or None
+        self.limits = []
+        for scope in SCOPES:
+            if scope in config:
+                count, seconds = parse_rate(config[scope])
+                self.limits.append((scope, count, count / seconds))
+
+
+RULES = {name: Rule(name, config) for name, config in getattr(settings, 'RATE_LIMITS', {}).items()}
+
+
+def client_ip(request):
+    if IP_HEADER and IP_HEADER in request.META:
+        return request.META[IP_HEADER].rsplit(',', 1)[-1].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def take(cache, key, capacity, refill, now):
+    """Tira uma ficha do balde ``key``. Retorna 0 se passou ou os segundos até haver uma ficha."""
+    bucket = cache.get(key)
+    if bucket is None:
+        tokens = capacity
+    else:
+        tokens, last = bucket
+        tokens = min(capacity, tokens + (now - last) * refill)
+    if tokens < 1:
+        # Nada é gravado: o balde continua enchendo a partir da última ficha tirada
+        return (1 - tokens) / refill
+    # Depois de encher de novo o balde é igual a um que não existe, então pode expirar
+    cache.set(key, (tokens - 1, now), math.ceil(capacity / refill) + 1)
+    return 0
+
+
+def check(rule, request):
+    """Segundos de espera pedidos pela regra (0 se a requisição pode seguir)."""
+    cache = caches[CACHE_ALIAS]
+    now = time.time()
+    wait = 0
+    for scope, capacity, refill in rule.limits:
+        if scope == 'user':
+            if not request.user.is_authenticated:
+                continue
+            ident = request.user.pk
+        else:
+            ident = client_ip(request)
+        wait = max(wait, take(cache, f'core:ratelimit:{rule.name}:{scope}:{ident}', capacity, refill, now))
+    return wait
+
+
+def too_many_requests(rule, wait):
+    retry_after = max(1, math.ceil(wait))
+    message = f'Muitas requisições. Tente de novo em {retry_after} s.'
+    if rule.name.startswith('api_'):
+        response = JsonResponse({'detail': message}, status=429)
+    else:
+        response = HttpResponse(message, status=429, content_type='text/plain; charset=utf-8')
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+class RateLimitMiddleware(MiddlewareMixin):
+    """Aplica ``RATE_LIMITS`` pelo nome da rota; precisa vir depois do ``AuthenticationMiddleware``."""
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        rule = RULES.get(request.resolver_match.url_name)
+        if rule is None or not getattr(settings, 'RATELIMIT_ENABLED', True):
+            return None
+        if rule.methods is not None and request.method not in rule.methods:
+            return None
+        wait = check(rule, request)
+        if wait:
+            return too_many_requests(rule, wait)
+        return None
@@ -0,0 +1,86 @@
+# replicas.py
+"""Leituras em réplicas do banco, com "ler o que escrevi" depois de um POST.
+
+As réplicas são os aliases de ``DATABASE_REPLICAS`` (no settings, a partir de
+``DJANGO_REPLICAS``). Só as views marcadas com ``read_from_replica`` (feed,
+perfis e listas de seguidos/seguidores) leem delas, e só em GET/HEAD: a
+view escolhe uma réplica para a requisição inteira e ``ReplicaRouter``
+(``core/routers.py``) manda para ela todas as leituras. Escritas, tarefas da
+fila e as demais views continuam no ``default``.
+
+Uma réplica pode estar atrasada. Depois de qualquer requisição que escreve
+(POST, PUT, PATCH ou DELETE), ``ReplicaStickinessMiddleware`` grava o
+cookie ``REPLICA_COOKIE`` por ``REPLICA_STICKY_SECONDS``, e enquanto ele
+existir as leituras daquele navegador vão para o ``default``. Fragmentos
+renderizados a partir de uma réplica ficam no cache só por esse mesmo
+prazo (ver ``core/caching.py``), para um atraso não ficar guardado sob o
+carimbo novo.
+
+Localmente as réplicas podem ser cópias do arquivo SQLite, atualizadas pelo
+comando ``sync_replicas``::
+
+    DJANGO_REPLICAS=/tmp/replica1.sqlite3,/tmp/replica2.sqlite3 python manage.py sync_replicas --interval 5
+"""
+import contextvars
+import functools
+import random
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.deprecation import MiddlewareMixin
+
+PRIMARY = 'default'
+REPLICAS = list(getattr(settings, 'DATABASE_REPLICAS', []))
+STICKY_SECONDS = getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+COOKIE = getattr(settings, 'REPLICA_COOKIE', 'core_primary')
+SAFE_METHODS = ('GET', 'HEAD')
+
+_current = contextvars.ContextVar('core_replica', default=None)
+
+
+def current():
+    """Réplica usada pelas leituras da requisição atual, ou ``None`` para o ``default``."""
+    return _current.get()
+
+
+def _choose(request):
+    if not REPLICAS or request.method not in SAFE_METHODS or COOKIE in request.COOKIES:
+        return None
+    return random.choice(REPLICAS)
+
+
+def read_from_replica(view):
+    """Faz as leituras da view (GET/HEAD, sem o cookie de escrita recente) numa réplica."""
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            token = _current.set(_choose(request))
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                _current.reset(token)
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        token = _current.set(_choose(request))
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _current.reset(token)
+    return wrapper
+
+
+class ReplicaStickinessMiddleware(MiddlewareMixin):
+    """Depois de uma escrita, marca o navegador para ler do ``default`` por ``REPLICA_STICKY_SECONDS``."""
+
+    def __init__(self, get_response):
+        if not REPLICAS:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def process_response(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 500:
+            response.set_cookie(COOKIE, '1', max_age=STICKY_SECONDS, httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,61 @@
+# routers.py
+"""Roteamento entre o banco principal, o de arquivo (``archive``) e as réplicas de leitura.
+
+``ArchivedComment`` vive só no banco ``archive``; todo o resto só no
+``default``. As tabelas de cada um são criadas com::
+
+    python manage.py migrate
+    python manage.py migrate --database archive
+
+``ReplicaRouter`` vem depois do ``ArchiveRouter`` em ``DATABASE_ROUTERS``:
+leituras feitas dentro de uma view com ``read_from_replica`` vão para a
+réplica escolhida por ela (ver ``core/replicas.py``); as escritas sempre
+para o ``default``. As réplicas são cópias do ``default`` e não recebem
+migrações.
+"""
+from . import replicas
+
+ARCHIVE_ALIAS = 'archive'
+ARCHIVE_MODELS = {('core', 'archivedcomment')}
+
+
+class ArchiveRouter:
+    def _is_archive(self, model):
+        # Aceita modelo ou instância (inclusive o request.user preguiçoso)
+        return (model._meta.app_label, model._meta.model_name) in ARCHIVE_MODELS
+
+    def db_for_read(self, model, **hints):
+        return ARCHIVE_ALIAS if self._is_archive(model) else None
+
+    def db_for_write(self, model, **hints):
+        return ARCHIVE_ALIAS if self._is_archive(model) else None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if self._is_archive(obj1) or self._is_archive(obj2):
+            return False
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        in_archive = (app_label, model_name) in ARCHIVE_MODELS
+        if db == ARCHIVE_ALIAS:
+            return in_archive
+        return False if in_archive else None
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return replicas.current()
+
+    def db_for_write(self, model, **hints):
+        # Explícito: sem isso uma instância lida da réplica seria salva nela
+        return replicas.PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplica e principal têm os mesmos dados
+        pool = {replicas.PRIMARY, *replicas.REPLICAS}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return False if db in replicas.REPLICAS else None
@@ -0,0 +1,116 @@
+# search.py
+"""Busca textual em comentários e perfis usando tabelas FTS5 do SQLite.
+
+As tabelas ``core_comment_fts`` e ``core_profile_fts`` são criadas na
+migração 0009 e mantidas em sincronia por triggers, então qualquer escrita
+(inclusive ``bulk_create`` e o admin) já atualiza o índice. Os resultados
+são ordenados por bm25 e trazem um trecho com os termos destacados.
+Em bancos que não são SQLite a busca cai para ``icontains``.
+"""
+import datetime
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Comment, Profile
+
+PAGE_SIZE = getattr(settings, 'SEARCH_PAGE_SIZE', 20)
+
+# Marcadores que não aparecem em texto digitado; viram <mark> depois do escape
+_START, _END = '\x02', '\x03'
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def fts_available():
+    return connection.vendor == 'sqlite'
+
+
+def match_expression(query):
+    """Converte o texto digitado numa expressão MATCH segura (todas as palavras, a última como prefixo)."""
+    words = _WORD.findall(query)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def highlight(snippet):
+    return mark_safe(escape(snippet).replace(_START, '<mark>').replace(_END, '</mark>'))
+
+
+class Result:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+def _fetch(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def search_comments(query, page=1, size=PAGE_SIZE):
+    """Comentários que casam com ``query``; devolve ``size + 1`` resultados para saber se há mais."""
+    expression = match_expression(query)
+    if expression is None:
+        return []
+    offset = (page - 1) * size
+    if not fts_available():
+        comments = Comment.objects.filter(content__icontains=query).select_related('user').order_by('-created_at')
+        return [
+            Result(id=c.id, username=c.user.username, created_at=c.created_at, snippet=c.content)
+            for c in comments[offset:offset + size + 1]
+        ]
+    rows = _fetch(
+        """
+        SELECT c.id, u.username, c.created_at,
+               snippet(core_comment_fts, 0, %s, %s, '…', 16) AS snippet
+        FROM core_comment_fts
+        JOIN core_comment c ON c.id = core_comment_fts.rowid
+        JOIN auth_user u ON u.id = c.user_id
+        WHERE core_comment_fts MATCH %s
+        ORDER BY bm25(core_comment_fts)
+        LIMIT %s OFFSET %s
+        """,
+        [_START, _END, expression, size + 1, offset],
+    )
+    for row in rows:
+        # Em consultas cruas o SQLite devolve a data em UTC, sem fuso
+        if timezone.is_naive(row['created_at']):
+            row['created_at'] = timezone.make_aware(row['created_at'], datetime.timezone.utc)
+        row['snippet'] = highlight(row['snippet'])
+    return [Result(**row) for row in rows]
+
+
+def search_profiles(query, page=1, size=PAGE_SIZE):
+    """Perfis cujo usuário, nome, localização ou bio casam com ``query``."""
+    expression = match_expression(query)
+    if expression is None:
+        return []
+    offset = (page - 1) * size
+    if not fts_available():
+        profiles = Profile.objects.filter(user__username__icontains=query).select_related('user')
+        return [
+            Result(username=p.user.username, full_name=p.full_name, snippet=p.bio)
+            for p in profiles.order_by('user__username')[offset:offset + size + 1]
+        ]
+    rows = _fetch(
+        """
+        SELECT username, full_name,
+               snippet(core_profile_fts, -1, %s, %s, '…', 16) AS snippet
+        FROM core_profile_fts
+        WHERE core_profile_fts MATCH %s
+        ORDER BY bm25(core_profile_fts, 4.0, 2.0, 1.0, 1.0)
+        LIMIT %s OFFSET %s
+        """,
+        [_START, _END, expression, size + 1, offset],
+    )
+    for row in rows:
+        row['snippet'] = highlight(row['snippet'])
+    return [Result(**row) for row in rows]
@@ -0,0 +1,203 @@
+# seeding.py
+"""Geração de dados sintéticos em volume para testes de carga e benchmarks.
+
+Tudo é inserido com ``bulk_create`` em lotes e derivado de um ``random.Random``
+com semente fixa, então a mesma semente gera sempre o mesmo grafo. O número
+de seguidores segue uma lei de potência (poucos perfis muito seguidos, a
+maioria com poucos seguidores) e o número de seguidos uma distribuição de
+Pareto. Também preenche o que as views esperam encontrar pronto: contadores
+do Profile, hashtags e menções dos comentários e a linha do tempo dos autores
+com fan-out na escrita.
+"""
+import itertools
+import random
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.urls import URLPattern, reverse
+
+from . import tags, trending, urls
+from .models import Comment, CommentTag, Follow, Hashtag, Mention, Notification, Profile, TimelineEntry
+from .suggestions import FollowGraph
+from .timeline import FANOUT_LIMIT
+
+PASSWORD = 'senha-de-teste'
+POPULARITY_EXPONENT = 1.1
+HASHTAGS = 200
+TAGGED_FRACTION = 0.3
+MENTION_FRACTION = 0.1
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def seed_dataset(users, comments, avg_follows=30, seed=42, batch_size=5000, prefix='user', log=print):
+    """Cria ``users`` usuários (com Profile), seus Follows e ``comments`` comentários."""
+    rng = random.Random(seed)
+    password = make_password(PASSWORD)
+
+    user_ids = array('q')
+    for batch in _batches(range(users), batch_size):
+        created = User.objects.bulk_create(User(username=f'{prefix}{i:07d}', password=password) for i in batch)
+        user_ids.extend(user.id for user in created)
+    log(f'{users} usuários criados')
+
+    # Popularidade de cada usuário em lei de potência, sorteada por peso acumulado
+    ranking = list(range(users))
+    rng.shuffle(ranking)
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) ** POPULARITY_EXPONENT for rank in ranking))
+    followers_count = array('q', bytes(8 * users))
+    following_count = array('q', bytes(8 * users))
+
+    def follows():
+        for follower in range(users):
+            wanted = min(users - 1, int(rng.paretovariate(1.5) * avg_follows / 3))
+            chosen = set(rng.choices(range(users), cum_weights=cum_weights, k=wanted))
+            chosen.discard(follower)
+            following_count[follower] = len(chosen)
+            for followed in sorted(chosen):
+                followers_count[followed] += 1
+                yield Follow(follower_id=user_ids[follower], followed_id=user_ids[followed])
+
+    edges = 0
+    for batch in _batches(follows(), batch_size):
+        Follow.objects.bulk_create(batch)
+        edges += len(batch)
+    log(f'{edges} follows criados')
+
+    # Quem segue mais também tende a postar mais
+    comments_count = array('q', bytes(8 * users))
+    author_weights = list(itertools.accumulate(count + 1 for count in following_count))
+    authors = rng.choices(range(users), cum_weights=author_weights, k=comments)
+    # Hashtags também em lei de potência: poucos temas muito usados
+    tag_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(HASHTAGS)))
+
+    def content(author):
+        text = f'Comentário {rng.randrange(10 ** 6)} de {prefix}{author:07d}'
+        if rng.random() < TAGGED_FRACTION:
+            text += f' #tema{rng.choices(range(HASHTAGS), cum_weights=tag_weights)[0]}'
+        if rng.random() < MENTION_FRACTION:
+            text += f' @{prefix}{rng.randrange(users):07d}'
+        return text
+
+    for batch in _batches(authors, batch_size):
+        for author in batch:
+            comments_count[author] += 1
+        Comment.objects.bulk_create(Comment(user_id=user_ids[author], content=content(author)) for author in batch)
+    log(f'{comments} comentários criados')
+    tagged, mentions = _index_tags(user_ids, prefix, batch_size)
+    log(f'{tagged} hashtags e {mentions} menções indexadas')
+
+    for batch in _batches(range(users), batch_size):
+        Profile.objects.bulk_create(
+            Profile(
+                user_id=user_ids[i],
+                followers_count=followers_count[i],
+                following_count=following_count[i],
+                comments_count=comments_count[i],
+            )
+            for i in batch
+        )
+    log(f'{users} perfis criados')
+
+    entries = _fan_out(user_ids, followers_count, batch_size)
+    log(f'{entries} entradas de linha do tempo criadas')
+    return {'users': users, 'follows': edges, 'comments': comments, 'comment_tags': tagged, 'mentions': mentions,
+            'timeline_entries': entries}
+
+
+def _fan_out(user_ids, followers_count, batch_size):
+    """Preenche a linha do tempo dos comentários recém-criados, como ``timeline.fan_out_comments``."""
+    # Grafo invertido: ``followers.following(autor)`` devolve os seguidores do autor
+    reverse_edges = Follow.objects.filter(followed_id__gte=user_ids[0]).order_by('followed_id', 'follower_id')
+    followers = FollowGraph(reverse_edges.values_list('followed_id', 'follower_id').iterator(chunk_size=batch_size))
+    new_comments = Comment.objects.filter(user_id__gte=user_ids[0]).order_by('id').values_list('id', 'user_id', 'created_at')
+
+    def entries():
+        for comment_id, author_id, created_at in new_comments.iterator(chunk_size=batch_size):
+            if followers_count[bisect_left(user_ids, author_id)] > FANOUT_LIMIT:
+                continue
+            for follower_id in followers.following(author_id):
+                yield TimelineEntry(owner_id=follower_id, comment_id=comment_id, author_id=author_id, created_at=created_at)
+
+    total = 0
+    for batch in _batches(entries(), batch_size):
+        TimelineEntry.objects.bulk_create(batch)
+        total += len(batch)
+    return total
+
+
+def _index_tags(user_ids, prefix, batch_size):
+    """Grava hashtags e menções dos comentários recém-criados, como ``tags.index_comment``."""
+    new_comments = Comment.objects.filter(user_id__gte=user_ids[0]).order_by('id').values_list(
+        'id', 'user_id', 'content', 'created_at'
+    )
+    hashtag_ids = {}
+    uses = Counter()
+
+    def user_id(username):
+        # Os nomes gerados são o prefixo mais a posição em user_ids
+        number = username[len(prefix):]
+        if username.startswith(prefix) and number.isdigit() and int(number) < len(user_ids):
+            return user_ids[int(number)]
+        return None
+
+    tagged = mentions = 0
+    for batch in _batches(new_comments.iterator(chunk_size=batch_size), batch_size):
+        comment_tags, comment_mentions = [], []
+        for comment_id, author_id, content, created_at in batch:
+            names, mentioned = tags.parse(content)
+            missing = names - hashtag_ids.keys()
+            if missing:
+                Hashtag.objects.bulk_create([Hashtag(name=name) for name in missing], ignore_conflicts=True)
+                hashtag_ids.update(Hashtag.objects.filter(name__in=missing).values_list('name', 'id'))
+            comment_tags += [
+                CommentTag(comment_id=comment_id, hashtag_id=hashtag_ids[name], created_at=created_at) for name in names
+            ]
+            uses.update(hashtag_ids[name] for name in names)
+            comment_mentions += [
+                Mention(comment_id=comment_id, user_id=mentioned_id, created_at=created_at)
+                for mentioned_id in map(user_id, mentioned)
+                if mentioned_id not in (None, author_id)
+            ]
+        CommentTag.objects.bulk_create(comment_tags)
+        Mention.objects.bulk_create(comment_mentions)
+        tagged += len(comment_tags)
+        mentions += len(comment_mentions)
+    trending.record(uses)
+    return tagged, mentions
+
+
+SKIPPED_ROUTES = {'logout', 'api_follows', 'api_import_follows'}
+
+
+def sample_urls(owner):
+    """Uma URL de cada rota de ``core/urls.py``, com os parâmetros preenchidos com dados de ``owner``.
+
+    Rotas cujos parâmetros não têm dado disponível, que encerram a sessão ou que só
+    aceitam POST ficam de fora.
+    """
+    followed = Follow.objects.filter(follower=owner).select_related('followed').first()
+    comment = Comment.objects.filter(user=owner).first() or Comment.objects.create(user=owner, content='benchmark')
+    notification = Notification.objects.filter(recipient=owner).first()
+    tagged = CommentTag.objects.select_related('hashtag').first()
+    values = {
+        'username': followed.followed.username if followed else owner.username,
+        'comment_id': comment.id,
+        'notification_id': notification.id if notification else None,
+        'name': tagged.hashtag.name if tagged else None,
+    }
+    found = {}
+    for pattern in urls.urlpatterns:
+        if not isinstance(pattern, URLPattern) or pattern.name in SKIPPED_ROUTES:
+            continue
+        kwargs = {name: values.get(name) for name in pattern.pattern.converters}
+        if None not in kwargs.values():
+            found[pattern.name] = reverse(pattern.name, kwargs=kwargs)
+    return found
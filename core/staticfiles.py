@@ -0,0 +1,163 @@
+# staticfiles.py
+"""Arquivos estáticos com hash no nome, minificados, pré-comprimidos e servidos com cache longo.
+
+``CompressedManifestStaticFilesStorage`` estende o ``ManifestStaticFilesStorage``:
+no ``collectstatic`` minifica o CSS antes do hash (o hash é o do arquivo
+minificado) e grava ao lado de cada arquivo textual as variantes ``.gz`` e,
+se o pacote ``brotli`` estiver instalado, ``.br``.
+
+``StaticFilesMiddleware`` serve o ``STATIC_ROOT`` direto do processo (WSGI
+ou ASGI), escolhendo a variante pelo ``Accept-Encoding``. Arquivos com hash
+no nome nunca mudam, então vão com ``Cache-Control: immutable`` de um ano;
+os demais com um prazo curto e ``Last-Modified``.
+"""
+import gzip
+import mimetypes
+import os
+import re
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, StaticFilesStorage
+from django.core.files.base import ContentFile
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MAX_AGE = getattr(settings, 'STATIC_MAX_AGE', 60 * 60 * 24 * 365)
+SHORT_MAX_AGE = 60
+COMPRESSIBLE = ('.css', '.js', '.svg', '.txt', '.json', '.map', '.html', '.xml')
+# Abaixo disso o cabeçalho do gzip come o ganho
+MIN_COMPRESS_SIZE = 256
+
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[^/.]+$')
+_CSS_STRING = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')')
+_CSS_COMMENT = re.compile(r'/\*(?!!).*?\*/', re.S)
+
+
+def minify_css(css):
+    """Remove comentários e espaços supérfluos do CSS, sem tocar em strings."""
+    parts = _CSS_STRING.split(_CSS_COMMENT.sub('', css))
+    for index in range(0, len(parts), 2):
+        code = re.sub(r'\s+', ' ', parts[index])
+        # Antes de ':' o espaço importa ("a :hover" não é "a:hover"), depois não
+        code = re.sub(r'\s*([{};,>])\s*', r'\1', code)
+        code = re.sub(r':\s+', ':', code)
+        parts[index] = code.replace(';}', '}')
+    return ''.join(parts).strip()
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def _save(self, name, content):
+        if name.endswith('.css'):
+            content.seek(0)
+            content = ContentFile(minify_css(content.read().decode('utf-8')).encode('utf-8'))
+        return super()._save(name, content)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in self.hashed_files.values():
+            if name.endswith(COMPRESSIBLE):
+                yield from self.compress(name)
+
+    def compress(self, name):
+        with self.open(name) as source:
+            data = source.read()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return
+        variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants['.br'] = brotli.compress(data)
+        for suffix, compressed in variants.items():
+            if len(compressed) < len(data):
+                if self.exists(name + suffix):
+                    self.delete(name + suffix)
+                self._save(name + suffix, ContentFile(compressed))
+                yield name, name + suffix, True
+
+    def url(self, name, force=False):
+        try:
+            return super().url(name, force)
+        except ValueError:
+            # Sem collectstatic (desenvolvimento, testes) fica o nome sem hash
+            return StaticFilesStorage.url(self, name)
+
+
+class StaticFilesMiddleware:
+    """Serve ``STATIC_URL`` a partir do ``STATIC_ROOT`` antes do resto da pilha."""
+
+    sync_capable = True
+    async_capable = True
+
+    ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = settings.STATIC_URL if settings.STATIC_URL.startswith('/') else f'/{settings.STATIC_URL}'
+        self.root = settings.STATIC_ROOT
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.serve(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        response = await sync_to_async(self.serve)(request, stream=False)
+        return response or await self.get_response(request)
+
+    def find(self, request):
+        """Caminho do arquivo pedido no ``STATIC_ROOT`` (ou ``None``)."""
+        if not self.root or request.method not in ('GET', 'HEAD') or not request.path.startswith(self.prefix):
+            return None
+        try:
+            path = safe_join(self.root, request.path[len(self.prefix):])
+        except ValueError:
+            return None
+        return path if os.path.isfile(path) else None
+
+    def serve(self, request, stream=True):
+        path = self.find(request)
+        if path is None:
+            return None
+        stat = os.stat(path)
+        immutable = bool(HASHED_NAME.search(path))
+        if not immutable and not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime):
+            return HttpResponseNotModified()
+
+        content_type, _ = mimetypes.guess_type(path)
+        accepted = request.headers.get('Accept-Encoding', '')
+        served, encoding = path, None
+        for name, suffix in self.ENCODINGS:
+            if name in accepted and os.path.isfile(path + suffix):
+                served, encoding = path + suffix, name
+                break
+
+        if stream:
+            response = FileResponse(
+                open(served, 'rb'), content_type=content_type or 'application/octet-stream', filename=os.path.basename(path),
+            )
+        else:
+            # Sob ASGI um iterador síncrono seria lido numa thread de qualquer jeito
+            with open(served, 'rb') as source:
+                response = HttpResponse(source.read(), content_type=content_type or 'application/octet-stream')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if path.endswith(COMPRESSIBLE):
+            response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['Content-Length'] = os.path.getsize(served)
+        response.headers['Last-Modified'] = http_date(stat.st_mtime)
+        if immutable:
+            response.headers['Cache-Control'] = f'public, max-age={MAX_AGE}, immutable'
+        else:
+            response.headers['Cache-Control'] = f'public, max-age={SHORT_MAX_AGE}'
+        return response
@@ -0,0 +1,80 @@
+# suggestions.py
+"""Sugestões de quem seguir: amigos de amigos ordenados por seguidos em comum.
+
+O grafo de Follow é percorrido fora das requisições pelo comando
+``build_suggestions``, que monta uma representação CSR compacta (``array``)
+e grava o top-K de cada usuário em ``FollowSuggestions``. As views só leem
+essa lista pronta.
+"""
+import heapq
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Follow, FollowSuggestions
+
+TOP_K = getattr(settings, 'SUGGESTIONS_TOP_K', 10)
+
+
+class FollowGraph:
+    """Grafo dirigido em formato CSR: os seguidos de ``ids[i]`` são ``targets[offsets[i]:offsets[i + 1]]``."""
+
+    def __init__(self, edges):
+        # ``edges`` precisa vir ordenado por seguidor
+        self.ids = array('q')
+        self.offsets = array('q', [0])
+        self.targets = array('q')
+        for follower_id, followed_id in edges:
+            if not self.ids or self.ids[-1] != follower_id:
+                if self.ids:
+                    self.offsets.append(len(self.targets))
+                self.ids.append(follower_id)
+            self.targets.append(followed_id)
+        if self.ids:
+            self.offsets.append(len(self.targets))
+
+    @classmethod
+    def load(cls, chunk_size=10000):
+        edges = Follow.objects.order_by('follower_id', 'followed_id').values_list('follower_id', 'followed_id')
+        return cls(edges.iterator(chunk_size=chunk_size))
+
+    def following(self, user_id):
+        i = bisect_left(self.ids, user_id)
+        if i == len(self.ids) or self.ids[i] != user_id:
+            return self.targets[0:0]
+        return self.targets[self.offsets[i]:self.offsets[i + 1]]
+
+    def suggestions(self, user_id, k=TOP_K):
+        """Os ``k`` melhores amigos de amigos de ``user_id`` como pares ``(id, em_comum)``."""
+        following = self.following(user_id)
+        excluded = set(following)
+        excluded.add(user_id)
+        mutual = Counter()
+        for followed_id in following:
+            for candidate in self.following(followed_id):
+                if candidate not in excluded:
+                    mutual[candidate] += 1
+        return heapq.nlargest(k, mutual.items(), key=lambda item: (item[1], -item[0]))
+
+
+def mark_stale(*user_ids):
+    """Os usuários mudaram quem seguem: suas sugestões e as de quem os segue precisam ser recalculadas."""
+    # Subconsulta em vez do JOIN: com o OR sobre o JOIN o SQLite varria a tabela inteira
+    followers = Follow.objects.filter(followed_id__in=user_ids).values('follower_id')
+    FollowSuggestions.objects.filter(Q(user_id__in=user_ids) | Q(user_id__in=followers)).update(
+        stale=True, stale_at=timezone.now(),
+    )
+
+
+def get_suggestions(user, limit=5):
+    items = FollowSuggestions.objects.filter(user=user).values_list('items', flat=True).first()
+    return (items or [])[:limit]
+
+
+async def aget_suggestions(user, limit=5):
+    items = await FollowSuggestions.objects.filter(user=user).values_list('items', flat=True).afirst()
+    return (items or [])[:limit]
@@ -0,0 +1,87 @@
+# tags.py
+"""Hashtags (``#tag``) e menções (``@usuario``) dos comentários.
+
+São extraídas do texto quando o comentário é criado ou editado e gravadas
+em ``CommentTag`` e ``Mention``, na mesma transação do comentário. A página
+de uma hashtag e a lista de menções de um usuário viram uma busca ordenada
+no índice ``(hashtag|user, created_at, id)``, sem ``LIKE '%#tag%'``.
+"""
+import re
+
+from django.contrib.auth.models import User
+from django.db.models import Count
+from django.urls import reverse
+from django.utils.html import escape, format_html
+from django.utils.safestring import mark_safe
+
+from .models import CommentTag, Hashtag, Mention
+
+MAX_TAG_LENGTH = 50
+HASHTAG = re.compile(r'(?<!\w)#(\w+)')
+# Nomes de usuário do Django aceitam letras, números e @ . + - _
+MENTION = re.compile(r'(?<![\w@])@([\w.+-]+)')
+
+
+def parse(content):
+    """``(hashtags, nomes de usuário)`` citados em ``content``."""
+    tags = {tag.lower() for tag in HASHTAG.findall(content) if len(tag) <= MAX_TAG_LENGTH}
+    # Um ponto final colado na menção ("fala com @ana.") não faz parte do nome
+    usernames = {username.rstrip('.') for username in MENTION.findall(content)}
+    return tags, usernames - {''}
+
+
+def index_comment(comment, edited=False):
+    """Grava as hashtags e menções de ``comment``; numa edição, substitui as anteriores."""
+    if edited:
+        CommentTag.objects.filter(comment=comment).delete()
+        Mention.objects.filter(comment=comment).delete()
+    tags, usernames = parse(comment.content)
+    if tags:
+        Hashtag.objects.bulk_create([Hashtag(name=name) for name in tags], ignore_conflicts=True)
+        CommentTag.objects.bulk_create(
+            CommentTag(comment=comment, hashtag_id=hashtag_id, created_at=comment.created_at)
+            for hashtag_id in Hashtag.objects.filter(name__in=tags).values_list('id', flat=True)
+        )
+    if usernames:
+        mentioned = User.objects.filter(username__in=usernames).exclude(id=comment.user_id)
+        Mention.objects.bulk_create(
+            Mention(comment=comment, user_id=user_id, created_at=comment.created_at)
+            for user_id in mentioned.values_list('id', flat=True)
+        )
+
+
+def tag_counts(comment_ids):
+    """``{hashtag_id: número de comentários}`` entre ``comment_ids``."""
+    return dict(
+        CommentTag.objects.filter(comment_id__in=comment_ids).values('hashtag_id').annotate(total=Count('id'))
+        .values_list('hashtag_id', 'total')
+    )
+
+
+_LINKS = re.compile(f'{MENTION.pattern}|{HASHTAG.pattern}')
+
+
+def _link(match):
+    tag = match.group(2)
+    if tag is not None:
+        if len(tag) > MAX_TAG_LENGTH:
+            return escape(match.group(0))
+        return format_html('<a href="{}">#{}</a>', reverse('tag', args=[tag.lower()]), tag)
+    username = match.group(1).rstrip('.')
+    if not username:
+        return escape(match.group(0))
+    return format_html(
+        '<a href="{}">@{}</a>{}', reverse('other_profile', args=[username]), username, match.group(1)[len(username):]
+    )
+
+
+def linkify(content):
+    """HTML de ``content`` com hashtags e menções virando links; o resto do texto é escapado."""
+    parts = []
+    last = 0
+    for match in _LINKS.finditer(content):
+        parts.append(escape(content[last:match.start()]))
+        parts.append(_link(match))
+        last = match.end()
+    parts.append(escape(content[last:]))
+    return mark_safe(''.join(parts))
@@ -0,0 +1,12 @@
+# hashtags.py
+from django import template
+
+from core import tags
+
+register = template.Library()
+
+
+# Texto do comentário com #hashtags e @menções como links
+@register.filter
+def linkify(content):
+    return tags.linkify(content)
@@ -1,3 +1,860 @@
-from django.test import TestCase
+import base64
+import contextlib
+import json
+import os
+import struct
+import tempfile
+import time
+import unittest
+import uuid
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core import (
+    archive, caching, graph, jobs, media, notifications, perf, ratelimit, replicas, search, suggestions, trending,
+)
+from core.models import (
+    ArchivedComment, Comment, CommentTag, Follow, FollowSuggestions, Hashtag, Job, Media, Mention, Notification,
+    Profile, TimelineEntry,
+)
+from core.pagination import paginate
+from core.views import user_comments
+
+
+def setUpModule():
+    # Com DJANGO_REPLICAS as réplicas são outras conexões e não enxergam a transação de cada teste
+    patcher = mock.patch.object(replicas, 'REPLICAS', [])
+    patcher.start()
+    unittest.addModuleCleanup(patcher.stop)
+
+
+def seed(size):
+    """Cria o usuário ``budget`` com ``size`` seguidos, seguidores, comentários, notificações e menções.
+
+    Os comentários do ``budget`` têm a hashtag ``#budget``.
+    """
+    owner = User.objects.create_user('budget', password='budget')
+    Profile.objects.create(user=owner)
+    others = User.objects.bulk_create(User(username=f'budget{i}') for i in range(size))
+    Profile.objects.bulk_create(Profile(user=user) for user in others)
+    Follow.objects.bulk_create(Follow(follower=owner, followed=user) for user in others)
+    Follow.objects.bulk_create(Follow(follower=user, followed=owner) for user in others)
+    own = Comment.objects.bulk_create(Comment(user=owner, content=f'comentário {i} #budget') for i in range(size))
+    hashtag = Hashtag.objects.create(name='budget')
+    CommentTag.objects.bulk_create(CommentTag(comment=comment, hashtag=hashtag, created_at=comment.created_at) for comment in own)
+    trending.record({hashtag.id: size})
+    comments = Comment.objects.bulk_create(Comment(user=user, content=f'de {user.username} @budget') for user in others)
+    Mention.objects.bulk_create(Mention(comment=comment, user=owner, created_at=comment.created_at) for comment in comments)
+    TimelineEntry.objects.bulk_create(
+        TimelineEntry(owner=owner, comment=comment, author=comment.user, created_at=comment.created_at)
+        for comment in comments
+    )
+    Notification.objects.bulk_create(
+        Notification(recipient=owner, kind=Notification.COMMENT, group_key=str(user.id), actor=user) for user in others
+    )
+    return owner
+
+
+class QueryBudgetTests(TestCase):
+    """Número de consultas SQL de cada view com 10 linhas; as subclasses repetem com 100 e 1000.
+
+    O mesmo número nos três tamanhos garante que nenhuma view faz N+1. A
+    contagem é com o cache vazio, incluindo sessão, usuário autenticado e o
+    COUNT das notificações não lidas (que com o cache quente não roda).
+    """
+
+    SIZE = 10
+    BUDGETS = {
+        'index': 6,
+        'profile': 5,
+        'other_profile': 6,
+        'edit_comment': 6,
+        'following_list': 4,
+        'followed_list': 4,
+        'notifications': 4,
+        'tag': 5,
+        'mentions': 4,
+        'trending': 5,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = seed(cls.SIZE)
+
+    def setUp(self):
+        self.client.force_login(self.owner)
+
+    def urls(self):
+        return {
+            'index': reverse('index'),
+            'profile': reverse('profile'),
+            'other_profile': reverse('other_profile', args=['budget0']),
+            'edit_comment': reverse('edit_comment', args=[Comment.objects.filter(user=self.owner).first().id]),
+            'following_list': reverse('following_list'),
+            'followed_list': reverse('followed_list'),
+            'notifications': reverse('notifications'),
+            'tag': reverse('tag', args=['budget']),
+            'mentions': reverse('mentions'),
+            'trending': reverse('trending'),
+        }
+
+    def test_query_budgets(self):
+        for name, url in self.urls().items():
+            with self.subTest(view=name, size=self.SIZE):
+                cache.clear()
+                with self.assertNumQueries(self.BUDGETS[name]):
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+
+class QueryBudget100Tests(QueryBudgetTests):
+    SIZE = 100
+
+
+class QueryBudget1000Tests(QueryBudgetTests):
+    SIZE = 1000
+
+
+class BuildSuggestionsTests(TestCase):
+    def test_stale_run_keeps_marks_made_while_computing(self):
+        first, second, third = (User.objects.create_user(f'sugestao{i}') for i in range(3))
+        Follow.objects.create(follower=first, followed=second)
+        Follow.objects.create(follower=second, followed=third)
+        FollowSuggestions.objects.bulk_create(FollowSuggestions(user=user) for user in (first, second, third))
+        load = suggestions.FollowGraph.load
+
+        def load_then_follow():
+            graph = load()
+            # Um follow novo chega depois de o grafo ter sido lido
+            suggestions.mark_stale(third.id)
+            return graph
+
+        with mock.patch.object(suggestions.FollowGraph, 'load', load_then_follow):
+            call_command('build_suggestions', stale=True, stdout=StringIO())
+
+        stale = dict(FollowSuggestions.objects.values_list('user_id', 'stale'))
+        self.assertEqual(stale, {first.id: False, second.id: True, third.id: True})
+        self.assertEqual(FollowSuggestions.objects.get(user=first).items, [[third.id, third.username, 1]])
+
+
+def make_comments(user, count, start=None):
+    """``count`` comentários de ``user``, um por minuto, do mais velho para o mais novo; os dois últimos empatam."""
+    start = start or timezone.now() - timedelta(days=1)
+    comments = Comment.objects.bulk_create(Comment(user=user, content=f'comentário {i}') for i in range(count))
+    for i, comment in enumerate(comments):
+        comment.created_at = start + timedelta(minutes=min(i, count - 2))
+    Comment.objects.bulk_update(comments, ['created_at'])
+    return comments
+
+
+def walk(fetch, cursor=None, backwards=False):
+    """Todas as páginas a partir de ``cursor``, seguindo o cursor seguinte (ou o anterior)."""
+    pages = []
+    while True:
+        page = fetch(cursor)
+        pages.append([comment.id for comment in page])
+        cursor = page.previous_cursor if backwards else page.next_cursor
+        if cursor is None:
+            return pages
+
+
+class PaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('paginas', password='paginas')
+        self.profile = Profile.objects.create(user=self.user)
+        self.comments = make_comments(self.user, 7)
+        self.factory = RequestFactory()
+
+    def fetch(self, cursor):
+        params = {'size': 3, 'cursor': cursor} if cursor else {'size': 3}
+        return paginate(Comment.objects.filter(user=self.user), self.factory.get('/', params))
+
+    def test_invalid_cursor_is_bad_request(self):
+        self.client.force_login(self.user)
+        bad_direction = base64.urlsafe_b64encode(f'x|{timezone.now().isoformat()}|1'.encode()).decode()
+        for cursor in ('!!!', 'bm9wZQ', bad_direction):
+            with self.subTest(cursor=cursor):
+                for url in (reverse('profile'), reverse('following_list')):
+                    self.assertEqual(self.client.get(url, {'cursor': cursor}).status_code, 400)
+
+    def test_pages_cover_everything_once(self):
+        pages = walk(self.fetch)
+        newest_first = sorted(self.comments, key=lambda c: (c.created_at, c.id), reverse=True)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(sum(pages, []), [comment.id for comment in newest_first])
+
+    def test_previous_cursor_reverses_direction(self):
+        forward = walk(self.fetch)
+        last = self.fetch(self.fetch(self.fetch(None).next_cursor).next_cursor)
+        self.assertFalse(last.has_next)
+        self.assertEqual(walk(self.fetch, last.previous_cursor, backwards=True), forward[-2::-1])
+        # Voltando até o começo a primeira página não tem anterior, como a que veio sem cursor
+        second = self.fetch(self.fetch(None).next_cursor)
+        first = self.fetch(second.previous_cursor)
+        self.assertEqual([comment.id for comment in first], forward[0])
+        self.assertFalse(first.has_previous)
+        self.assertTrue(first.has_next)
+
+
+class ArchivePaginationTests(TestCase):
+    databases = {'default', 'archive'}
+
+    def setUp(self):
+        self.user = User.objects.create_user('arquivo', password='arquivo')
+        self.profile = Profile.objects.create(user=self.user)
+        self.comments = make_comments(self.user, 6)
+        self.factory = RequestFactory()
+        # Os três mais velhos vão para o arquivo, como faria o archive_comments
+        old = self.comments[:3]
+        ArchivedComment.objects.bulk_create(
+            ArchivedComment(id=c.id, user_id=self.user.id, username=self.user.username, content=c.content, created_at=c.created_at)
+            for c in old
+        )
+        Comment.objects.filter(id__in=[c.id for c in old]).delete()
+        self.profile.archived_until = old[-1].created_at + timedelta(seconds=1)
+        self.profile.save()
+
+    def fetch(self, cursor):
+        params = {'size': 2, 'cursor': cursor} if cursor else {'size': 2}
+        return archive.paginate_comments(user_comments(self.user), self.profile, self.factory.get('/', params))
+
+    def test_pages_continue_into_archive(self):
+        ids = [comment.id for comment in reversed(self.comments)]
+        pages = walk(self.fetch)
+        self.assertEqual(pages, [ids[0:2], ids[2:4], ids[4:6]])
+        # A página da fronteira junta o último quente com o primeiro arquivado
+        boundary = self.fetch(self.fetch(None).next_cursor)
+        self.assertEqual([getattr(comment, 'archived', False) for comment in boundary], [False, True])
+
+    def test_previous_cursor_from_archive(self):
+        pages = walk(self.fetch)
+        last = self.fetch(self.fetch(self.fetch(None).next_cursor).next_cursor)
+        self.assertEqual(walk(self.fetch, last.previous_cursor, backwards=True), pages[-2::-1])
+
+    def test_comment_in_both_databases_shows_once(self):
+        # Lote interrompido entre a cópia e a remoção
+        hot = self.comments[3]
+        ArchivedComment.objects.create(
+            id=hot.id, user_id=self.user.id, username=self.user.username, content=hot.content, created_at=hot.created_at,
+        )
+        self.assertEqual(sum(walk(self.fetch), []), [comment.id for comment in reversed(self.comments)])
+
+
+class SlowQueryLogTests(TestCase):
+    def test_parameters_are_not_logged(self):
+        user = User.objects.create_user(uuid.uuid4().hex)
+        Profile.objects.create(user=user)
+        self.client.force_login(user)
+        with mock.patch.object(perf, 'SLOW_QUERY_MS', 0), self.assertLogs('core.perf', 'WARNING') as logs:
+            self.client.get(reverse('other_profile', args=[user.username]))
+        output = '\n'.join(logs.output)
+        self.assertIn('1 parâmetro(s)', output)
+        self.assertNotIn(user.username, output)
+
+
+class PerfDumpTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        patcher = mock.patch.object(perf, 'DIR', self.directory)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def files(self):
+        return sorted(os.listdir(self.directory))
+
+    def test_idle_process_writes_nothing(self):
+        perf.Registry().flush()
+        self.assertEqual(self.files(), [])
+
+    def test_stale_dumps_are_pruned(self):
+        stale = os.path.join(self.directory, 'perf-1.json')
+        with open(stale, 'w') as output:
+            output.write('{}')
+        old = time.time() - 3 * perf.WINDOW
+        os.utime(stale, (old, old))
+
+        registry = perf.Registry()
+        registry.record('index', 1000, perf.RequestStats(), 10)
+        registry.flush()
+        self.assertEqual(self.files(), [f'perf-{os.getpid()}.json'])
+        views, slow_queries, pids = perf.read_dumps(self.directory)
+        self.assertEqual((list(views), pids), (['index'], [os.getpid()]))
+
+
+class ArchiveBatchTests(TestCase):
+    databases = {'default', 'archive'}
+
+    def setUp(self):
+        self.user = User.objects.create_user('antigo', password='antigo')
+        self.profile = Profile.objects.create(user=self.user)
+        self.now = timezone.now()
+        self.old = make_comments(self.user, 3, start=self.now - timedelta(days=400))
+        self.recent = make_comments(self.user, 2, start=self.now - timedelta(days=1))
+        self.cutoff = self.now - timedelta(days=365)
+
+    def test_copies_then_deletes_old_comments(self):
+        self.assertEqual(archive.archive_batch(self.cutoff, batch_size=2), 2)
+        self.assertEqual(archive.archive_batch(self.cutoff, batch_size=2), 1)
+        self.assertEqual(archive.archive_batch(self.cutoff, batch_size=2), 0)
+
+        archived = ArchivedComment.objects.order_by('id')
+        self.assertEqual([comment.id for comment in archived], [comment.id for comment in self.old])
+        self.assertEqual({comment.username for comment in archived}, {'antigo'})
+        self.assertEqual(
+            set(Comment.objects.values_list('id', flat=True)), {comment.id for comment in self.recent},
+        )
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.archived_until, self.cutoff)
+
+    def test_interrupted_batch_is_redone(self):
+        # O processo caiu depois da cópia e antes da remoção: a cópia já existe no arquivo
+        first = self.old[0]
+        ArchivedComment.objects.create(
+            id=first.id, user_id=self.user.id, username=self.user.username, content=first.content, created_at=first.created_at,
+        )
+        self.assertEqual(archive.archive_batch(self.cutoff), 3)
+        self.assertEqual(ArchivedComment.objects.count(), 3)
+        self.assertFalse(Comment.objects.filter(id__in=[comment.id for comment in self.old]).exists())
+
+    def test_failed_delete_keeps_the_comment(self):
+        # Se a remoção falhar o comentário continua no banco principal, além da cópia no arquivo
+        with mock.patch.object(Profile.objects, 'filter', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                archive.archive_batch(self.cutoff)
+        self.assertEqual(ArchivedComment.objects.count(), 3)
+        self.assertEqual(Comment.objects.count(), 5)
+        self.profile.refresh_from_db()
+        self.assertIsNone(self.profile.archived_until)
+
+    def test_cutoff_never_moves_back(self):
+        archive.archive_batch(self.cutoff)
+        make_comments(self.user, 2, start=self.now - timedelta(days=500))
+        self.assertEqual(archive.archive_batch(self.cutoff - timedelta(days=30)), 2)
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.archived_until, self.cutoff)
+
+
+class ImportEdgesTests(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create_user(f'grafo{i}') for i in range(4)]
+        Follow.objects.create(follower=self.users[0], followed=self.users[1])
+
+    def test_job_gets_only_created_edges(self):
+        names = [user.username for user in self.users]
+        edges = [(names[0], names[1]), (names[0], names[2]), (names[0], names[2]), (names[3], names[0]), ('ninguem', names[0])]
+        stats = graph.import_edges(edges)
+        self.assertEqual(stats, {'created': 2, 'existing': 2, 'unknown': 1})
+        job = Job.objects.get(kind='follows_added')
+        created = [(self.users[0].id, self.users[2].id), (self.users[3].id, self.users[0].id)]
+        self.assertEqual(sorted(map(tuple, job.payload['edges'])), sorted(created))
+        self.assertEqual(Follow.objects.count(), 3)
+
+    def test_nothing_new_enqueues_nothing(self):
+        stats = graph.import_edges([(self.users[0].username, self.users[1].username)])
+        self.assertEqual((stats['created'], stats['existing']), (0, 1))
+        self.assertFalse(Job.objects.exists())
+
+
+class MediaServeTests(SimpleTestCase):
+    SHA256 = 'ab' * 32
+    CONTENT = bytes(range(100))
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        patcher = mock.patch.object(media, 'ROOT', root.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        path = media.blob_path(self.SHA256)
+        os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as blob:
+            blob.write(self.CONTENT)
+        self.media = Media(sha256=self.SHA256, content_type='image/png', size=100, width=1, height=1)
+        self.factory = RequestFactory()
+
+    def serve(self, thumbnail=False, **headers):
+        return media.serve(self.factory.get('/', headers=headers), self.media, thumbnail)
+
+    def test_byte_range(self):
+        cases = {
+            'bytes=0-9': (0, 9),
+            'bytes=90-': (90, 99),
+            'bytes=50-500': (50, 99),
+            'bytes=-10': (90, 99),
+            'bytes=-200': (0, 99),
+            'bytes=100-': False,
+            'bytes=20-10': False,
+            'bytes=0-1,5-6': None,
+            'items=0-9': None,
+            'bytes=-': None,
+        }
+        for header, expected in cases.items():
+            with self.subTest(header=header):
+                self.assertEqual(media._byte_range(header, 100), expected)
+
+    def test_range_is_partial_content(self):
+        response = self.serve(Range='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/100')
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(b''.join(response.streaming_content), self.CONTENT[10:20])
+
+    def test_unsatisfiable_range(self):
+        response = self.serve(Range='bytes=100-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */100')
+
+    def test_if_range(self):
+        etag = f'"{self.SHA256}"'
+        self.assertEqual(self.serve(Range='bytes=0-9', If_Range=etag).status_code, 206)
+        # Outra versão do arquivo: o intervalo é ignorado e vai o arquivo todo
+        response = self.serve(Range='bytes=0-9', If_Range='"outro"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.CONTENT)
+        response.close()
+
+    def test_cache_headers(self):
+        response = self.serve()
+        self.assertEqual(response['ETag'], f'"{self.SHA256}"')
+        self.assertIn('immutable', response['Cache-Control'])
+        response.close()
+        self.assertEqual(self.serve(If_None_Match=f'"{self.SHA256}"').status_code, 304)
+        # Sem miniatura a rota dela entrega o original, por pouco tempo
+        response = self.serve(thumbnail=True)
+        self.assertEqual(response['Cache-Control'], f'private, max-age={media.PENDING_MAX_AGE}')
+        response.close()
+
+
+class CommentImageTests(TestCase):
+    PNG = b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR' + struct.pack('>II', 2, 3) + bytes(40)
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        patcher = mock.patch.object(media, 'ROOT', root.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user('imagens')
+        Profile.objects.create(user=self.user)
+        self.client.force_login(self.user)
+
+    def post_image(self, url=None, png=PNG):
+        image = SimpleUploadedFile('foto.png', png, content_type='image/png')
+        return self.client.post(url or reverse('profile'), {'content': 'com imagem', 'image': image})
+
+    def test_thumbnail_is_requested_until_it_exists(self):
+        # A segunda vez é como uma nova tentativa da view: o Media já existe, mas ainda sem miniatura
+        for _ in range(2):
+            self.assertEqual(self.post_image().status_code, 302)
+        self.assertEqual(Job.objects.filter(kind='media_stored').count(), 2)
+        self.assertEqual(Media.objects.get().width, 2)
+
+        Media.objects.update(has_thumbnail=True)
+        self.post_image()
+        self.assertEqual(Job.objects.filter(kind='media_stored').count(), 2)
+        self.assertEqual(Comment.objects.filter(media__isnull=False).count(), 3)
+
+    def test_edit_keeps_or_replaces_the_image(self):
+        self.post_image()
+        comment = Comment.objects.get()
+        url = reverse('edit_comment', args=[comment.id])
+        self.assertContains(self.client.get(url), 'name="image"')
+
+        self.client.post(url, {'content': 'só o texto'})
+        comment.refresh_from_db()
+        self.assertEqual((comment.content, comment.media.width), ('só o texto', 2))
+
+        wider = self.PNG[:16] + struct.pack('>II', 5, 3) + self.PNG[24:]
+        self.assertEqual(self.post_image(url, wider).status_code, 302)
+        comment.refresh_from_db()
+        self.assertEqual(comment.media.width, 5)
+        self.assertEqual(Job.objects.filter(kind='media_stored').count(), 2)
+
+
+class TokenBucketTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = caches['default']
+        self.cache.clear()
+
+    def test_parse_rate(self):
+        self.assertEqual(ratelimit.parse_rate('10/m'), (10, 60))
+        self.assertEqual(ratelimit.parse_rate('100/5s'), (100, 5))
+        self.assertEqual(ratelimit.parse_rate('1/d'), (1, 86400))
+
+    def test_burst_then_wait(self):
+        # 3 fichas, uma a cada 2 segundos
+        for _ in range(3):
+            self.assertEqual(ratelimit.take(self.cache, 'balde', 3, 0.5, 1000.0), 0)
+        self.assertAlmostEqual(ratelimit.take(self.cache, 'balde', 3, 0.5, 1000.0), 2.0)
+        self.assertAlmostEqual(ratelimit.take(self.cache, 'balde', 3, 0.5, 1001.5), 0.5)
+        self.assertEqual(ratelimit.take(self.cache, 'balde', 3, 0.5, 1002.0), 0)
+        self.assertAlmostEqual(ratelimit.take(self.cache, 'balde', 3, 0.5, 1002.0), 2.0)
+
+    def test_refill_stops_at_capacity(self):
+        ratelimit.take(self.cache, 'balde', 3, 0.5, 1000.0)
+        for _ in range(3):
+            self.assertEqual(ratelimit.take(self.cache, 'balde', 3, 0.5, 5000.0), 0)
+        self.assertGreater(ratelimit.take(self.cache, 'balde', 3, 0.5, 5000.0), 0)
+
+
+@override_settings(RATELIMIT_ENABLED=True)
+class RateLimitMiddlewareTests(TestCase):
+    def setUp(self):
+        caches[ratelimit.CACHE_ALIAS].clear()
+        self.rules = {
+            'login': ratelimit.Rule('login', {'ip': '2/m', 'methods': ['POST']}),
+            'api_follows': ratelimit.Rule('api_follows', {'user': '1/h'}),
+        }
+        patcher = mock.patch.dict(ratelimit.RULES, self.rules)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_retry_after(self):
+        url = reverse('login')
+        for _ in range(2):
+            self.assertNotEqual(self.client.post(url, {'username': 'x', 'password': 'y'}).status_code, 429)
+        # GET não entra na regra
+        self.assertEqual(self.client.get(url).status_code, 200)
+        response = self.client.post(url, {'username': 'x', 'password': 'y'})
+        self.assertEqual(response.status_code, 429)
+        # Uma ficha a cada 30 s, menos o que já voltou a encher durante os logins
+        self.assertTrue(20 < int(response['Retry-After']) <= 30)
+        # Outro IP tem o próprio balde
+        self.assertNotEqual(self.client.post(url, {'username': 'x', 'password': 'y'}, REMOTE_ADDR='192.0.2.1').status_code, 429)
+
+    def test_api_gets_json(self):
+        user = User.objects.create_user('limitado')
+        self.client.force_login(user)
+        url = reverse('api_follows')
+        self.assertNotEqual(self.client.post(url, {}, content_type='application/json').status_code, 429)
+        response = self.client.post(url, {}, content_type='application/json')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '3600')
+        self.assertIn('detail', response.json())
+
+
+class UnreadCountTests(TestCase):
+    def test_count_ignores_replica(self):
+        user = User.objects.create_user('avisado')
+        actor = User.objects.create_user('autor')
+        Notification.objects.create(recipient=user, kind=Notification.COMMENT, group_key=str(actor.id), actor=actor)
+        cache.clear()
+        # O valor vai para o cache sem prazo, então nunca pode vir de uma réplica (aqui, uma inexistente)
+        with mock.patch.object(replicas, 'current', return_value='replica-inexistente'):
+            self.assertEqual(notifications.unread_count(user), 1)
+        self.assertEqual(cache.get(f'core:unread:{user.id}'), 1)
+
+
+class NotificationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.ana, self.bia, self.caio = [User.objects.create_user(name) for name in ('ana', 'bia', 'caio')]
+
+    def unread(self, user):
+        return list(Notification.objects.filter(recipient=user, read_at__isnull=True).values_list('actor', 'count'))
+
+    def test_follows_collapse_into_one_unread_notification(self):
+        notifications.notify_follows({self.bia.id: [self.ana.id]})
+        notifications.notify_follows({self.bia.id: [self.ana.id, self.caio.id], self.ana.id: [self.caio.id]})
+        # O último seguidor vira o autor; o total soma no banco (F()), não na memória
+        self.assertEqual(self.unread(self.bia), [(self.caio.id, 3)])
+        self.assertEqual(self.unread(self.ana), [(self.caio.id, 1)])
+
+    def test_comments_collapse_per_author(self):
+        Follow.objects.create(follower=self.bia, followed=self.ana)
+        Follow.objects.create(follower=self.bia, followed=self.caio)
+        notifications.notify_comments({self.ana.id: 2})
+        notifications.notify_comments({self.ana.id: 1, self.caio.id: 1})
+        self.assertEqual(sorted(self.unread(self.bia)), [(self.ana.id, 3), (self.caio.id, 1)])
+
+    def test_new_notification_after_mark_read(self):
+        notifications.notify_follows({self.bia.id: [self.ana.id]})
+        notifications.mark_read(self.bia)
+        notifications.notify_follows({self.bia.id: [self.caio.id]})
+        self.assertEqual(self.unread(self.bia), [(self.caio.id, 1)])
+        self.assertEqual(Notification.objects.filter(recipient=self.bia).count(), 2)
+
+    def test_badge_follows_writes_without_counting(self):
+        self.assertEqual(notifications.unread_count(self.bia), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            notifications.notify_follows({self.bia.id: [self.ana.id]})
+        with self.captureOnCommitCallbacks(execute=True):
+            notifications.notify_follows({self.bia.id: [self.caio.id]})
+            Follow.objects.create(follower=self.bia, followed=self.ana)
+            notifications.notify_comments({self.ana.id: 1})
+        with self.assertNumQueries(0):
+            self.assertEqual(notifications.unread_count(self.bia), 2)
+
+        comment = Notification.objects.get(recipient=self.bia, kind=Notification.COMMENT)
+        self.assertEqual(notifications.mark_read(self.bia, comment.id), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(notifications.unread_count(self.bia), 1)
+        notifications.mark_read(self.bia)
+        with self.assertNumQueries(0):
+            self.assertEqual(notifications.unread_count(self.bia), 0)
+
+    @mock.patch.object(notifications, 'UNREAD_TIMEOUT', 30)
+    def test_badge_expires(self):
+        self.assertEqual(notifications.unread_count(self.bia), 0)
+        # Escrita que este processo não vê, como as feitas pelo worker da fila
+        Notification.objects.create(recipient=self.bia, kind=Notification.FOLLOW, actor=self.ana)
+        self.assertEqual(notifications.unread_count(self.bia), 0)
+        with mock.patch('time.time', return_value=time.time() + 31):
+            self.assertEqual(notifications.unread_count(self.bia), 1)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('buscadora')
+        self.profile = Profile.objects.create(user=self.user, full_name='Ana Lima', bio='pintora de aquarelas')
+
+    def comment_ids(self, query):
+        return [result.id for result in search.search_comments(query)]
+
+    def usernames(self, query):
+        return [result.username for result in search.search_profiles(query)]
+
+    def test_comment_index_follows_writes(self):
+        comment = Comment.objects.create(user=self.user, content='um gato preto')
+        bulk, = Comment.objects.bulk_create([Comment(user=self.user, content='outro gato')])
+        self.assertEqual(sorted(self.comment_ids('gato')), sorted([comment.id, bulk.id]))
+
+        comment.content = 'um cachorro'
+        comment.save()
+        self.assertEqual(self.comment_ids('gato'), [bulk.id])
+        self.assertEqual(self.comment_ids('cachorro'), [comment.id])
+
+        comment.delete()
+        self.assertEqual(self.comment_ids('cachorro'), [])
+
+    def test_profile_index_follows_writes(self):
+        self.assertEqual(self.usernames('aquarela'), ['buscadora'])
+        self.profile.bio = 'escultora'
+        self.profile.save()
+        self.assertEqual(self.usernames('aquarelas'), [])
+        self.assertEqual(self.usernames('escultora'), ['buscadora'])
+
+        self.user.username = 'renomeada'
+        self.user.save()
+        self.assertEqual(self.usernames('buscadora'), [])
+        self.assertEqual(self.usernames('renomeada'), ['renomeada'])
+
+        self.profile.delete()
+        self.assertEqual(self.usernames('renomeada'), [])
+
+    def test_match_expression_neutralises_fts_syntax(self):
+        cases = {
+            'gato': '"gato"*',
+            '"gato': '"gato"*',
+            'ga*to': '"ga" "to"*',
+            'NEAR(gato preto)': '"NEAR" "gato" "preto"*',
+            'gato OR preto': '"gato" "OR" "preto"*',
+            'gato -preto': '"gato" "preto"*',
+            '"*" ()': None,
+        }
+        for query, expected in cases.items():
+            with self.subTest(query=query):
+                self.assertEqual(search.match_expression(query), expected)
+                # Nada disso pode virar erro de sintaxe do FTS5
+                search.search_comments(query)
+                search.search_profiles(query)
+
+    def test_operators_are_plain_words(self):
+        both = Comment.objects.create(user=self.user, content='gato e preto')
+        Comment.objects.create(user=self.user, content='só gato')
+        # Com OR como operador os dois casariam; como palavra, nenhum tem "or"
+        self.assertEqual(self.comment_ids('gato OR preto'), [])
+        self.assertEqual(self.comment_ids('gato preto'), [both.id])
+
+    def test_snippet_is_escaped(self):
+        Comment.objects.create(user=self.user, content='<script>alert(1)</script> gato & <b>rato</b>')
+        snippet, = [result.snippet for result in search.search_comments('gato')]
+        self.assertIn('<mark>gato</mark>', snippet)
+        self.assertIn('&lt;script&gt;', snippet)
+        self.assertIn('&amp;', snippet)
+        self.assertNotIn('<script', snippet)
+        self.assertNotIn('<b>', snippet)
+
+
+class ApiETagTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('leitora')
+        self.other = User.objects.create_user('escritora')
+        Profile.objects.create(user=self.user)
+        Profile.objects.create(user=self.other)
+        self.client.force_login(self.user)
+
+    def fetch(self, name, username=None):
+        """Baixa a rota e confere que o corpo em fluxo é JSON válido; devolve o ETag."""
+        url = reverse(name, args=[username] if username else [])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        body = json.loads(b''.join(response.streaming_content))
+        self.assertIn('user', body)
+        etag = response['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        return etag
+
+    @contextlib.contextmanager
+    def changes(self, name, username=None):
+        """Exige um ETag diferente depois do bloco (e da fila de tarefas)."""
+        before = self.fetch(name, username)
+        yield
+        jobs.drain()
+        self.assertNotEqual(self.fetch(name, username), before)
+
+    def test_comments_etag(self):
+        with self.changes('api_comments', 'leitora'):
+            self.client.post(reverse('profile'), {'content': 'primeiro "comentário" com aspas & <tags>'})
+        comment = Comment.objects.get(user=self.user)
+        with self.changes('api_comments', 'leitora'):
+            self.client.post(reverse('edit_comment', args=[comment.id]), {'content': 'editado'})
+        with self.changes('api_comments', 'leitora'):
+            self.client.post(reverse('delete_comment', args=[comment.id]))
+
+    def test_follows_etags(self):
+        with self.changes('api_following', 'leitora'), self.changes('api_followers', 'escritora'):
+            self.client.post(reverse('follow_user', args=['escritora']))
+        with self.changes('api_following', 'leitora'), self.changes('api_followers', 'escritora'):
+            self.client.post(reverse('unfollow_user', args=['escritora']))
+
+    def test_feed_etag(self):
+        self.client.post(reverse('follow_user', args=['escritora']))
+        jobs.drain()
+        with self.changes('api_feed'):
+            Comment.objects.create(user=self.other, content='para o feed')
+            jobs.enqueue('comment_created', comment_id=Comment.objects.get(user=self.other).id, author_id=self.other.id)
+        self.assertEqual(TimelineEntry.objects.filter(owner=self.user).count(), 1)
+        with self.changes('api_feed'):
+            self.client.post(reverse('unfollow_user', args=['escritora']))
+        self.assertFalse(TimelineEntry.objects.filter(owner=self.user).exists())
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create_user(name) for name in ('ana', 'bia', 'caio')]
+        for user in self.users:
+            Profile.objects.create(user=user)
+
+    def counts(self, field):
+        return [Profile.objects.values_list(field, flat=True).get(user=user) for user in self.users]
+
+    def test_claim_never_hands_a_job_twice(self):
+        for _ in range(3):
+            jobs.enqueue('comment_edited', author_id=self.users[0].id)
+        first = jobs.claim(2, 'a')
+        second = jobs.claim(2, 'b')
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 1)
+        self.assertFalse({job.id for job in first} & {job.id for job in second})
+        self.assertEqual(jobs.claim(2, 'c'), [])
+
+    def test_claim_skips_waiting_and_exhausted_jobs(self):
+        now = timezone.now()
+        Job.objects.create(kind='comment_edited', payload={'author_id': 1}, run_after=now + timedelta(minutes=1))
+        Job.objects.create(kind='comment_edited', payload={'author_id': 1}, attempts=jobs.MAX_ATTEMPTS)
+        self.assertEqual(jobs.claim(), [])
+
+    def test_stale_locks_are_reclaimed(self):
+        now = timezone.now()
+        stale = Job.objects.create(
+            kind='comment_edited', payload={'author_id': 1},
+            locked_by='morto', locked_at=now - timedelta(seconds=jobs.LOCK_TIMEOUT + 1),
+        )
+        Job.objects.create(kind='comment_edited', payload={'author_id': 1}, locked_by='vivo', locked_at=now)
+        claimed, = jobs.claim(worker='novo')
+        self.assertEqual(claimed.id, stale.id)
+        self.assertTrue(claimed.locked_by.startswith('novo:'))
+
+    def test_batch_sums_effects(self):
+        ana, bia, caio = self.users
+        Follow.objects.create(follower=ana, followed=bia)
+        Follow.objects.create(follower=caio, followed=bia)
+        old = Comment.objects.create(user=bia, content='antigo')
+        TimelineEntry.objects.create(owner=ana, comment=old, author=bia, created_at=old.created_at)
+        kept = Comment.objects.create(user=bia, content='fica')
+        gone = Comment.objects.create(user=bia, content='some')
+        gone_id = gone.id
+        gone.delete()
+
+        jobs.enqueue('follow_added', follower_id=ana.id, followed_id=bia.id)
+        jobs.enqueue('follow_added', follower_id=caio.id, followed_id=bia.id)
+        jobs.enqueue('follow_removed', follower_id=ana.id, followed_id=bia.id)
+        Follow.objects.filter(follower=ana).delete()
+        jobs.enqueue('comment_created', comment_id=kept.id, author_id=bia.id)
+        jobs.enqueue('comment_created', comment_id=gone_id, author_id=bia.id)
+        jobs.enqueue('comment_deleted', author_id=bia.id)
+        self.assertEqual(jobs.run(jobs.claim()), 6)
+
+        self.assertEqual(self.counts('followers_count'), [0, 1, 0])
+        self.assertEqual(self.counts('following_count'), [0, 0, 1])
+        self.assertEqual(self.counts('comments_count'), [0, 1, 0])
+        # remove_authors tirou o comentário antigo de ana; o apagado não chegou a ninguém
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list('owner__username', 'comment_id')), [('caio', kept.id)],
+        )
+        notification = Notification.objects.get(recipient=bia, kind=Notification.FOLLOW)
+        self.assertEqual((notification.count, notification.actor), (2, caio))
+        self.assertFalse(Job.objects.exists())
+
+    def test_failures_back_off_until_max_attempts(self):
+        jobs.enqueue('tarefa_inexistente')
+        job = Job.objects.get()
+        start = timezone.now()
+        for attempt in range(1, jobs.MAX_ATTEMPTS + 1):
+            with self.assertLogs('core.jobs', 'ERROR'):
+                self.assertEqual(jobs.run([job]), 0)
+            job.refresh_from_db()
+            self.assertEqual((job.attempts, job.locked_by), (attempt, ''))
+            self.assertIn('AttributeError', job.last_error)
+            delay = (job.run_after - start).total_seconds()
+            self.assertGreaterEqual(delay, jobs.RETRY_DELAY * 2 ** (attempt - 1))
+            Job.objects.filter(id=job.id).update(run_after=start)
+        self.assertEqual(jobs.claim(), [])
+
+    def test_locked_database_is_not_an_attempt(self):
+        jobs.enqueue('comment_edited', author_id=self.users[0].id)
+        job, = jobs.claim()
+        jobs._fail(job, OperationalError('database is locked'))
+        job.refresh_from_db()
+        self.assertEqual((job.attempts, job.locked_by), (0, ''))
+        self.assertEqual(jobs.claim()[0].id, job.id)
+
+    def test_bad_job_does_not_sink_the_batch(self):
+        ana, bia, _ = self.users
+        jobs.enqueue('follow_added', follower_id=ana.id, followed_id=bia.id)
+        jobs.enqueue('tarefa_inexistente')
+        with self.assertLogs('core.jobs', 'ERROR'):
+            self.assertEqual(jobs.run(jobs.claim()), 1)
+        self.assertEqual(self.counts('followers_count'), [0, 1, 0])
+        self.assertEqual(list(Job.objects.values_list('kind', 'attempts')), [('tarefa_inexistente', 1)])
+
+
+class JobPostCommitTests(TransactionTestCase):
+    # Commits de verdade: é depois deles que os carimbos e as miniaturas rodam
+
+    @mock.patch.object(jobs, 'MODE', 'worker')
+    def test_post_commit_failure_does_not_replay_the_batch(self):
+        ana, bia, caio = [User.objects.create_user(name) for name in ('ana', 'bia', 'caio')]
+        Profile.objects.bulk_create([Profile(user=user) for user in (ana, bia, caio)])
+        jobs.enqueue('follow_added', follower_id=ana.id, followed_id=bia.id)
+        jobs.enqueue('follow_added', follower_id=caio.id, followed_id=bia.id)
+        with mock.patch.object(caching, 'follows_changed', side_effect=OperationalError('database is locked')), \
+                self.assertLogs('core.jobs', 'ERROR'):
+            self.assertEqual(jobs.run(jobs.claim()), 2)
+        self.assertEqual(Profile.objects.get(user=bia).followers_count, 2)
+        self.assertEqual(Notification.objects.get(recipient=bia).count, 2)
+        self.assertFalse(Job.objects.exists())
@@ -0,0 +1,28 @@
+# thumbnails.py
+"""Geração de miniaturas, executada nos processos do pool de ``core/media.py``.
+
+Fica num módulo à parte, sem Django, porque os processos do pool são
+iniciados com ``spawn`` e só importam o que a função precisa. O Pillow é
+opcional: sem ele ``Image`` é ``None`` e as miniaturas não são geradas (a
+rota da miniatura serve o original).
+"""
+import os
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+def make_thumbnail(source, dest, size):
+    """Grava em ``dest`` um JPEG de no máximo ``size`` pixels de lado. Retorna ``dest``."""
+    with Image.open(source) as image:
+        image.thumbnail((size, size))
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        # Grava ao lado e renomeia: quem estiver lendo nunca vê o arquivo pela metade
+        partial = f'{dest}.{os.getpid()}.tmp'
+        image.save(partial, 'JPEG', quality=80, optimize=True)
+        os.replace(partial, dest)
+    return dest
@@ -0,0 +1,158 @@
+# timeline.py
+"""Linha do tempo da página inicial.
+
+Cada comentário novo é copiado (fan-out na escrita, feito pela fila de
+``core/jobs.py``) para a linha do tempo de quem segue o autor, de modo que
+ler o feed seja uma única varredura pelo índice ``(owner, created_at)``.
+Autores com muitos seguidores ficam de fora do fan-out e seus comentários
+são buscados na leitura (fan-out na leitura).
+
+Seguir alguém não exige preencher a linha do tempo: o feed só mostra
+comentários feitos depois do início do acompanhamento. Edições aparecem
+automaticamente porque a entrada aponta para o comentário, e apagar um
+comentário apaga suas entradas em cascata.
+"""
+import heapq
+
+from django.conf import settings
+from django.db.models import Count, Max, OuterRef, Q, Subquery
+
+from . import pagination
+from .models import Comment, Follow, Profile, TimelineEntry
+
+FANOUT_LIMIT = getattr(settings, 'TIMELINE_FANOUT_LIMIT', 1000)
+BATCH_SIZE = getattr(settings, 'TIMELINE_BATCH_SIZE', 500)
+
+# Chave da paginação: comment_id acompanha o id do comentário copiado
+ENTRY_KEY = ('created_at', 'comment_id')
+
+
+def _celebrity_follows(user):
+    # Seguidos com mais de FANOUT_LIMIT seguidores, lidos no momento da leitura
+    return Follow.objects.filter(follower=user, followed__profile__followers_count__gt=FANOUT_LIMIT)
+
+
+def celebrity_ids(user):
+    """Ids dos seguidos de ``user`` cujos comentários são buscados na leitura."""
+    return list(_celebrity_follows(user).values_list('followed_id', flat=True))
+
+
+async def acelebrity_ids(user):
+    return await pagination.alist(_celebrity_follows(user).values_list('followed_id', flat=True))
+
+
+def fan_out_comments(comments):
+    """Copia os comentários para a linha do tempo dos seguidores de cada autor, num único ``bulk_create``."""
+    author_ids = {comment.user_id for comment in comments}
+    celebrities = set(
+        Profile.objects.filter(user_id__in=author_ids, followers_count__gt=FANOUT_LIMIT).values_list('user_id', flat=True)
+    )
+    author_ids -= celebrities
+    if not author_ids:
+        return
+    followers = {}
+    for followed_id, follower_id, followed_at in Follow.objects.filter(followed_id__in=author_ids).values_list(
+        'followed_id', 'follower_id', 'created_at'
+    ).iterator(chunk_size=BATCH_SIZE):
+        followers.setdefault(followed_id, []).append((follower_id, followed_at))
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(owner_id=follower_id, comment=comment, author_id=comment.user_id,
+                       created_at=comment.created_at)
+         for comment in comments
+         for follower_id, followed_at in followers.get(comment.user_id, ())
+         if followed_at <= comment.created_at),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def remove_authors(pairs):
+    """Retira da linha do tempo de cada ``owner_id`` os comentários de ``author_id``."""
+    pairs = list(pairs)
+    # Em blocos, para não passar do limite de profundidade de expressões do SQLite
+    for start in range(0, len(pairs), 100):
+        condition = Q()
+        for owner_id, author_id in pairs[start:start + 100]:
+            condition |= Q(owner_id=owner_id, author_id=author_id)
+        TimelineEntry.objects.filter(condition).delete()
+
+
+def _pulled_comments(user, celebrities=None):
+    # Comentários das "celebridades" feitos depois de o usuário começar a segui-las
+    if celebrities is None:
+        celebrities = _celebrity_follows(user).values('followed')
+    return Comment.objects.filter(
+        user__in=celebrities,
+        created_at__gte=Subquery(
+            Follow.objects.filter(follower=user, followed=OuterRef('user')).values('created_at')[:1]
+        ),
+    )
+
+
+def _timeline_querysets(user, cursor, size, celebrities):
+    entries = TimelineEntry.objects.filter(owner=user).select_related('comment__user').only(
+        'created_at', 'comment__content', 'comment__created_at', 'comment__media', 'comment__user__username'
+    )
+    pulled = _pulled_comments(user, celebrities).select_related('user').only('content', 'created_at', 'media', 'user__username')
+    return (
+        pagination.page_queryset(entries, cursor, size, ENTRY_KEY),
+        pagination.page_queryset(pulled, cursor, size),
+    )
+
+
+def _merge(pushed, pulled, cursor, size):
+    # Um autor pode ter entradas antigas de quando ainda não era "celebridade"
+    seen = set()
+    rows = []
+    descending = cursor is None or not cursor.is_previous
+    for comment in heapq.merge(pushed, pulled, key=lambda c: (c.created_at, c.id), reverse=descending):
+        if comment.id not in seen:
+            seen.add(comment.id)
+            rows.append(comment)
+    return pagination.build_page(rows, cursor, size)
+
+
+def get_timeline(user, cursor=None, size=pagination.PAGE_SIZE, celebrities=None):
+    """Página do feed de ``user``, do comentário mais novo para o mais antigo.
+
+    ``celebrities`` permite reaproveitar o resultado de ``celebrity_ids``.
+    """
+    entries, pulled = _timeline_querysets(user, cursor, size, celebrities)
+    return _merge([entry.comment for entry in entries], list(pulled), cursor, size)
+
+
+async def aget_timeline(user, cursor=None, size=pagination.PAGE_SIZE, celebrities=None):
+    """Versão assíncrona de ``get_timeline``."""
+    entries, pulled = _timeline_querysets(user, cursor, size, celebrities)
+    # Em sequência: a ORM assíncrona roda todas as consultas na mesma thread
+    pushed = await pagination.alist(entry.comment async for entry in entries)
+    pulled = await pagination.alist(pulled)
+    return _merge(pushed, pulled, cursor, size)
+
+
+def timeline_state(user):
+    """Resumo que muda sempre que o feed muda: entradas e comentários puxados (mais recente, edição, total)."""
+    pushed = TimelineEntry.objects.filter(owner=user).aggregate(
+        latest=Max('created_at'), edited=Max('comment__edited_at'), total=Count('pk'),
+    )
+    pulled = _pulled_comments(user).aggregate(latest=Max('created_at'), edited=Max('edited_at'), total=Count('pk'))
+    return pushed, pulled
+
+
+def iter_timeline(user, chunk_size=BATCH_SIZE):
+    """O feed inteiro de ``user`` como dicionários, do mais novo para o mais antigo, lido em lotes."""
+    pushed = TimelineEntry.objects.filter(owner=user).order_by('-created_at', '-comment_id').values_list(
+        'comment_id', 'comment__user__username', 'comment__content', 'created_at', 'comment__edited_at'
+    )
+    pulled = _pulled_comments(user).order_by('-created_at', '-id').values_list(
+        'id', 'user__username', 'content', 'created_at', 'edited_at'
+    )
+    # As duas sequências vêm na mesma ordem, então repetições (ver _merge) ficam lado a lado
+    last_id = None
+    for comment_id, username, content, created_at, edited_at in heapq.merge(
+        pushed.iterator(chunk_size=chunk_size), pulled.iterator(chunk_size=chunk_size),
+        key=lambda row: (row[3], row[0]), reverse=True,
+    ):
+        if comment_id != last_id:
+            last_id = comment_id
+            yield {'id': comment_id, 'user': username, 'content': content, 'created_at': created_at, 'edited_at': edited_at}
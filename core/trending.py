@@ -0,0 +1,121 @@
+# trending.py
+"""Hashtags em alta, com contadores que decaem com o tempo.
+
+Cada hashtag tem um ``TagTrend`` por janela de ``TRENDING_WINDOWS`` (nome ->
+meia-vida em segundos). Um uso novo soma 1 ao contador, e o contador cai
+pela metade a cada meia-vida: é uma janela deslizante sem guardar os
+eventos. O decaimento é aplicado só quando a linha é tocada, e o valor
+atual é ``score * 0.5 ** (tempo desde updated_at / meia-vida)``.
+
+* ``record`` roda na fila de tarefas (``core/jobs.py``), uma vez por lote.
+* ``top`` lê a lista pronta do cache. Quando a lista expira, ela é
+  recalculada a partir dos ``CANDIDATES`` maiores contadores, e não
+  contando ``CommentTag`` a cada requisição.
+* ``refresh`` (comando ``refresh_trending``) decai todas as linhas até
+  agora, apaga as que ficaram irrelevantes e regrava as listas.
+
+Rode periodicamente::
+
+    python manage.py refresh_trending
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import TagTrend
+
+WINDOWS = getattr(settings, 'TRENDING_WINDOWS', {'hora': 60 * 60, 'dia': 24 * 60 * 60})
+TOP_K = getattr(settings, 'TRENDING_TOP_K', 10)
+REFRESH_INTERVAL = getattr(settings, 'TRENDING_REFRESH_INTERVAL', 60)
+# Contadores abaixo disso somem no refresh
+MIN_SCORE = 0.05
+# Linhas não decaídas podem estar infladas; lendo mais que TOP_K a lista sai certa entre um refresh e outro
+CANDIDATES = TOP_K * 20
+BATCH_SIZE = 1000
+
+
+def _key(window):
+    return f'core:trending:{window}'
+
+
+def decayed(score, since, now, half_life):
+    return score * 0.5 ** ((now - since).total_seconds() / half_life)
+
+
+def record(counts, now=None):
+    """Soma ``{hashtag_id: usos}`` aos contadores de todas as janelas."""
+    if not counts:
+        return
+    now = now or timezone.now()
+    trends = {(trend.window, trend.hashtag_id): trend for trend in TagTrend.objects.filter(hashtag_id__in=list(counts))}
+    new, changed = [], []
+    for window, half_life in WINDOWS.items():
+        for hashtag_id, uses in counts.items():
+            trend = trends.get((window, hashtag_id))
+            if trend is None:
+                new.append(TagTrend(hashtag_id=hashtag_id, window=window, score=uses, updated_at=now))
+            else:
+                trend.score = decayed(trend.score, trend.updated_at, now, half_life) + uses
+                trend.updated_at = now
+                changed.append(trend)
+    TagTrend.objects.bulk_update(changed, ['score', 'updated_at'], batch_size=BATCH_SIZE)
+    # Outro worker pode ter criado a linha ao mesmo tempo; perder esse uso não muda o ranking
+    TagTrend.objects.bulk_create(new, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+def compute(window, now=None):
+    """``[(hashtag, contador atual), ...]`` em ordem decrescente, até ``TOP_K``."""
+    now = now or timezone.now()
+    half_life = WINDOWS[window]
+    candidates = TagTrend.objects.filter(window=window).select_related('hashtag').order_by('-score')[:CANDIDATES]
+    scored = sorted(
+        ((decayed(trend.score, trend.updated_at, now, half_life), trend.hashtag.name) for trend in candidates),
+        reverse=True,
+    )
+    return [(name, round(score, 2)) for score, name in scored[:TOP_K] if score >= MIN_SCORE]
+
+
+def top(window):
+    items = cache.get(_key(window))
+    if items is None:
+        items = compute(window)
+        cache.set(_key(window), items, REFRESH_INTERVAL)
+    return items
+
+
+def refresh(now=None):
+    """Decai todos os contadores até ``now``, apaga os irrelevantes e regrava as listas no cache.
+
+    Retorna ``(linhas atualizadas, linhas apagadas)``.
+    """
+    now = now or timezone.now()
+    updated = deleted = 0
+    for window, half_life in WINDOWS.items():
+        with transaction.atomic():
+            changed, removed = _refresh_window(window, half_life, now)
+        updated += changed
+        deleted += removed
+        cache.set(_key(window), compute(window, now), REFRESH_INTERVAL)
+    return updated, deleted
+
+
+def _refresh_window(window, half_life, now):
+    updated = deleted = 0
+    batch, dead = [], []
+    for trend in TagTrend.objects.filter(window=window).only('id', 'score', 'updated_at').iterator(chunk_size=BATCH_SIZE):
+        trend.score = decayed(trend.score, trend.updated_at, now, half_life)
+        trend.updated_at = now
+        if trend.score < MIN_SCORE:
+            dead.append(trend.id)
+        else:
+            batch.append(trend)
+        if len(batch) == BATCH_SIZE:
+            TagTrend.objects.bulk_update(batch, ['score', 'updated_at'])
+            updated += len(batch)
+            batch = []
+    TagTrend.objects.bulk_update(batch, ['score', 'updated_at'])
+    updated += len(batch)
+    for offset in range(0, len(dead), BATCH_SIZE):
+        deleted += TagTrend.objects.filter(id__in=dead[offset:offset + BATCH_SIZE]).delete()[0]
+    return updated, deleted
@@ -1,20 +1,45 @@
 # urls.py
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, views
 from django.contrib.auth import views as auth_views
 
+# Sob ASGI as views de leitura usam as versões assíncronas (ver django_projeto/asgi.py)
+if settings.ASYNC_VIEWS:
+    from . import async_views as read_views
+else:
+    read_views = views
+
 urlpatterns = [
-    path('', views.index, name='index'),
+    path('', read_views.index, name='index'),
     path('register/', views.register_view, name='register'),
     path('login/', views.login_view, name='login'),
     path('logout/', auth_views.LogoutView.as_view(next_page='index'), name='logout'),
     path('profile/', views.profile_view, name='profile'),
     path('profile/edit/', views.profile_edit_view, name='profile_edit'),
-    path('profile/<str:username>/', views.other_profile_view, name='other_profile'),
+    path('profile/<str:username>/', read_views.other_profile_view, name='other_profile'),
     path('profile/<str:username>/follow/', views.follow_user, name='follow_user'),
     path('profile/<str:username>/unfollow/', views.unfollow_user, name='unfollow_user'),
     path('delete_comment/<int:comment_id>/', views.delete_comment, name='delete_comment'),
     path('edit_comment/<int:comment_id>/', views.edit_comment, name='edit_comment'),
-    path('following/', views.following_list_view, name='following_list'),
-    path('followers/', views.followed_list_view, name='followed_list'),
+    path('following/', read_views.following_list_view, name='following_list'),
+    path('followers/', read_views.followed_list_view, name='followed_list'),
+    path('notifications/', views.notifications_view, name='notifications'),
+    path('notifications/read/', views.mark_notifications_read, name='mark_notifications_read'),
+    path('notifications/<int:notification_id>/read/', views.mark_notifications_read, name='mark_notification_read'),
+    path('search/', views.search_view, name='search'),
+    path('tags/<str:name>/', views.tag_view, name='tag'),
+    path('mentions/', views.mentions_view, name='mentions'),
+    path('trending/', views.trending_view, name='trending'),
+    path('media/<str:sha256>/', views.media_view, name='media'),
+    path('media/<str:sha256>/thumb/', views.media_view, {'thumbnail': True}, name='media_thumbnail'),
+    path('cache/stats/', views.cache_stats_view, name='cache_stats'),
+    path('perf/stats/', views.perf_stats_view, name='perf_stats'),
+    path('api/feed/', api.feed_api, name='api_feed'),
+    path('api/users/<str:username>/comments/', api.comments_api, name='api_comments'),
+    path('api/users/<str:username>/following/', api.following_api, name='api_following'),
+    path('api/users/<str:username>/followers/', api.followers_api, name='api_followers'),
+    path('api/users/<str:username>/graph/', api.graph_api, name='api_graph'),
+    path('api/follows/', api.follows_api, name='api_follows'),
+    path('api/follows/import/', api.import_follows_api, name='api_import_follows'),
 ]
@@ -1,42 +1,69 @@
 # views.py
 from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth import login, authenticate
+from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.models import User
 from .forms import CustomUserCreationForm, CustomAuthenticationForm, ProfileForm, CommentForm
-from .models import Profile, Comment, Follow
+from .models import Profile, Comment, CommentTag, Follow, Hashtag, Media, Mention, Notification
+from . import archive, caching, jobs, media, notifications, perf, search, suggestions, tags, timeline, trending
+from .pagination import paginate, get_cursor, get_page_size
+from .db import retry_if_locked
+from .replicas import read_from_replica
+from django.db import IntegrityError, transaction
+from django.http import JsonResponse
+from django.template.loader import render_to_string
 from django.utils import timezone
-from django.db.models import OuterRef, Subquery
+
+# Comentários de um usuário com apenas os campos usados nos templates
+def user_comments(user):
+    return Comment.objects.filter(user=user).select_related('user').only(
+        'content', 'created_at', 'edited_at', 'media', 'user__username'
+    )
+
+# Lista de comentários de um perfil, renderizada e guardada em cache (os antigos vêm do arquivo)
+def comments_fragment(request, name, profile, *extra):
+    user = profile.user
+    stamp, = caching.versions(('comments', user.id))
+    key = caching.fragment_key(name, user.id, stamp, request.GET.get('cursor', ''), get_page_size(request), *extra)
+
+    def render_comments():
+        page = archive.paginate_comments(user_comments(user), profile, request)
+        return render_to_string(f'{name}_comments.html', {'comments': page, 'page': page}, request)
+
+    return caching.get_or_render(name, key, render_comments)
 
 # Página principal
+@read_from_replica
 def index(request):
+    comments_html = ''
+    people = []
     if request.user.is_authenticated:
-        # Obter os seguidos e a data em que começaram a ser seguidos
-        following = Follow.objects.filter(follower=request.user)
-        
-        # Obter os comentários dos seguidos, mas apenas aqueles feitos depois de começarem a ser seguidos
-        comments = Comment.objects.filter(
-            user__in=[follow.followed for follow in following],
-            created_at__gte=Subquery(
-                Follow.objects.filter(
-                    follower=request.user,
-                    followed=OuterRef('user')
-                ).values('created_at')[:1]
-            )
-        ).order_by('-created_at')
-    else:
-        comments = Comment.objects.none()
+        cursor, size = get_cursor(request), get_page_size(request)
+        celebrity_ids = timeline.celebrity_ids(request.user)
+        stamps = caching.versions(('feed', request.user.id), *(('comments', user_id) for user_id in celebrity_ids))
+        key = caching.fragment_key('index', request.user.id, request.GET.get('cursor', ''), size, *stamps)
+
+        def render_comments():
+            # Linha do tempo pré-calculada, mais os autores com muitos seguidores (fan-out na leitura)
+            page = timeline.get_timeline(request.user, cursor, size, celebrity_ids)
+            return render_to_string('index_comments.html', {'comments': page, 'page': page}, request)
+
+        comments_html = caching.get_or_render('index', key, render_comments)
+        people = suggestions.get_suggestions(request.user)
     
-    return render(request, 'index.html', {'comments': comments})
+    return render(request, 'index.html', {'comments_html': comments_html, 'suggestions': people})
 
 # Página de registro
+@retry_if_locked
 def register_view(request):
     if request.method == 'POST':
         form = CustomUserCreationForm(request.POST)
         if form.is_valid():
-            user = form.save()
-            login(request, user)
-            Profile.objects.create(user=user)
+            with transaction.atomic():
+                user = form.save()
+                login(request, user)
+                Profile.objects.create(user=user)
             return redirect('index')
     else:
         form = CustomUserCreationForm()
@@ -47,37 +74,50 @@ def login_view(request):
     if request.method == 'POST':
         form = CustomAuthenticationForm(request, data=request.POST)
         if form.is_valid():
-            username = form.cleaned_data.get('username')
-            password = form.cleaned_data.get('password')
-            user = authenticate(request, username=username, password=password)
-            if user is not None:
-                login(request, user)
-                return redirect('index')
+            # O form já autenticou (um hash da senha); autenticar de novo calcularia outro
+            login(request, form.get_user())
+            return redirect('index')
     else:
         form = CustomAuthenticationForm()
     return render(request, 'login.html', {'form': form})
 
 # Página do perfil pessoal
 @login_required
+@retry_if_locked
+@read_from_replica
 def profile_view(request):
     profile = Profile.objects.get(user=request.user)
+    profile.user = request.user
     
     if request.method == 'POST':
-        form = CommentForm(request.POST)
+        form = CommentForm(request.POST, request.FILES)
         if form.is_valid():
             comment = form.save(commit=False)
             comment.user = request.user
-            comment.save()
+            image = form.cleaned_data['image']
+            if image:
+                # O arquivo vai para o disco antes da transação, que fica só com as escritas no banco
+                comment.media, _ = media.store(image, image.info)
+            with transaction.atomic():
+                comment.save()
+                tags.index_comment(comment)
+                jobs.enqueue('comment_created', comment_id=comment.id, author_id=request.user.id)
+                # Pela miniatura e não por "criado": numa nova tentativa da view o Media já existe
+                if comment.media is not None and not comment.media.has_thumbnail:
+                    jobs.enqueue('media_stored', sha256=comment.media_id)
+                # A lista do próprio autor muda já; contadores e feeds ficam com a fila (core/jobs.py)
+                transaction.on_commit(lambda: caching.bump('comments', [request.user.id]))
             return redirect('profile')
     else:
         form = CommentForm()
     
-    comments = Comment.objects.filter(user=request.user).order_by('-created_at')
+    comments_html = comments_fragment(request, 'profile', profile, caching.csrf_part(request))
     
-    return render(request, 'profile.html', {'profile': profile, 'form': form, 'comments': comments})
+    return render(request, 'profile.html', {'profile': profile, 'form': form, 'comments_html': comments_html})
 
 # Página de edição do perfil
 @login_required
+@retry_if_locked
 def profile_edit_view(request):
     profile = Profile.objects.get(user=request.user)
     if request.method == 'POST':
@@ -91,68 +131,181 @@ def profile_edit_view(request):
 
 # Página para o perfil dos outros usuários
 @login_required
+@read_from_replica
 def other_profile_view(request, username):
-    user = get_object_or_404(User, username=username)
-    profile = get_object_or_404(Profile, user=user)
-    comments = Comment.objects.filter(user=user).order_by('-created_at')
+    profile = get_object_or_404(Profile.objects.select_related('user'), user__username=username)
+    user = profile.user
+    comments_html = comments_fragment(request, 'other_profile', profile)
     
     is_following = Follow.objects.filter(follower=request.user, followed=user).exists()
     
-    return render(request, 'other_profile.html', {'profile': profile, 'comments': comments, 'is_following': is_following})
+    return render(request, 'other_profile.html', {'profile': profile, 'comments_html': comments_html, 'is_following': is_following})
 
 # Função para seguir um usuário
 @login_required
+@retry_if_locked
 def follow_user(request, username):
     user_to_follow = get_object_or_404(User, username=username)
     if user_to_follow != request.user:
-        Follow.objects.get_or_create(follower=request.user, followed=user_to_follow)
+        try:
+            with transaction.atomic():
+                Follow.objects.create(follower=request.user, followed=user_to_follow)
+                jobs.enqueue('follow_added', follower_id=request.user.id, followed_id=user_to_follow.id)
+                transaction.on_commit(lambda: caching.follows_changed(request.user.id))
+        except IntegrityError:
+            pass  # Já seguia
     return redirect('other_profile', username=username)
 
 # Função para deixar de seguir um usuário
 @login_required
+@retry_if_locked
 def unfollow_user(request, username):
     user_to_unfollow = get_object_or_404(User, username=username)
-    Follow.objects.filter(follower=request.user, followed=user_to_unfollow).delete()
+    with transaction.atomic():
+        deleted, _ = Follow.objects.filter(follower=request.user, followed=user_to_unfollow).delete()
+        if deleted:
+            jobs.enqueue('follow_removed', follower_id=request.user.id, followed_id=user_to_unfollow.id)
+            transaction.on_commit(lambda: caching.follows_changed(request.user.id))
     return redirect('other_profile', username=username)
 
 # Função para apagar um comentário
 @login_required
+@retry_if_locked
 def delete_comment(request, comment_id):
     comment = get_object_or_404(Comment, id=comment_id, user=request.user)
     if request.method == 'POST':
-        comment.delete()
+        with transaction.atomic():
+            comment.delete()
+            jobs.enqueue('comment_deleted', author_id=request.user.id)
+            transaction.on_commit(lambda: caching.bump('comments', [request.user.id]))
         return redirect('profile')
     return redirect('profile')
 
 # Função para editar um comentário
 @login_required
+@retry_if_locked
 def edit_comment(request, comment_id):
     comment = get_object_or_404(Comment, id=comment_id, user=request.user)
     if request.method == 'POST':
-        form = CommentForm(request.POST, instance=comment)
+        form = CommentForm(request.POST, request.FILES, instance=comment)
         if form.is_valid():
             comment = form.save(commit=False)
             comment.edited_at = timezone.now()
-            comment.save()
+            # Uma imagem nova substitui a anterior; sem arquivo, a imagem atual fica
+            image = form.cleaned_data['image']
+            if image:
+                comment.media, _ = media.store(image, image.info)
+            with transaction.atomic():
+                comment.save()
+                tags.index_comment(comment, edited=True)
+                jobs.enqueue('comment_edited', author_id=request.user.id)
+                if image and not comment.media.has_thumbnail:
+                    jobs.enqueue('media_stored', sha256=comment.media_id)
+                transaction.on_commit(lambda: caching.bump('comments', [request.user.id]))
             return redirect('profile')
     else:
         form = CommentForm(instance=comment)
     
-    comments = Comment.objects.filter(user=request.user).order_by('-created_at')
     profile = Profile.objects.get(user=request.user)
+    profile.user = request.user
+    comments_html = comments_fragment(request, 'profile', profile, caching.csrf_part(request))
     
-    return render(request, 'profile.html', {'form': form, 'comments': comments, 'profile': profile})
+    return render(request, 'profile.html', {'form': form, 'comments_html': comments_html, 'profile': profile})
 
 # Página para a lista de seguidores
 @login_required
+@read_from_replica
 def following_list_view(request):
-    following = Follow.objects.filter(follower=request.user)
-    followed_users = [follow.followed for follow in following]
-    return render(request, 'followingList.html', {'followed_users': followed_users})
+    following = Follow.objects.filter(follower=request.user).select_related('followed').only('created_at', 'followed__username')
+    page = paginate(following, request)
+    followed_users = [follow.followed for follow in page]
+    return render(request, 'followingList.html', {'followed_users': followed_users, 'page': page})
 
 # Página para a lista de quem segue você
 @login_required
+@read_from_replica
 def followed_list_view(request):
-    followers = Follow.objects.filter(followed=request.user)
-    follower_users = [follow.follower for follow in followers]
-    return render(request, 'followedList.html', {'follower_users': follower_users})
+    followers = Follow.objects.filter(followed=request.user).select_related('follower').only('created_at', 'follower__username')
+    page = paginate(followers, request)
+    follower_users = [follow.follower for follow in page]
+    return render(request, 'followedList.html', {'follower_users': follower_users, 'page': page})
+
+# Página de notificações
+@login_required
+def notifications_view(request):
+    items = Notification.objects.filter(recipient=request.user).select_related('actor').only(
+        'kind', 'count', 'updated_at', 'read_at', 'actor__username'
+    )
+    page = paginate(items, request, key=('updated_at', 'id'))
+    return render(request, 'notifications.html', {'notifications': page, 'page': page})
+
+# Função para marcar notificações como lidas (uma só, ou todas sem notification_id)
+@login_required
+@retry_if_locked
+def mark_notifications_read(request, notification_id=None):
+    if request.method == 'POST':
+        notifications.mark_read(request.user, notification_id)
+    return redirect('notifications')
+
+# Comentários de uma lista de hashtags ou menções (CommentTag/Mention), paginados pelo índice
+def tagged_comments(items, request):
+    items = items.select_related('comment__user').only(
+        'created_at', 'comment__content', 'comment__created_at', 'comment__media', 'comment__user__username'
+    )
+    page = paginate(items, request)
+    return [item.comment for item in page], page
+
+# Página de uma hashtag
+@login_required
+def tag_view(request, name):
+    hashtag = get_object_or_404(Hashtag, name=name.lower())
+    comments, page = tagged_comments(CommentTag.objects.filter(hashtag=hashtag), request)
+    return render(request, 'tag.html', {'hashtag': hashtag, 'comments': comments, 'page': page})
+
+# Página dos comentários que mencionam você
+@login_required
+def mentions_view(request):
+    comments, page = tagged_comments(Mention.objects.filter(user=request.user), request)
+    return render(request, 'mentions.html', {'comments': comments, 'page': page})
+
+# Página das hashtags em alta (listas mantidas por core/trending.py)
+@login_required
+def trending_view(request):
+    windows = {window: trending.top(window) for window in trending.WINDOWS}
+    return render(request, 'trending.html', {'windows': windows})
+
+# Página de busca de comentários e pessoas
+@login_required
+def search_view(request):
+    query = request.GET.get('q', '').strip()
+    try:
+        page_number = max(1, int(request.GET.get('page', 1)))
+    except ValueError:
+        page_number = 1
+    size = search.PAGE_SIZE
+    profiles = search.search_profiles(query, page_number, size) if query else []
+    comments = search.search_comments(query, page_number, size) if query else []
+    has_next = len(profiles) > size or len(comments) > size
+    return render(request, 'search.html', {
+        'query': query,
+        'profiles': profiles[:size],
+        'comments': comments[:size],
+        'page_number': page_number,
+        'has_next': has_next,
+    })
+
+# Imagem anexada a um comentário (ou a miniatura dela), com Range e cache longo
+@login_required
+def media_view(request, sha256, thumbnail=False):
+    item = get_object_or_404(Media, sha256=sha256)
+    return media.serve(request, item, thumbnail)
+
+# Acertos e falhas do cache de fragmentos, para monitoramento
+@staff_member_required
+def cache_stats_view(request):
+    return JsonResponse(caching.stats())
+
+# Desempenho das views neste processo (o perfreport junta todos os processos)
+@staff_member_required
+def perf_stats_view(request):
+    return JsonResponse(perf.snapshot())
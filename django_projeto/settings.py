@@ -12,6 +12,15 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 
 from pathlib import Path
 import os
+from importlib.util import find_spec
+
+import django
+from django.core.exceptions import ImproperlyConfigured
+
+# login_required em views assíncronas (core/async_views.py) e o transaction_mode
+# do SQLite no perfil de produção só existem a partir do Django 5.1
+if django.VERSION < (5, 1):
+    raise ImproperlyConfigured('Este projeto precisa do Django 5.1 ou mais novo.')
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -42,11 +51,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.staticfiles.StaticFilesMiddleware',
+    'core.perf.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.replicas.ReplicaStickinessMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.ratelimit.RateLimitMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -68,6 +81,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'core.context_processors.notifications',
             ],
         },
     },
@@ -84,9 +98,55 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
+    # Comentários antigos (core/archive.py); criado com "migrate --database archive"
+    'archive': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('DJANGO_ARCHIVE_DB', BASE_DIR / 'archive.sqlite3'),
+    },
 }
 
+# Réplicas de leitura (core/replicas.py): DJANGO_REPLICAS com os arquivos, separados por vírgula.
+# Nos testes apontam para o default; localmente o comando sync_replicas copia o default para elas
+DATABASES.update({
+    f'replica{index}': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    for index, path in enumerate(filter(None, os.environ.get('DJANGO_REPLICAS', '').split(',')), start=1)
+})
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias.startswith('replica')]
+
+# Depois de uma escrita o navegador lê do default por este tempo (segundos), até as réplicas alcançarem
+REPLICA_STICKY_SECONDS = 10
+
+DATABASE_ROUTERS = ['core.routers.ArchiveRouter', 'core.routers.ReplicaRouter']
+
+# Comentários mais velhos que isso (dias) vão para o arquivo com o comando archive_comments
+COMMENT_ARCHIVE_AGE_DAYS = 365
+
+# Perfil de produção do SQLite (DJANGO_DB_PROFILE=production): WAL, conexões persistentes
+# e transações IMMEDIATE para que escritas concorrentes esperem em vez de falhar
+if os.environ.get('DJANGO_DB_PROFILE') == 'production':
+    for database in DATABASES.values():
+        database.update({
+            'CONN_MAX_AGE': 600,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'timeout': 20,
+                'transaction_mode': 'IMMEDIATE',
+            },
+        })
+    # Aplicados em cada conexão nova por core.db.configure_connection
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 268435456,
+        'cache_size': -64000,
+        'temp_store': 'MEMORY',
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -106,6 +166,22 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Hash de senhas (core/hashers.py): DJANGO_PASSWORD_HASHER=argon2|pbkdf2, Argon2 por padrão se instalado.
+# O primeiro da lista gera os hashes novos; os outros só verificam hashes antigos
+PASSWORD_HASHER = os.environ.get('DJANGO_PASSWORD_HASHER', 'argon2' if find_spec('argon2') else 'pbkdf2')
+PASSWORD_ARGON2 = {'time_cost': 2, 'memory_cost': 19456, 'parallelism': 1}
+PASSWORD_PBKDF2_ITERATIONS = int(os.environ.get('DJANGO_PBKDF2_ITERATIONS', 1_000_000))
+PASSWORD_HASHERS = [
+    'core.hashers.TunedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+if PASSWORD_HASHER == 'argon2':
+    PASSWORD_HASHERS.insert(0, 'core.hashers.TunedArgon2PasswordHasher')
+else:
+    PASSWORD_HASHERS.insert(1, 'core.hashers.TunedArgon2PasswordHasher')
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.0/topics/i18n/
@@ -130,9 +206,138 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, "static")
 ]
 
+# collectstatic gera nomes com hash, CSS minificado e variantes .gz/.br (core/staticfiles.py)
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "core.staticfiles.CompressedManifestStaticFilesStorage"},
+}
+
+# Cache-Control (segundos) dos estáticos com hash no nome
+STATIC_MAX_AGE = 60 * 60 * 24 * 365
+
+# Imagens dos comentários (core/media.py), guardadas pelo hash do conteúdo
+MEDIA_ROOT = os.environ.get('DJANGO_MEDIA_ROOT', os.path.join(BASE_DIR, "media"))
+MEDIA_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+# Miniaturas: maior lado em pixels e processos do pool (precisa do Pillow)
+MEDIA_THUMBNAIL_SIZE = 480
+MEDIA_THUMBNAIL_WORKERS = 2
+
+# Uploads vão para um temporário em disco em pedaços, com o SHA-256 calculado no caminho
+FILE_UPLOAD_HANDLERS = ['core.media.HashingUploadHandler']
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_URL = 'login' # Define a URL para onde os usuários serão redirecionados se tentarem acessar uma view protegida sem estar logados (modificado)
+
+# Autores com mais seguidores que isso não têm fan-out na escrita; seus comentários são lidos na hora
+TIMELINE_FANOUT_LIMIT = 1000
+
+# Paginação por cursor: tamanho padrão e máximo aceito em ?size=
+PAGINATION_PAGE_SIZE = 20
+PAGINATION_MAX_PAGE_SIZE = 100
+
+# Cache: memória local (despejo LRU) por padrão; DJANGO_CACHE_DIR ativa o cache em arquivos
+if os.environ.get('DJANGO_CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ['DJANGO_CACHE_DIR'],
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        },
+        # Compartilhado entre processos (um logout num deles vale para todos) e separado dos
+        # fragmentos, para que um cache.clear() não derrube as sessões
+        'sessions': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(os.environ['DJANGO_CACHE_DIR'], 'sessions'),
+            'OPTIONS': {'MAX_ENTRIES': 50000},
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'django_projeto',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        },
+    }
+
+# Sessões lidas do cache "sessions" e gravadas também no banco (sobrevivem ao cache ser limpo).
+# Só com o cache em arquivos: na memória local cada processo teria a sua cópia e um logout
+# num worker não valeria nos outros, então sem ele as sessões ficam só no banco
+if 'sessions' in CACHES:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+    SESSION_CACHE_ALIAS = 'sessions'
+else:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+
+# Tempo (segundos) que um fragmento renderizado fica no cache
+FRAGMENT_CACHE_TIMEOUT = 300
+
+# Views de leitura assíncronas (ligado por padrão em django_projeto/asgi.py)
+ASYNC_VIEWS = os.environ.get('DJANGO_ASYNC_VIEWS') == '1'
+
+# Resultados por página na busca
+SEARCH_PAGE_SIZE = 20
+
+# Quantas sugestões de quem seguir são guardadas por usuário
+SUGGESTIONS_TOP_K = 10
+
+# Follows em lote (core/graph.py): arestas por transação na importação e nomes por requisição em /api/follows/
+FOLLOW_IMPORT_BATCH_SIZE = 1000
+BULK_FOLLOW_LIMIT = 1000
+
+# Limite de requisições (core/ratelimit.py) por nome de rota de core/urls.py: taxa por usuário logado
+# e/ou por IP ("quantidade/período", período em s, m, h ou d), opcionalmente só em alguns métodos
+RATELIMIT_ENABLED = os.environ.get('DJANGO_RATELIMIT', '1') == '1'
+RATE_LIMITS = {
+    'register': {'ip': '10/h', 'methods': ['POST']},
+    'login': {'ip': '20/m', 'methods': ['POST']},
+    'profile': {'user': '30/m', 'ip': '120/m', 'methods': ['POST']},
+    'edit_comment': {'user': '30/m', 'methods': ['POST']},
+    'delete_comment': {'user': '60/m', 'methods': ['POST']},
+    # Seguir também aceita GET
+    'follow_user': {'user': '60/m'},
+    'unfollow_user': {'user': '60/m'},
+    'search': {'user': '60/m'},
+    'api_follows': {'user': '10/m'},
+    'api_import_follows': {'user': '60/h'},
+}
+
+# Número de notificações não lidas (core/notifications.py): segundos no cache. Os ajustes são feitos
+# por quem executa a fila e por quem marca como lidas; só o cache em arquivos é visto por todos os
+# processos, na memória local cada um tem sua cópia e ela precisa vencer logo
+NOTIFICATIONS_UNREAD_TIMEOUT = None if os.environ.get('DJANGO_CACHE_DIR') else 30
+
+# Hashtags em alta (core/trending.py): meia-vida (segundos) de cada janela, tamanho da lista e
+# por quanto tempo (segundos) a lista fica no cache
+TRENDING_WINDOWS = {'hora': 60 * 60, 'dia': 24 * 60 * 60}
+TRENDING_TOP_K = 10
+TRENDING_REFRESH_INTERVAL = 60
+
+# Instrumentação de desempenho (core/perf.py): histogramas por view, consultas lentas e perfreport
+PERF_ENABLED = os.environ.get('DJANGO_PERF', '1') == '1'
+PERF_WINDOW = 300
+PERF_SLOW_QUERY_MS = 100
+# Só com DJANGO_PERF_DIR cada processo grava seu perf-<pid>.json (lido pelo perfreport)
+PERF_DIR = os.environ.get('DJANGO_PERF_DIR')
+PERF_FLUSH_INTERVAL = 10
+
+# Fila de tarefas (core/jobs.py): 'thread' no próprio processo, 'worker' só com o runjobs, 'sync' na requisição
+JOBS_MODE = os.environ.get('DJANGO_JOBS_MODE', 'thread')
+JOBS_BATCH_SIZE = 200
+JOBS_MAX_ATTEMPTS = 5
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.perf': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+        'core.jobs': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+    },
+}